@@ -7,6 +7,9 @@ Created: March 1, 2014
 
 import sys
 
+import numpy as np
+from sklearn import preprocessing
+
 from Stock import Stock
 import dateutl
 
@@ -15,21 +18,69 @@ class LearningData(object):
         from an array of stocks and dates. It will consist
         of both input data (xs) and output data (ys). 
         """
+
+    """ The columns of X are always in this order whatever the order of
+        the features asked for. Each feature is paired with the indicator
+        it reads; dip14 and dim14 have always read adx. """
+    feature_columns = [('rsi', 'rsi'), ('tsi', 'tsi'), ('ppo', 'ppo'),
+                       ('adx', 'adx'), ('dip14', 'adx'), ('dim14', 'adx'),
+                       ('cci', 'cci'), ('cmo', 'cmo'), ('mfi', 'mfi'),
+                       ('natr', 'natr'), ('roc', 'roc'), ('stoch', 'stoch'),
+                       ('uo', 'uo')]
+
+    """ append writes rows into buffers with room to spare, which grow by
+        at least this many rows at a time """
+    chunk = 1024
         
-    def __init__(self):
+    def __init__(self, dtype=np.float64):
         """ The data is originally two empty array. The first array will be
             two dimensional input array called x that is m x n. The second
             array called y is the output array that is m x 1. The number of
             stocks is denoted by m and the number of dates used for learning
             is denoted by n. All notation is to be consistent with the
             Coursera Machine Learning course as much as possible.
+
+            X is a contiguous array of dtype and y an array of ints, so
+            scikit-learn uses them without converting them on every fit.
+            Both are views of the first m rows of their buffers.
             """
             
-        self.X = []
-        self.y = []
+        self.dtype = dtype
+        self._X = np.empty((0, 0), dtype=dtype)
+        self._y = np.empty(0, dtype=int)
         self.m = 0
         self.n = 0
 
+    @property
+    def X(self):
+        return self._X[:self.m]
+
+    @X.setter
+    def X(self, X):
+        self._X = np.ascontiguousarray(X, dtype=self.dtype)
+        self.m = len(self._X)
+
+    @property
+    def y(self):
+        return self._y[:self.m]
+
+    @y.setter
+    def y(self, y):
+        self._y = np.ascontiguousarray(y, dtype=int)
+
+    def _reserve(self, rows):
+        """ Make room in the buffers for rows more rows """
+        needed = self.m + rows
+        if needed <= len(self._X):
+            return
+        capacity = max(needed, 2 * len(self._X), LearningData.chunk)
+        X = np.empty((capacity, self._X.shape[1]), dtype=self.dtype)
+        X[:self.m] = self._X[:self.m]
+        y = np.empty(capacity, dtype=int)
+        y[:self.m] = self._y[:self.m]
+        self._X = X
+        self._y = y
+
     def construct(self, stocks, date, future_day, features):
         """ This method constructs the data arrays. The inputs are an array
             of m stocks and an array of dates. The first element of dates
@@ -50,12 +101,26 @@ class LearningData(object):
             Data object.
             """
             
-        self.X = []
-        self.y = []
+        columns = [feature for feature, indicator in
+                   LearningData.feature_columns if feature in features]
+        self._X = np.empty((0, len(columns)), dtype=self.dtype)
+        self._y = np.empty(0, dtype=int)
         self.n = len(features)
         self.m = 0
         self.append(stocks, date, future_day, features)
         
+    def construct_all(self, stocks, dates, future_day, features):
+        """ This method constructs the data arrays for all the dates at once.
+            The result is the same as construct with the first date followed
+            by append with each of the others, but X and y are numpy arrays
+            gathered from feature_tensor instead of rows built one stock at
+            a time. """
+        tensor, y, valid = feature_tensor(stocks, dates, future_day, features)
+        """ Rows go date by date and within a date stock by stock """
+        self.X = tensor.transpose(1, 0, 2)[valid.T]
+        self.y = y.T[valid.T]
+        self.n = len(features)
+        
     def append(self, stocks, date, future_day, features):
         """ This method appends data to a learningData object
             It is meant to be called from construct
@@ -66,17 +131,16 @@ class LearningData(object):
         
  #       reference_date = dates[0]
         num_stocks = len(stocks)
+        i_days = dateutl.find_ref_date_table(stocks, [date])[:, 0]
         
         for i in range(0, num_stocks):
             # Before we add a stock we must makes sure the dates go back far enough
             # i_day is the index of the reference date. We need all this plus the
             # maximum of the history being used in order to use this stock
-            i_day = dateutl.find_ref_date_idx(stocks[i], date)
-            elements = len(stocks[i].dates) # This is the number of entries in stocks
-            first_day_avail = stocks[i].dates[elements-1]
-            i_day_first_avail = dateutl.find_ref_date_idx(stocks[i], first_day_avail)
+            i_day = i_days[i]
+            # The first day available is the oldest, the last entry
+            i_day_first_avail = len(stocks[i].dates) - 1
             if (i_day < i_day_first_avail) and (i_day != -1): 
-                self.m += 1
                 temp_values = []
                 if 'rsi' in features:
                     temp_values.append(stocks[i].rsi[i_day])
@@ -104,14 +168,117 @@ class LearningData(object):
                     temp_values.append(stocks[i].stoch[i_day])
                 if 'uo' in features:
                     temp_values.append(stocks[i].uo[i_day])
-                self.X.append(temp_values)
+                self._reserve(1)
+                self._X[self.m] = temp_values
                 # Now get the future value and append it to self.y
                 # For classification problem assign a one to stock that has gone
                 # up and 0 to stock that has gone down
                 adjusted_value = stocks[i].close[i_day - future_day]/ \
                     stocks[i].close[i_day]
                 if adjusted_value >= 1:
-                    self.y.append(1)
+                    self._y[self.m] = 1
                 else:
-                    self.y.append(0)
-                                   
\ No newline at end of file
+                    self._y[self.m] = 0
+                self.m += 1
+
+
+def feature_tensor(stocks, dates, future_day, features):
+    """ The features of every stock at every reference date gathered into a
+        stocks x dates x features array, with the columns in the order of
+        LearningData.feature_columns. It is returned with two stocks x dates
+        arrays: y, which is 1 where the stock has gone up future_day trading
+        days later and 0 otherwise, and valid, which is False where the
+        stock does not go back to the date. The dates of a stock are looked
+        up and its indicators read with one fancy index each. """
+    indicators = [indicator for feature, indicator in
+                  LearningData.feature_columns if feature in features]
+    i_days = dateutl.find_ref_date_table(stocks, dates)
+    lengths = np.array([len(stock.dates) for stock in stocks], dtype=int)
+    valid = (i_days != -1) & (i_days < lengths[:, np.newaxis] - 1)
+    tensor = np.zeros((len(stocks), len(dates), len(indicators)))
+    y = np.zeros((len(stocks), len(dates)), dtype=int)
+    for i, stock in enumerate(stocks):
+        i_day = i_days[i][valid[i]]
+        if len(i_day) == 0:
+            continue
+        if indicators:
+            tensor[i, valid[i]] = np.column_stack([getattr(stock, indicator)
+                                                   [i_day] for indicator in
+                                                   indicators])
+        y[i, valid[i]] = stock.close[i_day - future_day]/stock.close[i_day] >= 1
+    return tensor, y, valid
+
+class FeatureCache(object):
+    """ Standardized training and test data of a list of stocks, built once
+        with a set of candidate features and reused for any subset of them.
+        StandardScaler scales each column on its own, so the columns of a
+        subset sliced from the standardized matrix are the same as
+        standardizing the subset itself. Only the indicators of the
+        candidates are read, so the others are never calculated. """
+
+    def __init__(self, stocks, features):
+        self.stocks = stocks
+        """ The candidates in the order of their columns in the matrices """
+        self.features = [feature for feature, indicator in
+                         LearningData.feature_columns if feature in features]
+        """ Standardized data by (reference dates, test dates, future_day,
+            candidates) and the subsets handed out by that key plus the
+            feature set """
+        self._matrices = {}
+        self._subsets = {}
+
+    def _dates_key(self, init_param):
+        return (tuple(init_param.reference_dates),
+                tuple(init_param.test_dates), init_param.future_day,
+                frozenset(self.features))
+
+    def data(self, init_param):
+        """ Standardized training and test LearningData for the dates and
+            features of init_param, which must be among the candidates. The
+            objects are shared between calls and must not be changed. """
+        key = self._dates_key(init_param) + (frozenset(init_param.features),)
+        if key not in self._subsets:
+            training_data, test_data = self.matrices(init_param)
+            columns = self.columns(init_param.features)
+            self._subsets[key] = (self._subset(training_data, columns),
+                                  self._subset(test_data, columns))
+        return self._subsets[key]
+
+    def matrices(self, init_param):
+        """ Standardized training and test LearningData with every candidate
+            for the dates of init_param """
+        dates_key = self._dates_key(init_param)
+        if dates_key not in self._matrices:
+            self._matrices[dates_key] = self._standardized(init_param)
+        return self._matrices[dates_key]
+
+    def columns(self, features):
+        """ The columns of the features in the matrices """
+        unknown = set(features) - set(self.features)
+        if unknown:
+            raise ValueError('{} not among the candidate features'
+                             .format(sorted(unknown)))
+        return [i for i, feature in enumerate(self.features)
+                if feature in features]
+
+    def _standardized(self, init_param):
+        """ Training and test data with every candidate, standardized with
+            the scale of the training data """
+        training_data = LearningData()
+        training_data.construct_all(self.stocks, init_param.reference_dates,
+                                    init_param.future_day, self.features)
+        test_data = LearningData()
+        test_data.construct_all(self.stocks, init_param.test_dates,
+                                init_param.future_day, self.features)
+        std_scale = preprocessing.StandardScaler().fit(training_data.X)
+        training_data.X = std_scale.transform(training_data.X)
+        test_data.X = std_scale.transform(test_data.X)
+        return training_data, test_data
+
+    @staticmethod
+    def _subset(data, columns):
+        subset = LearningData(data.dtype)
+        subset.X = data.X[:, columns]
+        subset.y = data.y
+        subset.n = len(columns)
+        return subset
@@ -0,0 +1,89 @@
+"""
+RidgePath object used in chelmbigstock and in mapreduce/chelmbigstock.py
+
+Created: October 18, 2026
+"""
+
+import math
+
+import numpy as np
+
+
+class RidgePath(object):
+    """ The errors of ridge regressions without intercept of training_data,
+        measured on itself and on cv_data, over the regularization
+        parameters alpha = base * step**k for integer k. X is factored once
+        by SVD so the fit for each alpha is only a rescaling of its
+        singular values. The errors are remembered by k, so any two ranges
+        of alphas share the fits where they overlap whatever their ends.
+        With workers greater than one new alphas are evaluated in that many
+        threads.
+
+        The module runs under Python 2 as well for the mapreduce code.
+        """
+
+    base = 0.01
+    step = 1.5
+
+    def __init__(self, training_data, cv_data, workers=None):
+        U, s, Vt = np.linalg.svd(np.asarray(training_data.X, dtype=float),
+                                 full_matrices=False)
+        self.U = U
+        self.s = s
+        self.y = np.asarray(training_data.y, dtype=float)
+        self.Uty = U.T.dot(self.y)
+        self.cv_XV = np.asarray(cv_data.X, dtype=float).dot(Vt.T)
+        self.cv_y = np.asarray(cv_data.y, dtype=float)
+        self.training_m = training_data.m
+        self.cv_m = cv_data.m
+        self.workers = workers
+        """ (diff_training, diff_cv) by k """
+        self.errors = {}
+
+    def alpha(self, k):
+        """ The alpha of step k of the grid """
+        return self.base * self.step ** k
+
+    def steps(self, alpha_min, alpha_max):
+        """ The k of the alphas of the grid from alpha_min up to but not
+            including alpha_max. An end within rounding of an alpha of the
+            grid counts as that alpha. The first alpha at or above alpha_min
+            is always included, so a range narrower than a step of the grid
+            still gives one alpha. """
+        def position(alph):
+            return math.log(alph / self.base) / math.log(self.step)
+        first = int(math.ceil(position(alpha_min) - 1e-9))
+        last = int(math.ceil(position(alpha_max) - 1e-9))
+        return list(range(first, max(last, first + 1)))
+
+    def evaluate(self, steps):
+        """ (diff_training, diff_cv) for the alpha of each k of steps """
+        new = [k for k in steps if k not in self.errors]
+        if len(new) > 0:
+            alphas = self.alpha(np.array(new, dtype=float))
+            if self.workers is not None and self.workers > 1 and len(new) > 1:
+                from multiprocessing.pool import ThreadPool
+                pool = ThreadPool(self.workers)
+                try:
+                    diffs = np.hstack(pool.map(
+                        self._diffs, np.array_split(alphas, self.workers)))
+                finally:
+                    pool.close()
+            else:
+                diffs = self._diffs(alphas)
+            for k, diff_training, diff_cv in zip(new, diffs[0], diffs[1]):
+                self.errors[k] = (diff_training, diff_cv)
+        return [self.errors[k] for k in steps]
+
+    def _diffs(self, alphas):
+        """ 2 x len(alphas) array of the training and cv errors. The
+            coefficients for alpha are V diag(s/(s**2 + alpha)) U'y """
+        s = self.s[:, np.newaxis]
+        coef = s/(s**2 + alphas) * self.Uty[:, np.newaxis]
+        predict_data = self.U.dot(s * coef)
+        predict_cv = self.cv_XV.dot(coef)
+        diff_training = (1.0/self.training_m) * \
+            np.linalg.norm(predict_data - self.y[:, np.newaxis], axis=0)
+        diff_cv = (1.0/self.cv_m) * \
+            np.linalg.norm(predict_cv - self.cv_y[:, np.newaxis], axis=0)
+        return np.vstack([diff_training, diff_cv])
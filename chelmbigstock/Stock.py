@@ -9,12 +9,87 @@ import os
 import csv
 
 import dateutl
+import kernels
 import numpy as np
+from scipy.signal import lfilter
+
+
+def chronological(a, lengths=None):
+    """ Flip stock series between newest first and oldest first order.
+        The flip is its own inverse and a view. A 2D panel, given with the
+        lengths of its rows, is held oldest first already (see StockPanel)
+        and is returned as it is. """
+    if lengths is None:
+        return a[..., ::-1]
+    return a
+
+
+class Indicator(object):
+    """ An indicator of a Stock. It is calculated by the calc method of the
+        stock the first time it is read and then remembered in the memo of
+        that stock, so only the indicators a run asks for are ever worked
+        out. Assigning to it, as the calc methods do, fills the memo. """
+
+    def __init__(self, calc):
+        self.calc = calc
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, stock, owner):
+        if stock is None:
+            return self
+        if self.name not in stock._memo:
+            getattr(stock, self.calc)()
+        return stock._memo[self.name]
+
+    def __set__(self, stock, value):
+        stock._memo[self.name] = value
 
 
 class Stock(object):
     """A stock has a symbol and a list of date/value pairs"""
+
+    columns = ['dates', 'vopen', 'high', 'low', 'close', 'volume']
+    indicators = ['rsi', 'tsi', 'ppo', 'dip14', 'dim14', 'adx', 'cci', 'cmo',
+                  'mfi', 'natr', 'roc', 'stoch', 'uo']
+
+    """ Parsed csv files are cached in this subdirectory of the data
+        directory. Set it to None to always parse the csv files """
+    cache_dir = 'cache'
     
+    """ Stocks are held by the thousand, so there is no __dict__ per stock """
+    __slots__ = ['name', 'directory', 'length', '_memo', '_state',
+                 '_buffers'] + columns
+
+    """ append only advances the indicators of a stock with at least this
+        many days, shorter ones are calculated again """
+    append_history = 64
+
+    """ append keeps the series it extends in buffers with room to spare,
+        which grow by at least this many days at a time """
+    append_chunk = 256
+
+    rsi = Indicator('rsi_calc')
+    tsi = Indicator('tsi_calc')
+    ppo = Indicator('ppo_calc')
+    dip14 = Indicator('adx_calc')
+    dim14 = Indicator('adx_calc')
+    adx = Indicator('adx_calc')
+    cci = Indicator('cci_calc')
+    cmo = Indicator('cmo_calc')
+    mfi = Indicator('mfi_calc')
+    natr = Indicator('natr_calc')
+    roc = Indicator('roc_calc')
+    stoch = Indicator('stoch_calc')
+    uo = Indicator('uo_calc')
+
+    """ True range, buying pressure and the 27 day ema of the true range are
+        shared by adx, natr and uo and worked out once per stock """
+    tr = Indicator('true_range_calc')
+    bp = Indicator('true_range_calc')
+    tr14 = Indicator('true_range_calc')
+
     def __init__(self, name, directory):
         """ The creation of a stock takes in a name assuming it is a
             character string and creates arrays to store dates and
@@ -24,166 +99,401 @@ class Stock(object):
         self.name = name
         self.directory = directory
         self.length = 0
-        self.dates = []
-        self.vopen = [] # opening value. cannot use "open"
-        self.high = []
-        self.low = []
-        self.close = []
-        self.volume = []
-        self.rsi = []
-        self.tsi = []
-        self.ppo = []
-        self.dip14 = []
-        self.dim14 = []
-        self.adx = []
-        self.cci = []
-        self.cmo = []
-        self.mfi = []
-        self.natr = []
-        self.roc = []
-        self.stoch = []
-        self.uo = []
+        self.dates = np.empty(0, dtype=np.int64)
+        self.vopen = np.empty(0) # opening value. cannot use "open"
+        self.high = np.empty(0)
+        self.low = np.empty(0)
+        self.close = np.empty(0)
+        self.volume = np.empty(0)
+        self._memo = {}
+        """ Newest values of the recurrences behind the indicators, set by
+            the calc methods and used by append """
+        self._state = {}
+        """ Oldest first buffers behind the series extended by append and
+            the newest first view of each that was handed out last """
+        self._buffers = {}
         
     @staticmethod
-    def ema(a, N):
+    def ema(a, N, lengths=None):
         """ This method calculates the exponential moving average of an 
         array, a and period N. Because stock values are in reverse
         chronological order the input and outputs will also be in
-        reverse chronological order. """
+        reverse chronological order. 
+
+        The oldest N days are averaged to seed the ema, every later day is
+        then run through the recurrence ema = a*alpha + ema_before*(1-alpha)
+        as a first order IIR filter instead of a python loop. Days older
+        than the seed are left at zero, and so is all of a series shorter
+        than N since it has nothing to seed from. 
+
+        a can also be a 2D panel with one stock per row. Row i then holds
+        lengths[i] days oldest first followed by padding, as StockPanel
+        keeps it, and the result is in the same order. 
+
+        With kernels.compiled the recurrence is the compiled loop, which
+        gives the numbers of the original python loop exactly. """
         
         alpha = 2.0/(N+1)
-        """ Go through the original N days to initialize ave_a"""
-        lengtha = len(a)
-        a_ema = np.zeros(lengtha)
-        a_sum = 0.0
-        for iday in range(lengtha-1, lengtha-(N+1),-1):
-            a_sum += a[iday]
-            a_ema[lengtha-N] = a_sum/N
-        
-        for iday in range(lengtha-(N+1),-1,-1):
-            a_ema[iday] = a[iday]*alpha + a_ema[iday+1]*(1.0-alpha)
-        return a_ema
-        
-    def sma(a, N):
+        chron = chronological(np.asarray(a, dtype=float), lengths)
+        chron_ema = np.zeros(chron.shape)
+        if chron.shape[-1] >= N and kernels.compiled:
+            chron_ema = kernels.ema_rows(chron.reshape(-1, chron.shape[-1]),
+                                         N).reshape(chron.shape)
+        elif chron.shape[-1] >= N:
+            seed = chron[..., :N].sum(axis=-1)/N
+            chron_ema[..., N-1] = seed
+            chron_ema[..., N:] = lfilter([alpha], [1.0, alpha-1.0],
+                chron[..., N:], zi=(seed*(1.0-alpha))[..., np.newaxis])[0]
+        if lengths is not None:
+            chron_ema[lengths < N] = 0.0
+        return np.ascontiguousarray(chronological(chron_ema, lengths))
+        
+    @staticmethod
+    def sma(a, N, lengths=None):
         """ This method calculates the simple moving average of an 
         array, a and period N. Because stock values are in reverse
         chronological order the input and outputs will also be in
-        reverse chronological order. """
-        
-        """ Go through the original N days to initialize ave_a"""
-        lengtha = len(a)
-        a_sma = np.zeros(lengtha)
-        a_sum = 0.0
-        for iday in range(lengtha-1, lengtha-(N+1),-1):
-            a_sum += a[iday]
-            a_sma[iday] = a_sum/(lengtha - iday)
-        
-        for iday in range(lengtha-(N+1),-1,-1):
-            a_sum += a[iday]
-            a_sum -= a[iday+N]
-            a_sma[iday] = a_sum/N
-        return a_sma
+        reverse chronological order. 
+
+        The oldest N days get the average of the days available so far,
+        and so does all of a series shorter than N. Everything is taken from one cumulative sum of the chronological
+        series, so no day is visited in a python loop. a and lengths can
+        be a panel as in ema. """
+        
+        chron = chronological(np.asarray(a, dtype=float), lengths)
+        chron_sum = np.cumsum(chron, axis=-1)
+        chron_sma = np.zeros(chron.shape)
+        head = min(N, chron.shape[-1])
+        chron_sma[..., :head] = chron_sum[..., :head]/np.arange(1, head+1)
+        chron_sma[..., N:] = (chron_sum[..., N:] - chron_sum[..., :-N])/N
+        return np.ascontiguousarray(chronological(chron_sma, lengths))
+
+    @staticmethod
+    def wilder_rsi(a, lengths=None, averages=False):
+        """ This method calculates the 14 day relative strength index of
+        the closing prices a. The averages start from the sums of the
+        oldest 13 changes and the first change after that spans two days,
+        as the indicator has always been worked out. Series shorter than
+        16 days are all zero. 
+
+        The Wilder averages are the compiled loop of kernels when it is
+        available, otherwise a first order IIR filter that agrees with the
+        loop to rounding. a and lengths can be a panel as in ema. With
+        averages set the average gain and loss of the latest day are
+        returned as well. """
+        
+        chron = chronological(np.asarray(a, dtype=float), lengths)
+        if lengths is None:
+            days = np.full(chron.shape[:-1], chron.shape[-1], dtype=int)
+        else:
+            days = np.asarray(lengths)
+        if kernels.compiled:
+            rows = chron.reshape(-1, chron.shape[-1])
+            rsi, gains, losses = kernels.rsi_rows(rows, days.reshape(-1))
+            rsi = chronological(rsi.reshape(chron.shape), lengths)
+            if averages:
+                return (rsi, gains.reshape(days.shape),
+                        losses.reshape(days.shape))
+            return rsi
+        
+        rsi = np.zeros(chron.shape)
+        gains = np.zeros(days.shape)
+        losses = np.zeros(days.shape)
+        if chron.shape[-1] >= 16:
+            change = chron[..., 1:14] - chron[..., 0:13]
+            first_gain = np.where(change > 0, change, 0.0).sum(axis=-1)
+            first_loss = np.where(change > 0, 0.0, -change).sum(axis=-1)
+            gain = chron[..., 15:] - chron[..., 14:-1]
+            gain[..., 0] = chron[..., 15] - chron[..., 13]
+
+            num = [1.0/14]
+            den = [1.0, -13.0/14]
+            ave_gain = lfilter(num, den, np.where(gain > 0, gain, 0.0),
+                               zi=(first_gain*13.0/14)[..., np.newaxis])[0]
+            ave_loss = lfilter(num, den, np.where(gain > 0, 0.0, -gain),
+                               zi=(first_loss*13.0/14)[..., np.newaxis])[0]
+            rsi[..., 15:] = np.where(ave_loss > 0,
+                                     100 - 100/(1.0 + ave_gain/ave_loss), 10)
+            rsi[days < 16] = 0.0
+            latest = np.maximum(days - 16, 0)[..., np.newaxis]
+            gains = np.where(days < 16, 0.0, np.take_along_axis(ave_gain,
+                latest, axis=-1)[..., 0])
+            losses = np.where(days < 16, 0.0, np.take_along_axis(ave_loss,
+                latest, axis=-1)[..., 0])
+        if averages:
+            return chronological(rsi, lengths), gains, losses
+        return chronological(rsi, lengths)
+
+    @staticmethod
+    def rolling_max(a, N):
+        """ This method returns the largest value of every window of N days,
+        a[i:i+N], so the result is N-1 days shorter than a. The running
+        maxima forward and backward within blocks of N days are combined as
+        in the van Herk / Gil-Werman algorithm, so the time does not grow
+        with N. a can be a panel, the windows run along the last axis. """
+        
+        a = np.asarray(a, dtype=float)
+        days = a.shape[-1]
+        if days < N:
+            return np.empty(a.shape[:-1] + (0,))
+        blocks = -(-days // N)
+        padded = np.full(a.shape[:-1] + (blocks * N,), -np.inf)
+        padded[..., :days] = a
+        padded = padded.reshape(a.shape[:-1] + (blocks, N))
+        ahead = np.maximum.accumulate(padded, axis=-1)
+        behind = np.maximum.accumulate(padded[..., ::-1], axis=-1)[..., ::-1]
+        ahead = ahead.reshape(a.shape[:-1] + (blocks * N,))
+        behind = behind.reshape(a.shape[:-1] + (blocks * N,))
+        return np.maximum(behind[..., :days-N+1], ahead[..., N-1:days])
+
+    @staticmethod
+    def rolling_min(a, N):
+        """ This method returns the smallest value of every window of N days
+        as rolling_max does the largest """
+        return -Stock.rolling_max(-np.asarray(a, dtype=float), N)
+
+    @staticmethod
+    def mean_deviation(a, mean, N):
+        """ This method returns the mean absolute deviation of every window
+        of N days, a[i:i+N], from mean[i]. As in the original cci
+        calculation the last N days, whose window is not complete, are
+        left at zero. All windows are taken at once as strided views of a.
+        a and mean can be a panel. """
+        
+        a = np.asarray(a, dtype=float)
+        deviation = np.zeros(a.shape)
+        days = a.shape[-1] - N
+        if days > 0:
+            windows = np.lib.stride_tricks.sliding_window_view(a, N, axis=-1)
+            deviation[..., :days] = np.abs(windows[..., :days, :] -
+                mean[..., :days, np.newaxis]).sum(axis=-1)/float(N)
+        return deviation
         
     @classmethod
-    def read_stocks(cls, stock_file, max_stocks):
+    def read_stocks(cls, stock_file, max_stocks, panel=False, workers=None,
+                    directory='../data', store=None, features=None):
         """ This method takes in a file of the stock symbols to be read and 
-            returns an array of Stock objects. """
+            returns an array of Stock objects. With panel set, the
+            indicators of all stocks are calculated together in a
+            StockPanel and the Stock attributes are views into it. 
+
+            With workers greater than one the stocks are loaded, and their
+            indicators calculated unless panel is set, in that many
+            processes. The stocks come back in the order of stock_file. 
+
+            store names a UniverseStore file. When it has all the stocks
+            and their csv files are unchanged the stocks are views into it,
+            otherwise the stocks are loaded and the store is written again.
+
+            features lists the indicators worked out while loading, by
+            default all of them. Any other indicator is calculated the
+            first time it is read. """
             
+        symbols = []
+        with open(stock_file, 'r') as f:
+            for stock_symbol in f:
+                symbols.append(stock_symbol.strip())
+                if len(symbols) >= max_stocks:
+                    break
+
+        if store is not None and os.path.exists(store):
+            from UniverseStore import UniverseStore
+            universe = UniverseStore(store)
+            if universe.is_current(symbols, directory):
+                return universe.stocks(symbols, directory)
+
+        if features is None:
+            features = Stock.indicators
+        jobs = [(symbol, directory, [] if panel else features)
+                for symbol in symbols]
+        if workers is not None and workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                loaded = list(pool.map(load_stock, jobs))
+        else:
+            loaded = [load_stock(job) for job in jobs]
+
         stocks = []
-        f = open(stock_file, 'r')
-        count = 0
-        for stock_symbol in f:
-            stock_symbol = stock_symbol.strip()
-            this_stock = Stock(stock_symbol, '../data')
-            this_stock.populate()
-            this_stock.rsi_calc()
-            this_stock.tsi_calc()
-            this_stock.ppo_calc()
-            this_stock.adx_calc()
-            this_stock.cci_calc()
-            this_stock.cmo_calc()
-            this_stock.mfi_calc()
-            this_stock.natr_calc()
-            this_stock.roc_calc()
-            this_stock.stoch_calc()
-            this_stock.uo_calc()
+        for symbol, arrays in zip(symbols, loaded):
+            this_stock = Stock(symbol, directory)
+            for attr, values in arrays.items():
+                setattr(this_stock, attr, values)
             stocks.append(this_stock)
-            count = count + 1
-            if count >= max_stocks:
-                break
         
+        if panel:
+            from StockPanel import StockPanel
+            StockPanel(stocks).calc(features)
+        if store is not None:
+            from UniverseStore import UniverseStore
+            stocks = UniverseStore.write(store, stocks).stocks(symbols,
+                                                              directory)
         return(stocks)
 
+    def indicators_calc(self, features=None):
+        """ This method calculates the indicators named in features, by
+            default all of them. Indicators not calculated here are still
+            worked out when they are first read. """
+        if features is None:
+            features = Stock.indicators
+        for indicator in features:
+            getattr(self, indicator)
+
+    def date_index(self):
+        """ This method returns the dates oldest first, ready for
+            np.searchsorted. It is made once for the current dates. """
+        index = self._memo.get('date_index')
+        if index is None or index[0] is not self.dates:
+            index = (self.dates,
+                     np.ascontiguousarray(np.asarray(self.dates)[::-1]))
+            self._memo['date_index'] = index
+        return index[1]
+
+    def calculated(self, indicator):
+        """ True when the indicator has been calculated or assigned """
+        return indicator in self._memo
+
     def populate(self):
         """ This method populates the dates and values of the stock.
 
         The name of the file is the name of the stock and the directory
         is already known so no arguments are needed
+
+        The parsed columns are saved in a binary cache (see cache_dir) and
+        read back from there as long as the size and modification time of
+        the csv file are unchanged.
         """
 
         file = os.path.join(self.directory, self.name + '.csv')
-        with open(file, 'U') as f:
-            reader = csv.reader(f)
+        stat = os.stat(file)
+        self._memo = {}
+        self._state = {}
+        self._buffers = {}
+        if not self.read_cache(stat):
+            self.read_csv(file)
+            self.write_cache(stat)
+
+    def cache_file(self):
+        """ The name of the binary cache of the stock or None when caching
+            is turned off """
+        if Stock.cache_dir is None:
+            return None
+        return os.path.join(self.directory, Stock.cache_dir, self.name + '.npz')
+
+    def read_cache(self, stat):
+        """ This method populates the stock from its cache. It returns False
+            when there is no cache or it does not match the csv file stat """
+        cache = self.cache_file()
+        if cache is None or not os.path.exists(cache):
+            return False
+        try:
+            with np.load(cache) as cached:
+                if (cached['csv_mtime'] != stat.st_mtime_ns or
+                        cached['csv_size'] != stat.st_size):
+                    return False
+                for column in Stock.columns:
+                    setattr(self, column, cached[column])
+        except Exception:
+            # an unreadable cache is simply built again
+            return False
+        return True
+
+    def write_cache(self, stat):
+        """ This method saves the columns of the stock to its cache along
+            with the size and modification time of the csv file. The file
+            is written under a temporary name first so that processes
+            loading the same stock never see half a cache. """
+        cache = self.cache_file()
+        if cache is None:
+            return
+        temp = '{}.{}.tmp'.format(cache, os.getpid())
+        columns = {}
+        for column in Stock.columns:
+            columns[column] = np.asarray(getattr(self, column),
+                dtype=np.int64 if column == 'dates' else float)
+        try:
+            os.makedirs(os.path.dirname(cache), exist_ok=True)
+            with open(temp, 'wb') as f:
+                np.savez(f, csv_mtime=stat.st_mtime_ns, csv_size=stat.st_size,
+                         **columns)
+            os.replace(temp, cache)
+        except OSError:
+            # no cache when the data directory is read only
+            if os.path.exists(temp):
+                os.remove(temp)
+
+    def read_csv(self, file):
+        """ This method parses the dates and values of the stock from the
+            csv file """
+
+        with open(file, newline='') as f:
             headers = f.readline()
-            dates = []
-            vopen = []
-            high = []
-            low = []
-            close = []
-            volume = []
-            for row in reader:
-                try:
-                    date = dateutl.days_since_1900(row[0])
-                    """ adjustment is for splits. Everything must be 
-                        be multiplied by the ration of the adjusted close
-                        to the actual close """
-                    adjustment = float(row[6])/float(row[4])
-                    # Data in the csv files are in reverse cronological order,
-                    dates.append(date) 
-                    vopen.append(float(row[1])*adjustment)
-                    high.append(float(row[2])*adjustment)
-                    low.append(float(row[3])*adjustment)
-                    close.append(float(row[4])*adjustment)
-                    volume.append(float(row[5]))
-                except:
-                    continue
-             #       print("empty row")
+            rows = list(csv.reader(f))
+        if self.parse_table(rows):
+            return
+
+        """ Allocate every column once for all rows. Rows that do not parse
+            are skipped so the columns are cut to the rows actually read """
+        dates = np.empty(len(rows), dtype=np.int64)
+        vopen = np.empty(len(rows))
+        high = np.empty(len(rows))
+        low = np.empty(len(rows))
+        close = np.empty(len(rows))
+        volume = np.empty(len(rows))
+        count = 0
+        for row in rows:
+            try:
+                date = dateutl.days_since_1900(row[0])
+                """ adjustment is for splits. Everything must be 
+                    be multiplied by the ration of the adjusted close
+                    to the actual close """
+                adjustment = float(row[6])/float(row[4])
+                values = (float(row[1])*adjustment, float(row[2])*adjustment,
+                          float(row[3])*adjustment, float(row[4])*adjustment,
+                          float(row[5]))
+            except:
+                continue
+            # Data in the csv files are in reverse cronological order,
+            dates[count] = date
+            vopen[count], high[count], low[count], close[count], \
+                volume[count] = values
+            count += 1
         self.dates, self.vopen, self.high, self.low, self.close,self.volume = \
-            dates, vopen, high, low, close, volume
+            dates[:count], vopen[:count], high[:count], low[:count], \
+            close[:count], volume[:count]
+
+    def parse_table(self, rows):
+        """ This method parses all csv rows at once, the dates with
+            dateutl.days_since_1900_array and the values as one array. It
+            returns False, leaving the stock alone, when any row does not
+            parse so that read_csv can go through them one at a time and
+            skip the bad ones. """
+        try:
+            dates = dateutl.days_since_1900_array([row[0] for row in rows])
+            values = np.array([row[1:7] for row in rows], dtype=float)
+        except (ValueError, IndexError):
+            return False
+        if values.ndim != 2 or values.shape[1] != 6 or \
+                (values[:, 3] == 0).any():
+            return False
+        """ adjustment is for splits, as in read_csv """
+        adjustment = values[:, 5]/values[:, 3]
+        self.dates = dates
+        self.vopen = values[:, 0]*adjustment
+        self.high = values[:, 1]*adjustment
+        self.low = values[:, 2]*adjustment
+        self.close = values[:, 3]*adjustment
+        self.volume = np.ascontiguousarray(values[:, 4])
+        return True
+
     def rsi_calc(self):
         """ This method calculates the relative strength index of the stock.
             Calculations are based on a 14 day period"""
         
-        """ Go through the original 14 days to initialize ave_gain and 
-        ave_loss """
-        self.rsi = np.zeros(len(self.dates))
-        ave_gain = 0
-        ave_loss = 0
-        last_val = self.close[len(self.dates)-1]
-        oneO14 = 1/14
-        for iday in range(len(self.dates)-2,len(self.dates)-15,-1):
-            gain = self.close[iday] - last_val
-            if gain > 0:
-                ave_gain += gain
-            else:
-                ave_loss -= gain
-            last_val = self.close[iday]
-            
-        """ Now go through rest of data field to assign relative strength """
-        for iday in range(len(self.dates)-16, -1, -1):
-            gain = self.close[iday] - last_val
-            if gain > 0:
-                ave_gain = (ave_gain*13 + gain)*oneO14
-                ave_loss = (ave_loss*13)*oneO14
-            else:
-                ave_gain = (ave_gain*13)*oneO14
-                ave_loss = (ave_loss*13 - gain)*oneO14
-            last_val = self.close[iday]
-            if ave_loss > 0:
-                RS = ave_gain/ave_loss
-                self.rsi[iday] = 100 - 100/(1.0 + RS)
-            else:
-                self.rsi[iday] = 10
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi, ave_gain, ave_loss = Stock.wilder_rsi(self.close,
+                                                       averages=True)
+        self.rsi = np.ascontiguousarray(rsi)
+        self._state['rsi'] = (float(ave_gain), float(ave_loss))
         return
         
     def tsi_calc(self):
@@ -195,12 +505,13 @@ class Stock(object):
         vals = self.close
         days = len(vals)
         diff = np.zeros(days-1)
-        for iday in range(0,days-2):
-            diff[iday] = vals[iday] - vals[iday+1]
-        num_array = Stock.ema(diff, r)
-        num_array = Stock.ema(num_array, s)
-        denom_array = Stock.ema(np.abs(diff), r)
-        denom_array = Stock.ema(denom_array, s)
+        diff[:days-2] = vals[:days-2] - vals[1:days-1]
+        num_r = Stock.ema(diff, r)
+        num_array = Stock.ema(num_r, s)
+        denom_r = Stock.ema(np.abs(diff), r)
+        denom_array = Stock.ema(denom_r, s)
+        self._state['tsi'] = tuple(latest(a) for a in
+                                   (num_r, num_array, denom_r, denom_array))
         """ The ema function sets first elements to zero so division will 
             give nan. Get rid of them with the nan_to_num method """
         self.tsi = np.nan_to_num(num_array/denom_array)
@@ -213,43 +524,52 @@ class Stock(object):
         r = 26
         s = 12
         vals = self.close
-        num_array = Stock.ema(vals, s) - Stock.ema(vals, r)
+        short_ema = Stock.ema(vals, s)
         denom_array = Stock.ema(vals, r)
+        num_array = short_ema - denom_array
+        self._state['ppo'] = (latest(short_ema), latest(denom_array))
         """ The ema function sets first elements to zero so division will 
             give nan. Get rid of them with the nan_to_num method """
         self.ppo = np.nan_to_num(num_array/denom_array)
         self.ppo[self.ppo >= 1E300] = 0
         return
         
+    def true_range_calc(self):
+        """ This method calculates the true range and the buying pressure of
+            each day, which are one day shorter than the price columns, and
+            the 14 day Wilder average of the true range. The true range is
+            the larger of the high and the previous close less the smaller
+            of the low and the previous close. """
+        prev_close = self.close[1:]
+        low = np.minimum(self.low[:-1], prev_close)
+        high = np.maximum(self.high[:-1], prev_close)
+        self.bp = self.close[:-1] - low
+        self.tr = high - low
+        self.tr14 = Stock.ema(self.tr,27)
+        return
+
     def adx_calc(self):
         """ This method calculates the positive and negative directional 
             movement indicies and average directional index of the stock.
             Periods of 14 days are chosen as suggested by Wilder. Note that
             Wilders periods of 14 corresponds with a ema of 27. Data is in
             reverse chronological order so iday+1 is earlier day"""
-        """First calculate true range """
-        TR1 = np.zeros(len(self.high)-1)
-        for iday in range(len(self.high)-1):
-            a = self.high[iday] - self.low[iday]
-            b = abs(self.high[iday] - self.close[iday+1])
-            c = abs(self.low[iday] - self.close[iday+1])
-            TR1[iday] = max(a, b, c)
-        """initialize directional movement 1 (positive and negative) then calc"""
-        days = len(self.close)
-        DMP1 = np.zeros(days-1)
-        DMM1 = np.zeros(days-1)
-        for iday in range(0, days-2):
-            pls_change = self.high[iday] - self.high[iday+1]
-            mns_change = self.low[iday+1] - self.low[iday]
-            if (pls_change > mns_change and pls_change > 0.0):
-                DMP1[iday] = pls_change
-            elif (pls_change > 0):
-                DMM1[iday] = mns_change
+        """ Directional movement 1 (positive and negative). The oldest day
+            has no movement """
+        pls_change = self.high[:-1] - self.high[1:]
+        mns_change = self.low[1:] - self.low[:-1]
+        positive = (pls_change > mns_change) & (pls_change > 0.0)
+        DMP1 = np.where(positive, pls_change, 0.0)
+        DMM1 = np.where(~positive & (pls_change > 0), mns_change, 0.0)
+        if len(DMP1) > 0:
+            DMP1[-1] = 0.0
+            DMM1[-1] = 0.0
         
         """ Do 14 day Wilder EMA on data which corresponds to 27 day EMA """
-        TR14 = Stock.ema(TR1,27)
+        TR14 = self.tr14
         DMP14 = Stock.ema(DMP1,27)
         DMM14 = Stock.ema(DMM1,27)
+        self._state['adx'] = (latest(DMP14), latest(DMM14))
         
         """ Caclulate the directional indicies """
         self.dip14 = np.nan_to_num(DMP14/TR14)
@@ -264,21 +584,13 @@ class Stock(object):
         self.adx = Stock.ema(dx,27)
         return
         
-    def cci_calc(self):
+    def cci_calc(self, period=20):
         """ This method calculates the commodity channel index of the stock."""
             
-        TP = (np.array(self.high)+np.array(self.low)+np.array(self.close))/3.0
-        TPMA = Stock.sma(TP,20)
-        
-        deviation = np.zeros(len(TP))
-        
-        for iday in range(len(TP)-20):
-            dev_sum = 0.0
-            TPMA_iday = TPMA[iday]
-            for i in range(0,20):
-                dev_sum += abs(TP[iday+i] - TPMA_iday)
-            dev_sum = dev_sum/20.0
-            deviation[iday] = dev_sum
+        TP = (self.high + self.low + self.close)/3.0
+        TPMA = Stock.sma(TP,period)
+        deviation = Stock.mean_deviation(TP, TPMA, period)
+        self._state['cci'] = period
         
         self.cci = (TP - TPMA)/(0.015 * deviation)
         self.cci = np.nan_to_num(self.cci)
@@ -290,17 +602,11 @@ class Stock(object):
         """ This method calculates the chande Momentum Oscillator of the 
             stock. Using the default span of 9 days"""
             
-        days = len(self.close)-1
-        up = np.zeros(days)
-        down = np.zeros(days)
-        for iday in range(days):
-            """ price change, data is in reverse chronological order
-                diff is positive for up days and negative for down days"""
-            diff = self.close[iday] - self.close[iday+1]
-            if (diff > 0):
-                up[iday] = diff
-            else:
-                down[iday] = -1.0 * diff
+        """ price change, data is in reverse chronological order
+            diff is positive for up days and negative for down days"""
+        diff = self.close[:-1] - self.close[1:]
+        up = np.where(diff > 0, diff, 0.0)
+        down = np.where(diff > 0, 0.0, -1.0 * diff)
         su = Stock.sma(up,9)
         sd = Stock.sma(down,9)
         
@@ -315,17 +621,12 @@ class Stock(object):
     def mfi_calc(self):
         """ This method calculates the money flow index index of the stock."""
             
-        TP = (np.array(self.high)+np.array(self.low)+np.array(self.close))/3.0
-        
-        mfpos1 = np.zeros(len(TP)-1)
-        mfneg1 = np.zeros(len(TP)-1)
-             
-        for iday in range(len(TP)-1):
-            diff = TP[iday] - TP[iday+1]
-            if (diff > 0):
-                mfpos1[iday] = diff * self.volume[iday]
-            else:
-                mfneg1[iday] = -1.0 * diff * self.volume[iday]
+        TP = (self.high + self.low + self.close)/3.0
+        
+        diff = TP[:-1] - TP[1:]
+        volume = self.volume[:-1]
+        mfpos1 = np.where(diff > 0, diff * volume, 0.0)
+        mfneg1 = np.where(diff > 0, 0.0, -1.0 * diff * volume)
                 
         mfpos14 = Stock.sma(mfpos1,14)
         mfneg14 = Stock.sma(mfneg1,14)
@@ -341,61 +642,34 @@ class Stock(object):
         
     def natr_calc(self):
         """ This method calculates the Normalized average true range"""
-        """First calculate true range """
-        TR1 = np.zeros(len(self.high)-1)
-        for iday in range(len(self.high)-1):
-            a = self.high[iday] - self.low[iday]
-            b = abs(self.high[iday] - self.close[iday+1])
-            c = abs(self.low[iday] - self.close[iday+1])
-            TR1[iday] = max(a, b, c)
-        
-        
-        """ Do 14 day Wilder EMA on data which corresponds to 27 day EMA """
-        TR14 = Stock.ema(TR1,27)
-        close = self.close
-        close = np.delete(close,-1)
-        self.natr = 100 * TR14/close
+        self.natr = 100 * self.tr14/self.close[:-1]
         return
         
     def roc_calc(self):
         """ This method calculates the percentage up or down from 12 days
             ago (Rate of change)"""
-        roc = np.zeros(len(self.close)-12)
-        for iday in range(len(self.close)-12):
-            roc[iday] = 100 * (self.close[iday] - self.close[iday+12]) \
-                    /self.close[iday+12]
-
-        self.roc = roc
+        past = self.close[12:]
+        self.roc = 100 * (self.close[:len(past)] - past)/past
         return
         
-    def stoch_calc(self):
+    def stoch_calc(self, period=14, smooth=3):
         """ This method calculates the Stochastic (STOCH)"""
-        high = self.high
-        low = self.low
-        percent_k = np.zeros(len(self.close)-14)
-    
-        for iday in range(len(self.close)-14):
-            highest_high = np.max(high[iday:iday+14])
-            lowest_low = np.min(low[iday:iday+14])
-            percent_k[iday] = (self.close[iday]-lowest_low)/(highest_high-lowest_low)
+        days = max(len(self.close)-period, 0)
+        highest_high = Stock.rolling_max(self.high, period)[:days]
+        lowest_low = Stock.rolling_min(self.low, period)[:days]
+        percent_k = (self.close[:days]-lowest_low)/(highest_high-lowest_low)
 #        percent_k[percent_k == nan] = 1.0
         where_are_NaNs = np.isnan(percent_k)
         percent_k[where_are_NaNs] = 1
 
-        self.stoch = 100 * Stock.sma(percent_k,3)
+        self.stoch = 100 * Stock.sma(percent_k,smooth)
+        self._state['stoch'] = (period, smooth)
         return
         
     def uo_calc(self):
         """ This method calculates the Ultimate Ocilator """
-        """First calculate true range """
-        TR = np.zeros(len(self.high)-1)
-        BP = np.zeros(len(self.high)-1)
-        for iday in range(len(self.high)-1):
-            low = min(self.low[iday], self.close[iday+1])
-            high = max(self.high[iday], self.close[iday+1])
-            BP[iday] = self.close[iday] - low
-            TR[iday] = high - low
-        
+        BP = self.bp
+        TR = self.tr
         
         """ Calculate 7, 14 and 28 day moving averages """
         ave7 = Stock.sma(BP,7)/Stock.sma(TR,7)
@@ -406,4 +680,210 @@ class Stock(object):
         self.uo = 100 * inv7 * (4.0*ave7 + 2.0*ave14 + ave28)
         self.uo = np.nan_to_num(self.uo)
         return
-        
\ No newline at end of file
+
+    def append(self, bars):
+        """ This method adds new trading days to the stock. bars holds
+            (date, open, high, low, close, volume) of each new day, oldest
+            first, with date in days since 1900 and later than the latest
+            quote of the stock. Any number of days can be added at once.
+
+            The indicators already calculated are advanced from the newest
+            values of their recurrences, so each new day costs the same
+            however long the history is. Indicators whose recurrences were
+            not kept, like those from a StockPanel or a UniverseStore, and
+            all indicators of a stock shorter than append_history days are
+            dropped and calculated again when next read.
+
+            The columns and indicators become newest first views of
+            buffers kept oldest first with room to spare (see _extend).
+            The first append copies each series into its buffer, after
+            that the new days are written in place and the buffers grow
+            by doubling, so the copying also comes to a fixed cost per
+            day. """
+
+        bars = np.asarray(bars, dtype=float).reshape(-1, 6)
+        if len(bars) == 0:
+            return
+        if (len(self.dates) > 0 and bars[0, 0] <= self.dates[0]) or \
+                np.any(np.diff(bars[:, 0]) <= 0):
+            raise ValueError('bars of {} must be newer than {} and in date '
+                             'order'.format(self.name, self.dates[:1]))
+        history = len(self.close)
+        new = bars[::-1]
+        for i, column in enumerate(Stock.columns):
+            setattr(self, column, self._extend(column, getattr(self, column),
+                                               bars[:, i]))
+
+        if history < Stock.append_history:
+            self._memo = {}
+            self._state = {}
+            return
+        for name in list(self._memo):
+            if not self._advances(name):
+                del self._memo[name]
+        values = dict((name, []) for name in self._memo)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for iday in range(len(new)-1, -1, -1):
+                self._advance(iday, values)
+        for name, new_values in values.items():
+            self._memo[name] = self._extend(name, self._memo[name],
+                                            new_values)
+        return
+
+    def _extend(self, name, series, new):
+        """ The newest first series with the values of new, given oldest
+            first, added in front of it. The result is a view of an oldest
+            first buffer. While series is still the view last handed out
+            for name the new values are written after it in place, which
+            leaves earlier views as they were; otherwise, or when the
+            buffer is full, a buffer twice the size is made. """
+        buffer, view = self._buffers.get(name, (None, None))
+        days = len(series)
+        total = days + len(new)
+        if view is not series or len(buffer) < total:
+            series = np.asarray(series)
+            buffer = np.empty(max(2 * total, Stock.append_chunk),
+                              dtype=series.dtype)
+            buffer[:days] = series[::-1]
+        buffer[days:total] = new
+        view = buffer[:total][::-1]
+        self._buffers[name] = (buffer, view)
+        return view
+
+    def _advances(self, name):
+        """ True when append can advance the indicator """
+        needs = {'rsi': ['rsi'], 'tsi': ['tsi'], 'ppo': ['ppo'],
+                 'dip14': ['adx'], 'dim14': ['adx'], 'adx': ['adx']}
+        if not all(state in self._state for state in needs.get(name, [])):
+            return False
+        if name in ['dip14', 'dim14', 'adx', 'natr']:
+            return 'tr14' in self._memo
+        if name == 'uo':
+            return 'tr' in self._memo and 'bp' in self._memo
+        return name in Stock.indicators or name in ['tr', 'bp', 'tr14']
+
+    def _advance(self, iday, values):
+        """ Work out the indicators in values for the new day iday, whose
+            earlier days are all known, and add them to values """
+        def newest(name):
+            return values[name][-1] if values[name] else self._memo[name][0]
+        def ema(before, value, N):
+            alpha = 2.0/(N+1)
+            return value*alpha + before*(1.0-alpha)
+        def bounded(value, limit=1E300):
+            value = float(np.nan_to_num(value))
+            return 0.0 if value >= limit else value
+
+        close, high, low = self.close, self.high, self.low
+        change = close[iday] - close[iday+1]
+        if 'tr' in values:
+            low_tr = min(low[iday], close[iday+1])
+            values['tr'].append(max(high[iday], close[iday+1]) - low_tr)
+            values['bp'].append(close[iday] - low_tr)
+            values['tr14'].append(ema(newest('tr14'), values['tr'][-1], 27))
+        if 'rsi' in values:
+            ave_gain, ave_loss = self._state['rsi']
+            ave_gain = (ave_gain*13 + max(change, 0.0))*(1/14)
+            ave_loss = (ave_loss*13 + max(-change, 0.0))*(1/14)
+            self._state['rsi'] = (ave_gain, ave_loss)
+            values['rsi'].append(100 - 100/(1.0 + ave_gain/ave_loss)
+                                 if ave_loss > 0 else 10)
+        if 'tsi' in values:
+            num_r, num_s, denom_r, denom_s = self._state['tsi']
+            num_r = ema(num_r, change, 25)
+            num_s = ema(num_s, num_r, 13)
+            denom_r = ema(denom_r, abs(change), 25)
+            denom_s = ema(denom_s, denom_r, 13)
+            self._state['tsi'] = (num_r, num_s, denom_r, denom_s)
+            values['tsi'].append(float(np.nan_to_num(num_s/denom_s)))
+        if 'ppo' in values:
+            short_ema, long_ema = self._state['ppo']
+            short_ema = ema(short_ema, close[iday], 12)
+            long_ema = ema(long_ema, close[iday], 26)
+            self._state['ppo'] = (short_ema, long_ema)
+            values['ppo'].append(bounded((short_ema - long_ema)/long_ema))
+        if 'adx' in values or 'dip14' in values or 'dim14' in values:
+            pls_change = high[iday] - high[iday+1]
+            mns_change = low[iday+1] - low[iday]
+            positive = pls_change > mns_change and pls_change > 0.0
+            DMP14, DMM14 = self._state['adx']
+            DMP14 = ema(DMP14, pls_change if positive else 0.0, 27)
+            DMM14 = ema(DMM14, mns_change if not positive and
+                        pls_change > 0 else 0.0, 27)
+            self._state['adx'] = (DMP14, DMM14)
+            dip14 = bounded(DMP14/newest('tr14'))
+            dim14 = bounded(DMM14/newest('tr14'))
+            dx = bounded(abs(dip14 - dim14)/(dip14 + dim14))
+            for name, value in (('dip14', dip14), ('dim14', dim14),
+                                ('adx', ema(newest('adx'), dx, 27))):
+                if name in values:
+                    values[name].append(value)
+        if 'natr' in values:
+            values['natr'].append(100 * newest('tr14')/close[iday])
+        if 'cci' in values:
+            period = self._state.get('cci', 20)
+            TP = (high[iday:iday+period] + low[iday:iday+period] +
+                  close[iday:iday+period])/3.0
+            TPMA = TP.mean()
+            deviation = np.abs(TP - TPMA).mean()
+            values['cci'].append(bounded((TP[0] - TPMA)/(0.015 * deviation)))
+        if 'cmo' in values:
+            diff = close[iday:iday+9] - close[iday+1:iday+10]
+            su = np.where(diff > 0, diff, 0.0).mean()
+            sd = np.where(diff > 0, 0.0, -diff).mean()
+            values['cmo'].append(bounded((su - sd)/(su + sd)))
+        if 'mfi' in values:
+            TP = (high[iday:iday+15] + low[iday:iday+15] +
+                  close[iday:iday+15])/3.0
+            diff = TP[:-1] - TP[1:]
+            flow = diff * self.volume[iday:iday+14]
+            mfpos14 = np.where(diff > 0, flow, 0.0).mean()
+            mfneg14 = max(np.where(diff > 0, 0.0, -flow).mean(), 0.0)
+            mfr = bounded(mfpos14/mfneg14) if mfneg14 != 0 else 1E299
+            values['mfi'].append(100 - 100/(1 + mfr))
+        if 'roc' in values:
+            values['roc'].append(100 * (close[iday] - close[iday+12]) /
+                                 close[iday+12])
+        if 'stoch' in values:
+            period, smooth = self._state.get('stoch', (14, 3))
+            percent_k = []
+            for day in range(iday, iday+smooth):
+                highest_high = high[day:day+period].max()
+                lowest_low = low[day:day+period].min()
+                k = (close[day] - lowest_low)/(highest_high - lowest_low)
+                percent_k.append(1.0 if np.isnan(k) else k)
+            values['stoch'].append(100 * np.mean(percent_k))
+        if 'uo' in values:
+            def average(name, N):
+                recent = values[name][::-1][:N]
+                older = self._memo[name][:N - len(recent)]
+                return (np.sum(recent) + older.sum())/N
+            inv7 = 1.0/7.0
+            uo = 100 * inv7 * (4.0*average('bp', 7)/average('tr', 7) +
+                               2.0*average('bp', 14)/average('tr', 14) +
+                               average('bp', 28)/average('tr', 28))
+            values['uo'].append(float(np.nan_to_num(uo)))
+        return
+
+
+def latest(a):
+    """ The newest value of a series, zero for an empty one """
+    return float(a[0]) if len(a) > 0 else 0.0
+
+
+def load_stock(job):
+    """ Populate one stock and calculate some of its indicators for
+        Stock.read_stocks. job is (symbol, directory, features). The result
+        is a dict of numpy arrays by attribute name, plus the recurrence
+        state for append, which is cheap to send back from a worker
+        process. """
+    symbol, directory, features = job
+    stock = Stock(symbol, directory)
+    stock.populate()
+    stock.indicators_calc(features)
+    arrays = {}
+    for attr in Stock.columns + Stock.indicators:
+        if attr in Stock.columns or stock.calculated(attr):
+            arrays[attr] = np.asarray(getattr(stock, attr))
+    arrays['_state'] = stock._state
+    return arrays
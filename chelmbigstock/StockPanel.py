@@ -0,0 +1,260 @@
+"""
+StockPanel object used in chelmbigstock
+
+Created: October 18, 2026
+"""
+
+import numpy as np
+
+from Stock import Stock
+
+
+class StockPanel(object):
+    """ The price columns of many stocks stacked into 2D arrays of
+        symbols x trading days so each indicator is calculated with array
+        operations over all stocks instead of one Stock at a time. It is
+        not a single pass: the windowed ones, like the mean deviation of
+        cci, take a pass over the panel per day of the window.
+
+        The rows are held oldest first, the order the recurrences run in,
+        so Stock.ema and the others work on them without reordering. Each
+        Stock attribute is a reversed view of its row.
+        """
+
+    columns = ['vopen', 'high', 'low', 'close', 'volume']
+
+    """ Each indicator is shorter than the price columns by the number of
+        old days it needs before its first value """
+    indicators = {'rsi': 0, 'tsi': 1, 'ppo': 0, 'dip14': 1, 'dim14': 1,
+                  'adx': 1, 'cci': 0, 'cmo': 1, 'mfi': 1, 'natr': 1,
+                  'roc': 12, 'stoch': 14, 'uo': 1}
+
+    def __init__(self, stocks):
+        """ The panel is made from populated stocks. Column j of a row is
+            the j-th trading day of that stock from its oldest quote, the
+            reverse of the Stock arrays. Stocks with a shorter history are
+            padded with NaN after their latest day; lengths holds the days
+            in each row. The indicators that are shorter than the price
+            columns leave out the oldest days, so they start at column 0
+            too. """
+
+        self.stocks = stocks
+        self.offsets = dict(StockPanel.indicators)
+        self.lengths = np.array([len(stock.close) for stock in stocks],
+                                dtype=int)
+        days = self.lengths.max() if len(stocks) > 0 else 0
+        for column in StockPanel.columns:
+            values = np.full((len(stocks), days), np.nan)
+            for i, stock in enumerate(stocks):
+                values[i, :self.lengths[i]] = getattr(stock, column)[::-1]
+            setattr(self, column, values)
+
+    def calc(self, features=None):
+        """ This method calculates the indicators named in features, by
+            default all of them, for all stocks in the panel and points the
+            attributes of each Stock at its row, reversed. The price columns of the
+            stocks become views into the panel as well. The indicators that
+            are left out are calculated by each Stock when first read. """
+
+        if features is None:
+            features = Stock.indicators
+        calcs = []
+        for indicator in features:
+            calc = getattr(Stock, indicator).calc
+            if calc not in calcs:
+                calcs.append(calc)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if set(calcs) & set(['adx_calc', 'natr_calc', 'uo_calc']):
+                self.true_range_calc()
+            for calc in calcs:
+                getattr(self, calc)()
+
+        for i, stock in enumerate(self.stocks):
+            days = self.lengths[i]
+            for column in StockPanel.columns:
+                setattr(stock, column, getattr(self, column)[i, :days][::-1])
+            for indicator, offset in self.offsets.items():
+                if hasattr(self, indicator):
+                    setattr(stock, indicator, getattr(self, indicator)
+                            [i, :max(days - offset, 0)][::-1])
+        return
+
+    def diff(self, values):
+        """ Change of each day from the day before. The result is one day
+            shorter than values """
+        return values[:, 1:] - values[:, :-1]
+
+    def mean_deviation(self, values, mean, N):
+        """ Mean absolute deviation of the N days up to each day from mean,
+            see Stock.mean_deviation. The oldest N days are left at zero.
+            The windows are summed one day back at a time, N passes over
+            the whole panel. A sliding_window_view of stocks x days x N
+            summed over its last axis gives the same numbers but took about
+            three times as long, as that array does not fit the cache. """
+        deviation = np.zeros(values.shape)
+        days = values.shape[1]
+        if days > N:
+            mean = mean[:, N:]
+            for back in range(N):
+                deviation[:, N:] += np.abs(values[:, N-back:days-back] - mean)
+            deviation[:, N:] /= float(N)
+        return deviation
+
+    def true_range_calc(self):
+        """ True range and buying pressure of each day, shared by adx, natr
+            and uo, and the 27 day ema of the true range. All are one day
+            shorter than the price columns """
+        prev_close = self.close[:, :-1]
+        low = np.minimum(self.low[:, 1:], prev_close)
+        high = np.maximum(self.high[:, 1:], prev_close)
+        self.bp = self.close[:, 1:] - low
+        self.tr = high - low
+        self.tr14 = Stock.ema(self.tr, 27, np.maximum(self.lengths - 1, 0))
+        return
+
+    def rsi_calc(self):
+        """ Relative strength index for a 14 day period, see
+            Stock.wilder_rsi """
+        self.rsi = Stock.wilder_rsi(self.close, self.lengths)
+        return
+
+    def tsi_calc(self):
+        """ True strength index with periods 25 and 13. The oldest change
+            is left at zero as in Stock.tsi_calc """
+        r = 25
+        s = 13
+        lengths = np.maximum(self.lengths - 1, 0)
+        diff = self.diff(self.close)
+        diff[:, :1] = 0.0
+        num_array = Stock.ema(diff, r, lengths)
+        num_array = Stock.ema(num_array, s, lengths)
+        denom_array = Stock.ema(np.abs(diff), r, lengths)
+        denom_array = Stock.ema(denom_array, s, lengths)
+        self.tsi = np.nan_to_num(num_array/denom_array)
+        return
+
+    def ppo_calc(self):
+        """ Percentage price oscillator with periods 12 and 26 """
+        r = 26
+        s = 12
+        long_ema = Stock.ema(self.close, r, self.lengths)
+        num_array = Stock.ema(self.close, s, self.lengths) - long_ema
+        self.ppo = np.nan_to_num(num_array/long_ema)
+        self.ppo[self.ppo >= 1E300] = 0
+        return
+
+    def adx_calc(self):
+        """ Directional movement indices and average directional index.
+            The oldest directional movement is left at zero as in
+            Stock.adx_calc """
+        lengths = np.maximum(self.lengths - 1, 0)
+        pls_change = self.diff(self.high)
+        mns_change = -self.diff(self.low)
+        positive = (pls_change > mns_change) & (pls_change > 0.0)
+        DMP1 = np.where(positive, pls_change, 0.0)
+        DMM1 = np.where(~positive & (pls_change > 0), mns_change, 0.0)
+        DMP1[:, :1] = 0.0
+        DMM1[:, :1] = 0.0
+
+        TR14 = self.tr14
+        DMP14 = Stock.ema(DMP1, 27, lengths)
+        DMM14 = Stock.ema(DMM1, 27, lengths)
+
+        self.dip14 = np.nan_to_num(DMP14/TR14)
+        self.dip14[self.dip14 > 1E300] = 0
+        self.dim14 = np.nan_to_num(DMM14/TR14)
+        self.dim14[self.dim14 > 1E300] = 0
+
+        dx = abs(self.dip14 - self.dim14)/(self.dip14 + self.dim14)
+        dx = np.nan_to_num(dx)
+        dx[dx >= 1E300] = 0
+        self.adx = Stock.ema(dx, 27, lengths)
+        return
+
+    def cci_calc(self, period=20):
+        """ Commodity channel index. The mean deviation is left at zero for
+            the oldest period days of each stock as in Stock.cci_calc """
+        TP = (self.high + self.low + self.close)/3.0
+        TPMA = Stock.sma(TP, period, self.lengths)
+
+        deviation = self.mean_deviation(TP, TPMA, period)
+
+        self.cci = (TP - TPMA)/(0.015 * deviation)
+        self.cci = np.nan_to_num(self.cci)
+        self.cci[self.cci >= 1E300] = 0
+        return
+
+    def cmo_calc(self):
+        """ Chande momentum oscillator over 9 days """
+        lengths = np.maximum(self.lengths - 1, 0)
+        diff = self.diff(self.close)
+        up = np.where(diff > 0, diff, 0.0)
+        down = np.where(diff > 0, 0.0, -1.0 * diff)
+        su = Stock.sma(up, 9, lengths)
+        sd = Stock.sma(down, 9, lengths)
+
+        self.cmo = (su - sd)/(su + sd)
+        self.cmo = np.nan_to_num(self.cmo)
+        self.cmo[self.cmo >= 1E300] = 0
+        return
+
+    def mfi_calc(self):
+        """ Money flow index over 14 days """
+        lengths = np.maximum(self.lengths - 1, 0)
+        TP = (self.high + self.low + self.close)/3.0
+        diff = self.diff(TP)
+        volume = self.volume[:, 1:]
+        mfpos1 = np.where(diff > 0, diff * volume, 0.0)
+        mfneg1 = np.where(diff > 0, 0.0, -1.0 * diff * volume)
+
+        mfpos14 = Stock.sma(mfpos1, 14, lengths)
+        mfneg14 = Stock.sma(mfneg1, 14, lengths)
+        mfneg14[mfneg14 < 0] = 0.0
+
+        mfr = mfpos14/mfneg14
+        mfr[mfneg14 == 0] = 1E299
+        mfr[mfr >= 1E300] = 0
+
+        self.mfi = 100 - 100/(1 + mfr)
+        return
+
+    def natr_calc(self):
+        """ Normalized average true range, using the 27 day ema of the
+            true range from true_range_calc """
+        self.natr = 100 * self.tr14/self.close[:, 1:]
+        return
+
+    def roc_calc(self):
+        """ Percentage change from 12 days ago """
+        now = self.close[:, 12:]
+        past = self.close[:, :now.shape[1]]
+        self.roc = 100 * (now - past)/past
+        return
+
+    def stoch_calc(self, period=14, smooth=3):
+        """ Stochastic over period days smoothed over smooth days """
+        lengths = np.maximum(self.lengths - period, 0)
+        highest_high = Stock.rolling_max(self.high, period)[:, 1:]
+        lowest_low = Stock.rolling_min(self.low, period)[:, 1:]
+        percent_k = (self.close[:, period:] - lowest_low)/(highest_high - lowest_low)
+        percent_k[np.isnan(percent_k)] = 1
+
+        self.stoch = 100 * Stock.sma(percent_k, smooth, lengths)
+        self.offsets['stoch'] = period
+        return
+
+    def uo_calc(self):
+        """ Ultimate oscillator from the 7, 14 and 28 day averages of the
+            buying pressure over the true range """
+        lengths = np.maximum(self.lengths - 1, 0)
+        BP = self.bp
+        TR = self.tr
+        ave7 = Stock.sma(BP, 7, lengths)/Stock.sma(TR, 7, lengths)
+        ave14 = Stock.sma(BP, 14, lengths)/Stock.sma(TR, 14, lengths)
+        ave28 = Stock.sma(BP, 28, lengths)/Stock.sma(TR, 28, lengths)
+
+        inv7 = 1.0/7.0
+        self.uo = 100 * inv7 * (4.0*ave7 + 2.0*ave14 + ave28)
+        self.uo = np.nan_to_num(self.uo)
+        return
@@ -0,0 +1,146 @@
+"""
+UniverseStore object used in chelmbigstock
+
+Created: October 18, 2026
+"""
+
+import os
+import json
+
+import numpy as np
+
+from Stock import Stock
+
+
+class UniverseStore(object):
+    """ A single memory mapped file with the columns and indicators of a
+        whole list of stocks. Every process that opens the store shares the
+        same page cached copy, and the Stock objects it hands out are views
+        into the file instead of arrays of their own.
+
+        The file is an 8 byte magic string, the length of a json header as
+        a little endian uint64, the header itself and then one block per
+        column or indicator. A block holds the arrays of all stocks back to
+        back; the header has the offset and length of every stock in every
+        block, the size and mtime of the csv file each stock came from and
+        the dtype and file offset of every block.
+        """
+
+    magic = b'CBSUNIV1'
+    align = 64
+
+    def __init__(self, path):
+        """ Open the store at path read only """
+        self.path = path
+        self._buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(self._buffer[:8]) != UniverseStore.magic:
+            raise ValueError('{} is not a universe store'.format(path))
+        header_size = int(self._buffer[8:16].view('<u8')[0])
+        self.header = json.loads(bytes(self._buffer[16:16 + header_size])
+                                 .decode('utf-8'))
+        self.symbols = self.header['symbols']
+        self.index = dict((symbol, i) for i, symbol in enumerate(self.symbols))
+        self.blocks = {}
+        for name, block in self.header['blocks'].items():
+            dtype = np.dtype(block['dtype'])
+            start = block['offset']
+            end = start + block['size'] * dtype.itemsize
+            self.blocks[name] = self._buffer[start:end].view(dtype)
+
+    @classmethod
+    def write(cls, path, stocks, dtype=np.float64):
+        """ Write the stocks to a new store at path and return it opened.
+            dtype is used for the price columns and the indicators, the
+            dates are always int64. Indicators that no stock has calculated
+            are left out; reading one of those from a stock of the store
+            calculates it then. """
+
+        names = Stock.columns + [name for name in Stock.indicators
+            if any(stock.calculated(name) for stock in stocks)]
+        offsets = {}
+        lengths = {}
+        blocks = {}
+        position = 0
+        for name in names:
+            block_dtype = np.dtype(np.int64 if name == 'dates' else dtype)
+            lengths[name] = [len(getattr(stock, name)) for stock in stocks]
+            offsets[name] = [int(o) for o in
+                             np.cumsum([0] + lengths[name][:-1])]
+            size = int(sum(lengths[name]))
+            blocks[name] = {'dtype': block_dtype.str, 'offset': position,
+                            'size': size}
+            position += cls._aligned(size * block_dtype.itemsize)
+
+        header = {'symbols': [stock.name for stock in stocks],
+                  'csv_stat': [cls._csv_stat(stock) for stock in stocks],
+                  'offsets': offsets, 'lengths': lengths, 'blocks': blocks}
+        """ The blocks start after the header, whose size changes once the
+            block offsets are added to it, so leave some room for that """
+        encoded = json.dumps(header).encode('utf-8')
+        first = cls._aligned(16 + len(encoded) + 20 * len(blocks))
+        for block in blocks.values():
+            block['offset'] += first
+        encoded = json.dumps(header).encode('utf-8')
+        assert 16 + len(encoded) <= first
+
+        temp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temp, 'wb') as f:
+            f.write(UniverseStore.magic)
+            f.write(np.array([len(encoded)], dtype='<u8').tobytes())
+            f.write(encoded)
+            for name in names:
+                block = blocks[name]
+                f.seek(block['offset'])
+                for stock in stocks:
+                    f.write(np.asarray(getattr(stock, name),
+                                       dtype=block['dtype']).tobytes())
+            f.truncate(first + position)
+        os.replace(temp, path)
+        return cls(path)
+
+    @staticmethod
+    def _aligned(size):
+        return -(-size // UniverseStore.align) * UniverseStore.align
+
+    @staticmethod
+    def _csv_stat(stock):
+        """ [mtime, size] of the csv file of the stock or None """
+        if stock.directory is None:
+            return None
+        try:
+            stat = os.stat(os.path.join(stock.directory, stock.name + '.csv'))
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def is_current(self, symbols, directory):
+        """ True when the store has every one of the symbols and their csv
+            files in directory have not changed since it was written """
+        for symbol in symbols:
+            if symbol not in self.index:
+                return False
+            stock = Stock(symbol, directory)
+            if self.header['csv_stat'][self.index[symbol]] != \
+                    UniverseStore._csv_stat(stock):
+                return False
+        return True
+
+    def column(self, name, symbol):
+        """ The view of one column or indicator of one stock """
+        i = self.index[symbol]
+        offset = self.header['offsets'][name][i]
+        return self.blocks[name][offset:offset +
+                                 self.header['lengths'][name][i]]
+
+    def stock(self, symbol, directory=None):
+        """ A Stock whose attributes are views into the store """
+        stock = Stock(symbol, directory)
+        for name in self.blocks:
+            setattr(stock, name, self.column(name, symbol))
+        return stock
+
+    def stocks(self, symbols=None, directory=None):
+        """ Stocks for the symbols, by default all in the store """
+        if symbols is None:
+            symbols = self.symbols
+        return [self.stock(symbol, directory) for symbol in symbols]
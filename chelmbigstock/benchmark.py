@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+
+"""
+Timings for the number crunching parts of chelmbigstock
+
+Each benchmark runs the current code next to the python loop it replaced
+and prints how long both take, so a speedup can be checked on any box with
+    python3 benchmark.py
+
+Created: October 18, 2026
+"""
+
+import csv
+import os
+import sys
+import timeit
+from datetime import date, timedelta
+
+import numpy as np
+
+from Stock import Stock
+
+
+def ema_loop(a, N):
+    """ Stock.ema as it was written before it was vectorized. Kept as the
+        baseline for the benchmark and as the reference for unit tests. """
+    alpha = 2.0/(N+1)
+    lengtha = len(a)
+    a_ema = np.zeros(lengtha)
+    a_sum = 0.0
+    for iday in range(lengtha-1, lengtha-(N+1),-1):
+        a_sum += a[iday]
+        a_ema[lengtha-N] = a_sum/N
+
+    for iday in range(lengtha-(N+1),-1,-1):
+        a_ema[iday] = a[iday]*alpha + a_ema[iday+1]*(1.0-alpha)
+    return a_ema
+
+
+def sma_loop(a, N):
+    """ Stock.sma as it was written before it was vectorized. """
+    lengtha = len(a)
+    a_sma = np.zeros(lengtha)
+    a_sum = 0.0
+    for iday in range(lengtha-1, lengtha-(N+1),-1):
+        a_sum += a[iday]
+        a_sma[iday] = a_sum/(lengtha - iday)
+
+    for iday in range(lengtha-(N+1),-1,-1):
+        a_sum += a[iday]
+        a_sum -= a[iday+N]
+        a_sma[iday] = a_sum/N
+    return a_sma
+
+
+def adx_loop(stock):
+    """ Stock.adx_calc as it was written before the shared true range
+        kernel, returning (dip14, dim14, adx) """
+    TR1 = np.zeros(len(stock.high)-1)
+    for iday in range(len(stock.high)-1):
+        a = stock.high[iday] - stock.low[iday]
+        b = abs(stock.high[iday] - stock.close[iday+1])
+        c = abs(stock.low[iday] - stock.close[iday+1])
+        TR1[iday] = max(a, b, c)
+    days = len(stock.close)
+    DMP1 = np.zeros(days-1)
+    DMM1 = np.zeros(days-1)
+    for iday in range(0, days-2):
+        pls_change = stock.high[iday] - stock.high[iday+1]
+        mns_change = stock.low[iday+1] - stock.low[iday]
+        if (pls_change > mns_change and pls_change > 0.0):
+            DMP1[iday] = pls_change
+        elif (pls_change > 0):
+            DMM1[iday] = mns_change
+    TR14 = Stock.ema(TR1,27)
+    dip14 = np.nan_to_num(Stock.ema(DMP1,27)/TR14)
+    dip14[dip14 > 1E300] = 0
+    dim14 = np.nan_to_num(Stock.ema(DMM1,27)/TR14)
+    dim14[dim14 > 1E300] = 0
+    dx = np.nan_to_num(abs(dip14 - dim14)/(dip14 + dim14))
+    dx[dx >= 1E300] = 0
+    return dip14, dim14, Stock.ema(dx,27)
+
+
+def natr_loop(stock):
+    """ Stock.natr_calc as it was written before the shared kernel """
+    TR1 = np.zeros(len(stock.high)-1)
+    for iday in range(len(stock.high)-1):
+        a = stock.high[iday] - stock.low[iday]
+        b = abs(stock.high[iday] - stock.close[iday+1])
+        c = abs(stock.low[iday] - stock.close[iday+1])
+        TR1[iday] = max(a, b, c)
+    return 100 * Stock.ema(TR1,27)/stock.close[:-1]
+
+
+def uo_loop(stock):
+    """ Stock.uo_calc as it was written before the shared kernel """
+    TR = np.zeros(len(stock.high)-1)
+    BP = np.zeros(len(stock.high)-1)
+    for iday in range(len(stock.high)-1):
+        low = min(stock.low[iday], stock.close[iday+1])
+        high = max(stock.high[iday], stock.close[iday+1])
+        BP[iday] = stock.close[iday] - low
+        TR[iday] = high - low
+    ave7 = Stock.sma(BP,7)/Stock.sma(TR,7)
+    ave14 = Stock.sma(BP,14)/Stock.sma(TR,14)
+    ave28 = Stock.sma(BP,28)/Stock.sma(TR,28)
+    return np.nan_to_num(100 * (1.0/7.0) * (4.0*ave7 + 2.0*ave14 + ave28))
+
+
+def cci_loop(stock, period=20):
+    """ Stock.cci_calc with the mean deviation loop it had before the
+        rolling window kernel """
+    TP = (stock.high + stock.low + stock.close)/3.0
+    TPMA = Stock.sma(TP,period)
+    deviation = np.zeros(len(TP))
+    for iday in range(len(TP)-period):
+        dev_sum = 0.0
+        TPMA_iday = TPMA[iday]
+        for i in range(0,period):
+            dev_sum += abs(TP[iday+i] - TPMA_iday)
+        deviation[iday] = dev_sum/float(period)
+    cci = np.nan_to_num((TP - TPMA)/(0.015 * deviation))
+    cci[cci >= 1E300] = 0
+    return cci
+
+
+def stoch_loop(stock, period=14):
+    """ Stock.stoch_calc with the max and min loop it had before the
+        rolling window kernel """
+    percent_k = np.zeros(len(stock.close)-period)
+    for iday in range(len(stock.close)-period):
+        highest_high = np.max(stock.high[iday:iday+period])
+        lowest_low = np.min(stock.low[iday:iday+period])
+        percent_k[iday] = (stock.close[iday]-lowest_low)/(highest_high-lowest_low)
+    percent_k[np.isnan(percent_k)] = 1
+    return 100 * Stock.sma(percent_k,3)
+
+
+def populate_loop(file):
+    """ The csv parsing of Stock.populate as it was written before the bulk
+        parse and the cache, returning (dates, vopen, high, low, close,
+        volume) as lists """
+    import dateutl
+    with open(file) as f:
+        reader = csv.reader(f)
+        headers = f.readline()
+        dates = []
+        vopen = []
+        high = []
+        low = []
+        close = []
+        volume = []
+        for row in reader:
+            try:
+                date = dateutl.days_since_1900(row[0])
+                adjustment = float(row[6])/float(row[4])
+                dates.append(date)
+                vopen.append(float(row[1])*adjustment)
+                high.append(float(row[2])*adjustment)
+                low.append(float(row[3])*adjustment)
+                close.append(float(row[4])*adjustment)
+                volume.append(float(row[5]))
+            except:
+                continue
+    return dates, vopen, high, low, close, volume
+
+
+def random_walk(days, seed=0):
+    """ A positive price series of the given number of days, newest first
+        like the Stock arrays """
+    rng = np.random.RandomState(seed)
+    return 50.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, days)))
+
+
+def random_stock(days, seed=0):
+    """ A Stock filled with random quotes instead of read from a file """
+    rng = np.random.RandomState(seed)
+    close = random_walk(days, seed)
+    stock = Stock('RND{}'.format(seed), None)
+    stock.dates = np.arange(30000 + days, 30000, -1)
+    stock.high = close * (1.0 + rng.uniform(0.0, 0.02, days))
+    stock.low = close * (1.0 - rng.uniform(0.0, 0.02, days))
+    stock.vopen = close.copy()
+    stock.close = close
+    stock.volume = rng.randint(1000, 100000, days).astype(float)
+    return stock
+
+
+def write_csv(stock, directory):
+    """ Write a stock to <directory>/<name>.csv in the Yahoo format that
+        Stock.populate reads """
+    start = date(1900, 1, 1)
+    with open(os.path.join(directory, stock.name + '.csv'), 'w') as f:
+        f.write('Date,Open,High,Low,Close,Volume,Adj Close\n')
+        for i in range(len(stock.dates)):
+            day = start + timedelta(days=int(stock.dates[i]))
+            values = [stock.vopen[i], stock.high[i], stock.low[i],
+                      stock.close[i], stock.volume[i], stock.close[i]]
+            f.write(','.join([str(day)] + [repr(float(v)) for v in values])
+                    + '\n')
+
+
+def compare(label, old, new, repeat, names=('loop', 'numpy')):
+    """ Time two callables and print the per call times and the speedup """
+    t_old = min(timeit.repeat(old, number=1, repeat=repeat))
+    t_new = min(timeit.repeat(new, number=1, repeat=repeat))
+    print('{:<24} {} {:9.3f} ms   {} {:9.3f} ms   x{:.0f}'.format(
+        label, names[0], t_old*1e3, names[1], t_new*1e3, t_old/t_new))
+
+
+def bench_moving_averages(days=10000, repeat=5):
+    """ ema and sma for the periods the indicators use """
+    a = random_walk(days)
+    for N in (12, 26, 27):
+        compare('ema N={} {}d'.format(N, days),
+                lambda: ema_loop(a, N), lambda: Stock.ema(a, N), repeat)
+    for N in (3, 14, 28):
+        compare('sma N={} {}d'.format(N, days),
+                lambda: sma_loop(a, N), lambda: Stock.sma(a, N), repeat)
+
+
+def bench_recurrences(days=10000, num_stocks=20, repeat=3):
+    """ rsi and ema of a panel with the python loops against the backend
+        in use, the compiled loops of kernels or lfilter """
+    import kernels
+    def python(function):
+        return getattr(function, 'py_func', function)
+    backend = 'numba' if kernels.compiled else 'lfilter'
+    close = np.vstack([random_walk(days, seed) for seed in range(num_stocks)])
+    lengths = np.full(num_stocks, days)
+    compare('rsi {}x{}d'.format(num_stocks, days),
+            lambda: python(kernels.rsi_rows)(close[:, ::-1], lengths),
+            lambda: Stock.wilder_rsi(close, lengths), repeat,
+            ('loop', backend))
+    compare('ema N=26 {}x{}d'.format(num_stocks, days),
+            lambda: python(kernels.ema_rows)(close[:, ::-1], 26),
+            lambda: Stock.ema(close, 26, lengths), repeat,
+            ('loop', backend))
+
+
+def bench_true_range(days=10000, repeat=5):
+    """ adx, natr and uo of one symbol, each with its own true range loop
+        against the shared vectorized kernel """
+    stock = random_stock(days)
+    def loops():
+        adx_loop(stock)
+        natr_loop(stock)
+        uo_loop(stock)
+    def kernel():
+        fresh = Stock(stock.name, None)
+        for column in Stock.columns:
+            setattr(fresh, column, getattr(stock, column))
+        fresh.adx
+        fresh.natr
+        fresh.uo
+    compare('adx natr uo {}d'.format(days), loops, kernel, repeat,
+            ('loops', 'kernel'))
+
+
+def bench_rolling(days=10000, repeat=5):
+    """ cci and stoch with the per day window loops against the rolling
+        window kernels, for the usual and for longer windows """
+    stock = random_stock(days)
+    for period in (20, 100):
+        compare('cci N={} {}d'.format(period, days),
+                lambda: cci_loop(stock, period),
+                lambda: stock.cci_calc(period), repeat)
+    for period in (14, 100):
+        compare('stoch N={} {}d'.format(period, days),
+                lambda: stoch_loop(stock, period),
+                lambda: stock.stoch_calc(period), repeat)
+
+
+def bench_append(days=10000, repeat=5):
+    """ One new day of quotes by calculating every indicator again against
+        advancing them with Stock.append """
+    stock = random_stock(days + 1)
+    bar = [getattr(stock, column)[0] for column in Stock.columns]
+    def history():
+        """ The stock without its newest day and with its indicators """
+        old = Stock(stock.name, None)
+        for column in Stock.columns:
+            setattr(old, column, getattr(stock, column)[1:])
+        old.indicators_calc()
+        return old
+    def recalc():
+        new = Stock(stock.name, None)
+        for column in Stock.columns:
+            setattr(new, column, getattr(stock, column))
+        new.indicators_calc()
+    olds = [history() for i in range(repeat)]
+    compare('append 1 day {}d'.format(days), recalc,
+            lambda: olds.pop().append(bar), repeat, ('recalc', 'append'))
+
+    """ Once a stock has its buffers a day costs the same at any length """
+    steps = 250
+    def ready(n):
+        """ A stock of n days that has been appended to once and the bars
+            of the days after it """
+        extra = random_stock(n + steps + 1)
+        old = Stock(extra.name, None)
+        for column in Stock.columns:
+            setattr(old, column, getattr(extra, column)[steps + 1:])
+        old.indicators_calc()
+        bars = np.column_stack([getattr(extra, column)[steps::-1]
+                                for column in Stock.columns])
+        old.append(bars[0])
+        return old, bars[1:]
+    def daily(stocks):
+        old, bars = stocks.pop()
+        for bar in bars:
+            old.append(bar)
+    short = [ready(days // 10) for i in range(repeat)]
+    long = [ready(days) for i in range(repeat)]
+    compare('append {} days'.format(steps), lambda: daily(short),
+            lambda: daily(long), repeat,
+            ('{}d'.format(days // 10), '{}d'.format(days)))
+
+
+def bench_panel(days=10000, num_stocks=20, repeat=3):
+    """ All indicators one Stock at a time against one StockPanel """
+    from StockPanel import StockPanel
+    def each_stock():
+        for seed in range(num_stocks):
+            random_stock(days, seed).indicators_calc()
+    def panel():
+        StockPanel([random_stock(days, seed)
+                    for seed in range(num_stocks)]).calc()
+    compare('{} stocks {}d'.format(num_stocks, days), each_stock, panel,
+            repeat, ('stocks', 'panel'))
+
+
+def bench_learning_data(num_stocks=2000, num_dates=50, days=600, repeat=3):
+    """ LearningData built one date and one stock at a time against
+        construct_all gathering from the feature tensor """
+    from LearningData import LearningData
+    from StockPanel import StockPanel
+    stocks = [random_stock(days - seed % 100, seed)
+              for seed in range(num_stocks)]
+    StockPanel(stocks).calc()
+    dates = list(np.linspace(30000 + 50, 30000 + days - 30, num_dates)
+                 .astype(int))
+    features = Stock.indicators
+    def loop():
+        data = LearningData()
+        data.construct(stocks, dates[0], 25, features)
+        for date in dates[1:]:
+            data.append(stocks, date, 25, features)
+    compare('learning data {}x{}'.format(num_stocks, num_dates), loop,
+            lambda: LearningData().construct_all(stocks, dates, 25, features),
+            repeat, ('loop', 'tensor'))
+
+
+def bench_dates(days=10000, repeat=5):
+    """ days_since_1900 one date at a time against the bulk conversion """
+    import dateutl
+    start = date(1970, 1, 1)
+    dates = [str(start + timedelta(days=i)) for i in range(days)]
+    compare('dates {}d'.format(days),
+            lambda: [dateutl.days_since_1900(d) for d in dates],
+            lambda: dateutl.days_since_1900_array(dates), repeat)
+
+
+def bench_populate(days=10000, repeat=5):
+    """ Parsing a csv file a line at a time as populate did, against the
+        bulk parse of read_csv and against reading the binary cache """
+    import shutil
+    import tempfile
+    directory = tempfile.mkdtemp()
+    try:
+        stock = random_stock(days)
+        write_csv(stock, directory)
+        file = os.path.join(directory, stock.name + '.csv')
+        Stock(stock.name, directory).populate()
+        compare('populate csv {}d'.format(days), lambda: populate_loop(file),
+                lambda: Stock(stock.name, directory).read_csv(file), repeat,
+                ('loop', 'csv'))
+        compare('populate cache {}d'.format(days),
+                lambda: populate_loop(file),
+                lambda: Stock(stock.name, directory).populate(), repeat,
+                ('loop', 'cache'))
+    finally:
+        shutil.rmtree(directory)
+
+
+def main(argv):
+    days = int(argv[1]) if len(argv) > 1 else 10000
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bench_moving_averages(days)
+        bench_recurrences(days)
+        bench_true_range(days)
+        bench_append(days)
+        bench_rolling(days)
+        bench_panel(days)
+        bench_learning_data()
+        bench_dates(days)
+        bench_populate(days)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
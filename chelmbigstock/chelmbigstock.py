@@ -13,12 +13,14 @@ from operator import itemgetter
 
 import numpy as np
 from sklearn import linear_model
+import time
 import timeit
 from scipy.stats import anderson
 
 import dateutl
 from Stock import Stock
-from LearningData import LearningData
+from LearningData import LearningData, FeatureCache
+from RidgePath import RidgePath
 
 from sklearn import preprocessing
 
@@ -35,23 +37,13 @@ def form_data(stocks, init_param):
     a = 1
     
         
-    for date in init_param.reference_dates:
-        try:
-            training_data
-        except NameError:
-            training_data = LearningData()
-            training_data.construct(stocks, date, init_param.future_day, init_param.features)
-        else:
-            training_data.append(stocks, date, init_param.future_day, init_param.features)
+    training_data = LearningData()
+    training_data.construct_all(stocks, init_param.reference_dates,
+                                init_param.future_day, init_param.features)
             
-    for date in init_param.test_dates:
-        try:
-            test_data
-        except NameError:
-            test_data = LearningData()
-            test_data.construct(stocks, date, init_param.future_day, init_param.features)
-        else:
-            test_data.append(stocks, date, init_param.future_day, init_param.features)
+    test_data = LearningData()
+    test_data.construct_all(stocks, init_param.test_dates,
+                            init_param.future_day, init_param.features)
     
     #reference_date = dateutl.days_since_1900('1991-01-01')
     #test_data.construct(stocks,[reference_date, day_history, init_param.future_day])
@@ -113,72 +105,83 @@ def logistic_reg(training_data):
     lr.fit(training_data.X, training_data.y)
     return lr, C_max
 
-def set_reg_param(training_data, cv_data, alpha_min, alpha_max):
+def set_reg_param(training_data, cv_data, alpha_min, alpha_max, path=None,
+                  alpha_file=None, workers=None):
     """ This function does a linear regression with regularization for training_data
         then tests prediction for training_data and cv_data over a range of regularization
         parameters. If a local minimum is found it returns the parameter and a 0 to indicate
         it is complete. If minimum it below alpha_min it returns -1 for flag. If it is above
-        alpha_max, it returns 1 for flag. """
-        
-    f = open('alpha.txt', 'w')
-    
-    alph = alpha_min
-    min_alpha = alpha_min # This is the value of alpha in our range that gives minimum for cv data
-    alpha_largest = alpha_min # Learning is not generally done at alpha_min, this tracks larget alpha
-    while alph < alpha_max:
-        """ Learn for this parameter """
-        clf = linear_model.Ridge (alpha=alph, fit_intercept=False)
-        clf.fit(training_data.X, training_data.y)
-        
-        """ Get prediction for this parameter """
-        predict_data = clf.predict(training_data.X)
-        predict_cv = clf.predict(cv_data.X)
+        alpha_max, it returns 1 for flag. 
         
-        """ Caculate the differences from actual data for training and cv data"""
-        diff_training = (1.0/training_data.m) * np.linalg.norm(predict_data - training_data.y)
-        diff_cv = (1.0/cv_data.m) * np.linalg.norm(predict_cv - cv_data.y)
+        The alphas are those of the grid of RidgePath between alpha_min and
+        alpha_max. path is a RidgePath of the data, to be passed again when
+        the range is widened so alphas already tried are not fitted again;
+        without one a path is made that evaluates in workers threads. The
+        errors are written to alpha_file for plotting when it is given. """
         
-        """ Write out the values for plotting. Do appropriate work to determine min_val_alpha """
-        f.write(str(alph) +  " " + str(diff_training) + " " + str(diff_cv) +  "\n")
-        if alph == alpha_min:
-            min_diff = diff_cv # Just setting default value for first value of alph 
-            min_alpha = alpha_min
-        if diff_cv < min_diff:
-            """ We have a new minimum so value and alph must be recored """
-            min_diff = diff_cv
-            min_alpha = alph
-        alpha_largest = alph # Keep track of largest alpha used
-        alph = alph * 1.5 # increment alph
-    f.close()
+    if path is None:
+        path = RidgePath(training_data, cv_data, workers)
+    
+    steps = path.steps(alpha_min, alpha_max)
+    alphas = [path.alpha(k) for k in steps]
+    errors = path.evaluate(steps)
+    
+    best = 0 # This is the index of the alpha in our range that gives minimum for cv data
+    for i, (diff_training, diff_cv) in enumerate(errors):
+        if diff_cv < errors[best][1]:
+            """ We have a new minimum so its index must be recorded """
+            best = i
+    min_alpha = alphas[best]
+    
+    if alpha_file is not None:
+        """ Write out the values for plotting """
+        with open(alpha_file, 'w') as f:
+            for alph, (diff_training, diff_cv) in zip(alphas, errors):
+                f.write(str(alph) +  " " + str(diff_training) + " " + str(diff_cv) +  "\n")
             
     """ Loop is now complete. If min_value_alpha is not alpha_min or alpha_max, return flag of 0
             else return -1 or 1 so min or max can be adjusted and loop completed again """
-    if abs(min_alpha - alpha_min) < alpha_min/10.0:
+    if best == 0:
         flag = -1 # Local minimum is less than alpha_min so return -1 
-    elif abs(min_alpha - alpha_largest) < alpha_min/10.0:
+    elif best == len(alphas) - 1:
         flag = 1 # Local minimum is greater than alpha_max so return 1 
     else:
         flag = 0 # Local minimum is in range so return 0 
         
     return min_alpha, flag
     
-def examine(stocks, init_param, C_in, gamma_in, verbose):
-    """ This plot takes in the stocks and features. It plots a ROC curve
-        returns the Area under the curve"""
+def svm_roc(training_X, training_y, test_X, test_y, C, gamma):
+    """ Fits an rbf SVC to the training data and returns the false and true
+        positive rates of the ROC curve of its predictions on the test
+        data """
     from sklearn.svm import SVC
     from sklearn import metrics
+    
+    svm = SVC(kernel='rbf', random_state=0, gamma = gamma, C=C, probability=True)
+    svm.fit(training_X, training_y)
+    preds = svm.predict_proba(test_X)[:,1]
+    fpr, tpr, _ = metrics.roc_curve(test_y, preds)
+    return fpr, tpr
+    
+def examine(stocks, init_param, C_in, gamma_in, verbose, cache=None):
+    """ This plot takes in the stocks and features. It plots a ROC curve
+        returns the Area under the curve. With a FeatureCache of the stocks
+        the standardized data comes from the cache instead of being formed
+        again."""
+    from sklearn import metrics
     import matplotlib.pyplot as plt
 #    import pandas as pd
     
-    training_data, test_data = form_data(stocks, init_param)
-    std_scale = preprocessing.StandardScaler().fit(training_data.X)
-    training_data.X = std_scale.transform(training_data.X)
-    test_data.X = std_scale.transform(test_data.X)
+    if cache is not None:
+        training_data, test_data = cache.data(init_param)
+    else:
+        training_data, test_data = form_data(stocks, init_param)
+        std_scale = preprocessing.StandardScaler().fit(training_data.X)
+        training_data.X = std_scale.transform(training_data.X)
+        test_data.X = std_scale.transform(test_data.X)
     
-    svm = SVC(kernel='rbf', random_state=0, gamma = gamma_in, C=C_in, probability=True)
-    svm.fit(training_data.X, training_data.y)
-    preds = svm.predict_proba(test_data.X)[:,1]
-    fpr, tpr, _ = metrics.roc_curve(test_data.y, preds)
+    fpr, tpr = svm_roc(training_data.X, training_data.y, test_data.X,
+                       test_data.y, C_in, gamma_in)
 
 #    df = pd.DataFrame(dict(fpr=fpr, tpr=tpr))
     roc_auc = metrics.auc(fpr,tpr)
@@ -199,12 +202,118 @@ def examine(stocks, init_param, C_in, gamma_in, verbose):
     
     return roc_auc
     
-def choose_features(stocks, init_param, C, gamma):
+def share_arrays(arrays):
+    """ Copies the arrays into blocks of shared memory. Returns the blocks,
+        which the caller closes and unlinks, and the name, shape and dtype
+        of each for attach_arrays in another process """
+    from multiprocessing import shared_memory
+    blocks, specs = [], []
+    for a in arrays:
+        block = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+        np.ndarray(a.shape, dtype=a.dtype, buffer=block.buf)[...] = a
+        blocks.append(block)
+        specs.append((block.name, a.shape, a.dtype.str))
+    return blocks, specs
+
+""" The blocks and arrays a worker process has attached """
+shared = {}
+
+def attach_arrays(specs):
+    """ Pool initializer that maps the arrays of share_arrays into the
+        worker without copying them. The blocks are closed again by
+        detach_arrays when the worker exits. """
+    from multiprocessing import shared_memory, util
+    shared['blocks'] = [shared_memory.SharedMemory(name=name)
+                        for name, shape, dtype in specs]
+    shared['arrays'] = [np.ndarray(shape, dtype=dtype, buffer=block.buf)
+                        for block, (name, shape, dtype) in
+                        zip(shared['blocks'], specs)]
+    util.Finalize(None, detach_arrays, exitpriority=0)
+
+def detach_arrays():
+    """ Drops the arrays in shared and closes the blocks attach_arrays
+        opened, if any """
+    blocks = shared.pop('blocks', [])
+    shared.clear()
+    for block in blocks:
+        block.close()
+
+def candidate_aoc(job):
+    """ Area under the ROC curve for one set of columns of the shared
+        standardized matrices """
+    from sklearn import metrics
+    columns, C, gamma = job
+    training_X, training_y, test_X, test_y = shared['arrays']
+    fpr, tpr = svm_roc(training_X[:, columns], training_y,
+                       test_X[:, columns], test_y, C, gamma)
+    return metrics.auc(fpr, tpr)
+
+""" The columns of the table returned by c_sweep """
+sweep_dtype = np.dtype([('C', float), ('train_errors', int),
+                        ('train_accuracy', float), ('test_errors', int),
+                        ('test_accuracy', float)])
+
+def c_sweep_row(job):
+    """ One row of the c_sweep table from the shared Gram matrices """
+    from sklearn.svm import SVC
+    C, = job
+    train_gram, training_y, test_gram, test_y = shared['arrays']
+    svm = SVC(kernel='precomputed', random_state=0, C=C)
+    svm.fit(train_gram, training_y)
+    train_errors = np.count_nonzero(svm.predict(train_gram) - training_y)
+    test_errors = np.count_nonzero(svm.predict(test_gram) - test_y)
+    return (C, train_errors, 1.0 - train_errors/len(training_y),
+            test_errors, 1.0 - test_errors/len(test_y))
+
+def c_sweep(training_data, test_data, gamma, C_values, workers=None):
+    """ Fits an rbf SVC to the training data for each of the C_values and
+        returns a table with a row per C of the errors and accuracy on the
+        training and test data, with the columns of sweep_dtype. The rbf
+        kernel of the training data with itself and of the test data with
+        the training data is worked out once and every fit reuses it. With
+        workers greater than one the fits run in that many processes,
+        which read the kernel from shared memory. """
+    from sklearn.metrics.pairwise import rbf_kernel
+    
+    training_X = np.asarray(training_data.X, dtype=float)
+    arrays = [rbf_kernel(training_X, gamma=gamma),
+              np.asarray(training_data.y),
+              rbf_kernel(np.asarray(test_data.X, dtype=float), training_X,
+                         gamma=gamma),
+              np.asarray(test_data.y)]
+    jobs = [(C,) for C in C_values]
+    if workers is not None and workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        blocks = []
+        try:
+            blocks, specs = share_arrays(arrays)
+            with ProcessPoolExecutor(max_workers=workers,
+                                     initializer=attach_arrays,
+                                     initargs=(specs,)) as pool:
+                rows = list(pool.map(c_sweep_row, jobs))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+    else:
+        shared['arrays'] = arrays
+        try:
+            rows = [c_sweep_row(job) for job in jobs]
+        finally:
+            detach_arrays()
+    return np.array(rows, dtype=sweep_dtype)
+
+def choose_features(stocks, init_param, C, gamma, verbose=False):
     """ This function chooses the feature from the available_features array
         that when added to chosen_features give maximium area under curve. 
         It returns chosen features and available_features arrays with 
         the best feature added to the former and removed from the latter.
-        It also appends the best aoc onto the aoc array"""
+        It also appends the best aoc onto the aoc array
+
+        With init_param.workers greater than one the candidates of a round
+        are scored in that many processes, which read the standardized
+        matrices from shared memory. With verbose each round prints the
+        feature it chose and how long it took."""
         
     chosen_features = []
     available_features = init_param.features[:]
@@ -212,21 +321,53 @@ def choose_features(stocks, init_param, C, gamma):
        restore things after the loop"""
     init_param_features = init_param.features[:]
     aoc = []
-    
-    while (len(available_features) > 5):
-        best_aoc = 0
-        for feature in available_features:
-            input_features = chosen_features[:]
-            input_features.append(feature)
-            init_param.features = input_features
-            feature_aoc = examine(stocks, init_param, C, gamma, False)
-            if feature_aoc > best_aoc:
-                best_aoc = feature_aoc
-                best_feature = feature
+    cache = FeatureCache(stocks, init_param.features)
+    
+    pool = None
+    blocks = []
+    try:
+        if init_param.workers is not None and init_param.workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            training_data, test_data = cache.matrices(init_param)
+            blocks, specs = share_arrays([training_data.X, training_data.y,
+                                          test_data.X, test_data.y])
+            pool = ProcessPoolExecutor(max_workers=init_param.workers,
+                                       initializer=attach_arrays,
+                                       initargs=(specs,))
+        while (len(available_features) > 5):
+            start = time.perf_counter()
+            candidates = [chosen_features + [feature]
+                          for feature in available_features]
+            if pool is None:
+                candidate_aocs = []
+                for input_features in candidates:
+                    init_param.features = input_features
+                    candidate_aocs.append(examine(stocks, init_param, C,
+                                                  gamma, False, cache))
+            else:
+                jobs = [(cache.columns(input_features), C, gamma)
+                        for input_features in candidates]
+                candidate_aocs = list(pool.map(candidate_aoc, jobs))
             
-        chosen_features.append(best_feature)
-        available_features.remove(best_feature)
-        aoc.append(best_aoc)
+            best_aoc = 0
+            for feature, feature_aoc in zip(available_features, candidate_aocs):
+                if feature_aoc > best_aoc:
+                    best_aoc = feature_aoc
+                    best_feature = feature
+                
+            chosen_features.append(best_feature)
+            available_features.remove(best_feature)
+            aoc.append(best_aoc)
+            if verbose:
+                print("round", len(chosen_features), "chose", best_feature,
+                      "with aoc", best_aoc, "from", len(candidates),
+                      "candidates in", time.perf_counter() - start, "s")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        for block in blocks:
+            block.close()
+            block.unlink()
     
     """ Restore init_param.features """
     init_param.features = init_param_features[:]
@@ -240,10 +381,12 @@ def execute(init_param):
     """ execute is the function where each run is done. main sets parameters then calls execute"""
     
     
-    from sklearn.svm import SVC
     import matplotlib.pyplot as plt
     start = timeit.timeit()
-    stocks = Stock.read_stocks('../data/stocks_read.txt', init_param.max_stocks)
+    stocks = Stock.read_stocks('../data/stocks_read.txt', init_param.max_stocks,
+                               workers=init_param.workers,
+                               store=init_param.store,
+                               features=init_param.features)
  #   stocks = 1
     
     """ Chose the best feature """
@@ -251,7 +394,7 @@ def execute(init_param):
 #    available_features = init_param.features
     C = 1
     gamma = 0.2
-    chosen_features, available_features, aoc = choose_features(stocks, init_param, C, gamma)
+    chosen_features, available_features, aoc = choose_features(stocks, init_param, C, gamma, True)
 
     init_param.features = ['rsi','tsi']
     verbose = True
@@ -277,23 +420,16 @@ def execute(init_param):
     print("accuracy is ",accuracy)
     end2 = timeit.timeit()
     print("regression took ",(end2-end1))"""
-    train_errors, test_errors, C_arr = [], [], []
-    train_accuracy, test_accuracy = [],[]
+    C_arr = []
     C_i = 0.01
     while C_i < 10:
-        svm = SVC(kernel='rbf', random_state=0, gamma = 0.2, C=C_i)
-        svm.fit(training_data.X, training_data.y)
-        train_errors.append(np.count_nonzero(svm.predict(training_data.X)-training_data.y))
-        accuracy = 1.0 - np.count_nonzero(svm.predict(training_data.X)-training_data.y)/len(training_data.y)
-        train_accuracy.append(accuracy)
-        test_errors.append(np.count_nonzero(svm.predict(test_data.X)-test_data.y))
-        accuracy = 1.0 - np.count_nonzero(svm.predict(test_data.X)-test_data.y)/len(test_data.y)
-        test_accuracy.append(accuracy)
         C_arr.append(C_i)
         C_i = C_i *1.1
+    sweep = c_sweep(training_data, test_data, 0.2, C_arr, init_param.workers)
+    accuracy = sweep['test_accuracy'][-1]
         
-    plt.plot(C_arr, train_accuracy,c='r')
-    plt.plot(C_arr, test_accuracy,c='b')
+    plt.plot(sweep['C'], sweep['train_accuracy'],c='r')
+    plt.plot(sweep['C'], sweep['test_accuracy'],c='b')
     plt.xscale('log')
     plt.show()
     
@@ -329,6 +465,13 @@ class InitialParameters(object):
         
         #self.max_stocks = 100
         self.max_stocks = 200
+        """ workers is the number of processes used to load the stocks and
+            calculate their indicators """
+        self.workers = 1
+        """ store is the name of a UniverseStore file holding the stocks and
+            their indicators, shared by every process that opens it. None
+            means the stocks are loaded into memory on every run """
+        self.store = None
         """ cv_factor determines what portion of stocks to put in cross validation set and what portion
             to leave in training set. cv_factor = 2 means every other stock goes into cross validation
             set. cv_factor = 3 means every third stock goes into cross validation set """
@@ -6,6 +6,8 @@ number of days since 1900
 Created: March 1, 2014
 """
 
+import numpy as np
+
 def days_since_1900(date):
     """Convert string date to days since 1/1/1900
     Intakes a date month/day/year and returns number of days since 1/1/1900
@@ -39,27 +41,57 @@ def days_since_1900(date):
     return(days)
 
 
+def days_since_1900_array(dates):
+    """Convert a whole column of 'yyyy-mm-dd' dates to days since 1/1/1900
+    at once. numpy parses them as datetime64 and the days are counted from
+    there. The result matches days_since_1900 for every date: those before
+    March 1900 or from March 2100 on, where days_since_1900 does not follow
+    the calendar, are converted one at a time by days_since_1900.
+    days_since_1900_array(['1950-01-01']) -> array([18262])
+    """
+
+    days = (np.asarray(dates, dtype='datetime64[D]') -
+            np.datetime64('1900-01-01', 'D')).astype(np.int64)
+    outside = (days < 59) | (days >= 73108)
+    if outside.any():
+        days[outside] = [days_since_1900(date) for date in
+                         np.asarray(dates, dtype=str)[outside]]
+    return days
+
+
 def find_ref_date_idx(stock, ref_date):
     """ Find index of ref_date. ref_date might not be a trading day in which case
-        we will start with index of first trading day after ref_date
+        we will start with index of first trading day after ref_date. -1 is
+        returned when ref_date is before all dates or there are none, and 0
+        when it is after all of them.
         """
-        
-    l = 0
-    r = len(stock.dates)
-    if r == 0:
-        return -1        # when no dates, what should we return?
-    
-    if ref_date < min(stock.dates):
-        return -1        # when ref_date is less than all in array return -1
-
-    while l < r - 1:
-        m = l + (r - l) // 2
-        if stock.dates[m] > ref_date:
-            l = m
-        elif stock.dates[m] < ref_date:
-            r = m
-        else:
-            return m
-
-    return l
+    return int(find_ref_date_idxs(stock, [ref_date])[0])
+
+
+def find_ref_date_idxs(stock, ref_dates):
+    """ find_ref_date_idx for many reference dates at once, returned as an
+        array of indexes. The dates of the stock are newest first, so the
+        search is done with np.searchsorted on the oldest first copy that a
+        Stock keeps as its date index. """
+    if hasattr(stock, 'date_index'):
+        ascending = stock.date_index()
+    else:
+        ascending = np.ascontiguousarray(np.asarray(stock.dates)[::-1])
+    ref_dates = np.asarray(ref_dates)
+    days = len(ascending)
+    if days == 0:
+        return np.full(ref_dates.shape, -1, dtype=int)
+    position = np.searchsorted(ascending, ref_dates)
+    idxs = days - 1 - position
+    idxs[position == days] = 0
+    idxs[ref_dates < ascending[0]] = -1
+    return idxs
+
 
+def find_ref_date_table(stocks, ref_dates):
+    """ Index of every reference date in every stock as a stocks x
+        ref_dates array """
+    table = np.empty((len(stocks), len(ref_dates)), dtype=int)
+    for i, stock in enumerate(stocks):
+        table[i] = find_ref_date_idxs(stock, ref_dates)
+    return table
@@ -0,0 +1,93 @@
+"""
+Compiled loops for the recurrences of the stock indicators
+
+The Wilder averages of rsi and the tail of an ema depend on the value of
+the day before, so numpy can only run them through scipy's lfilter, which
+rounds differently from the original loops. When numba is installed the
+loops below are compiled once and give the exact numbers of the original
+python code at the speed of C. Without numba they stay plain python and
+Stock falls back to lfilter.
+
+compiled is decided at import time. It can be turned off with the
+environment variable CHELMBIGSTOCK_NUMBA=0 or by setting kernels.compiled
+to False before the indicators are calculated.
+
+Created: October 18, 2026
+"""
+
+import os
+
+import numpy as np
+
+try:
+    from numba import njit
+    compiled = os.environ.get('CHELMBIGSTOCK_NUMBA', '1') != '0'
+except ImportError:
+    compiled = False
+
+    def njit(*args, **kwargs):
+        """ Stands in for numba.njit and leaves the function as it is """
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+
+@njit(cache=True)
+def ema_rows(chron, N):
+    """ ema of period N along each row of a 2D array of oldest first
+        series with at least N days. The mean of the oldest N days seeds
+        the recurrence and the days before the seed are zero. """
+    alpha = 2.0/(N+1)
+    result = np.zeros(chron.shape)
+    for row in range(chron.shape[0]):
+        a_sum = 0.0
+        for iday in range(N):
+            a_sum += chron[row, iday]
+        result[row, N-1] = a_sum/N
+        for iday in range(N, chron.shape[1]):
+            result[row, iday] = chron[row, iday]*alpha + \
+                result[row, iday-1]*(1.0-alpha)
+    return result
+
+
+@njit(cache=True)
+def rsi_rows(chron, lengths):
+    """ 14 day relative strength index along each row of a 2D array of
+        oldest first closing prices, row i holding lengths[i] days. Rows
+        shorter than 16 days are left at zero. Returns the index and the
+        average gain and loss of the latest day of each row. """
+    oneO14 = 1/14
+    result = np.zeros(chron.shape)
+    gains = np.zeros(chron.shape[0])
+    losses = np.zeros(chron.shape[0])
+    for row in range(chron.shape[0]):
+        if lengths[row] < 16:
+            continue
+        ave_gain = 0.0
+        ave_loss = 0.0
+        last_val = chron[row, 0]
+        for iday in range(1, 14):
+            gain = chron[row, iday] - last_val
+            if gain > 0:
+                ave_gain += gain
+            else:
+                ave_loss -= gain
+            last_val = chron[row, iday]
+
+        for iday in range(15, lengths[row]):
+            gain = chron[row, iday] - last_val
+            if gain > 0:
+                ave_gain = (ave_gain*13 + gain)*oneO14
+                ave_loss = (ave_loss*13)*oneO14
+            else:
+                ave_gain = (ave_gain*13)*oneO14
+                ave_loss = (ave_loss*13 - gain)*oneO14
+            last_val = chron[row, iday]
+            if ave_loss > 0:
+                RS = ave_gain/ave_loss
+                result[row, iday] = 100 - 100/(1.0 + RS)
+            else:
+                result[row, iday] = 10
+        gains[row] = ave_gain
+        losses[row] = ave_loss
+    return result, gains, losses
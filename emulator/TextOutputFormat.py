@@ -10,9 +10,16 @@ from __future__ import print_function
 import os
 from hseexceptions import HSEOutputPathError
 
-def text_output(kv_separator, f_in, out_dir):
-    # copy stdin to result file
-    fn_result = os.path.join(out_dir, 'part-00000')
+def write_part(kv_separator, f_in, out_dir, part = 0):
+    """
+    Copies key-value pairs from a file object to the result file of one
+    reduce task, part-NNNNN.
+    Parameters:
+        f_in:    the result of the reducer
+        out_dir: the directory where the result files are stored
+        part:    the number of the reduce task
+    """
+    fn_result = os.path.join(out_dir, 'part-{:05d}'.format(part))
     with open(fn_result, 'w') as fh_result:
         for line in f_in:
             a_pair = line.strip().split(kv_separator, 1)
@@ -21,12 +28,34 @@ def text_output(kv_separator, f_in, out_dir):
             else:
                 print('{}\t{}'.format(a_pair[0], a_pair[1]), file=fh_result)
 
-    # everything went well; make _SUCCESS
+
+def mark_success(out_dir):
+    """
+    Makes _SUCCESS once every result file is written
+    """
     fn_success = os.path.join(out_dir, '_SUCCESS')
     f = open(fn_success, 'w')
     f.close()
 
 
+def text_output(kv_separator, f_in, out_dir):
+    # copy stdin to result file
+    write_part(kv_separator, f_in, out_dir)
+
+    # everything went well; make _SUCCESS
+    mark_success(out_dir)
+
+
+def make_output_dir(output_dir):
+    """
+    Makes the output directory, which must not exist yet
+    """
+    if os.path.exists(output_dir):
+        raise HSEOutputPathError("Output path '{}' already exists".format(output_dir))
+
+    os.mkdir(output_dir)
+
+
 def output_formatter(kv_separator, f_in, output_dir):
     """
     Reads key-value pares from a file object and stores them to a directory
@@ -35,11 +64,7 @@ def output_formatter(kv_separator, f_in, output_dir):
         f_in:       the input file. the result of reduce
         output_dir: the directory where the result files are stored
     """
-    # check if output dir doesn't exist yet
-    if os.path.exists(output_dir):
-        raise HSEOutputPathError("Output path '{}' already exists".format(output_path))
-
-    # make output dir
-    os.mkdir(output_dir)
+    # check if output dir doesn't exist yet and make it
+    make_output_dir(output_dir)
 
     text_output(kv_separator, f_in, output_dir)
@@ -140,13 +140,20 @@ aggregator_factory.aggregators = {
 #
 # main
 #
-def main():
+def main(combine = False):
+    """
+    Aggregates the values of each key from the sorted stdin.
+    Parameter:
+        combine: True when run as a combiner; the keys keep the name of
+                 the aggregator so the reducer aggregates the partial
+                 results again
+    """
     aggregator = AGGRNull()
     last_aggre_key = None
     last_key = None
 
     def emitter(value):
-        print('{}\t{}'.format(last_key, value))
+        print('{}\t{}'.format(last_aggre_key if combine else last_key, value))
 
     for line in sys.stdin:
         aggre_key, value = line.strip().split('\t', 1)
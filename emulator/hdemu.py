@@ -13,9 +13,12 @@ import os
 import sys
 import tempfile as tf
 import shutil as su
+import heapq
+import multiprocessing as mp
+import subprocess as sp
 import hseexceptions as excp
 from TextInputFormat import input_formatter
-from TextOutputFormat import output_formatter
+from TextOutputFormat import output_formatter, make_output_dir, write_part, mark_success
 
 
 def is_builtin_reducer(fn_reducer):
@@ -47,6 +50,9 @@ def analyze_argv(argv):
             
             # state definitions
             def sts_init(arg):
+                if arg in opt_flags:
+                    opt_flags[arg]()
+                    return sts_init
                 state = opt_stss[arg] if arg in opt_stss else sts_init
                 if state == sts_init:
                     print("Unknown argument '{}': ignored".format(arg), file=sys.stderr)
@@ -61,6 +67,12 @@ def analyze_argv(argv):
                 self._reducer = arg if is_builtin_reducer(arg) else os.path.abspath(arg)
                 return sts_init
             sts_reducer.opt = '-reducer'
+
+            def sts_combiner(arg):
+                self._combiner = arg if is_builtin_reducer(arg) else os.path.abspath(arg)
+                return sts_init
+            sts_combiner.opt = '-combiner'
+            self._combiner = None   # default value
             
             def sts_input(arg):
                 self._input_path = os.path.abspath(arg)
@@ -96,13 +108,52 @@ def analyze_argv(argv):
             sts_files.opt = '-files'
             self._files = []        # default value
 
+            def sts_num_map_tasks(arg):
+                try:
+                    self._num_map_tasks = max(int(arg), 1)
+                except ValueError:
+                    print("Invalid number of map tasks '{}': ignored".format(arg), file=sys.stderr)
+                return sts_init
+            sts_num_map_tasks.opt = '-numMapTasks'
+            self._num_map_tasks = 1 # default value
+
+            def sts_sort_mb(arg):
+                try:
+                    self._sort_mb = float(arg)
+                except ValueError:
+                    print("Invalid shuffle memory '{}': ignored".format(arg), file=sys.stderr)
+                return sts_init
+            sts_sort_mb.opt = '-sortMB'
+            self._sort_mb = 100     # default value
+
+            def sts_num_reduce_tasks(arg):
+                try:
+                    self._num_reduce_tasks = max(int(arg), 1)
+                except ValueError:
+                    print("Invalid number of reduce tasks '{}': ignored".format(arg), file=sys.stderr)
+                return sts_init
+            sts_num_reduce_tasks.opt = '-numReduceTasks'
+            self._num_reduce_tasks = 1  # default value
+
+            # flags take no argument
+            def flg_subprocess():
+                self._subprocess = True
+            flg_subprocess.opt = '-subprocess'
+            self._subprocess = False    # default value
+
+            opt_flags = { flg_subprocess.opt : flg_subprocess }
+
             opt_stss = { sts_mapper.opt : sts_mapper,
                          sts_reducer.opt : sts_reducer,
+                         sts_combiner.opt : sts_combiner,
                          sts_input.opt : sts_input,
                          sts_output.opt : sts_output,
                          sts_interimdir.opt : sts_interimdir,
                          sts_cmdenv.opt : sts_cmdenv,
-                         sts_files.opt : sts_files
+                         sts_files.opt : sts_files,
+                         sts_num_map_tasks.opt : sts_num_map_tasks,
+                         sts_sort_mb.opt : sts_sort_mb,
+                         sts_num_reduce_tasks.opt : sts_num_reduce_tasks
                        }
 
             # parse options
@@ -125,6 +176,10 @@ def analyze_argv(argv):
         def reducer(self):
             return self._reducer
         
+        @property
+        def combiner(self):
+            return self._combiner
+        
         @property
         def input_path(self):
             return self._input_path
@@ -146,6 +201,22 @@ def analyze_argv(argv):
         @property
         def files(self):
             return self._files
+
+        @property
+        def num_map_tasks(self):
+            return self._num_map_tasks
+
+        @property
+        def sort_mb(self):
+            return self._sort_mb
+
+        @property
+        def num_reduce_tasks(self):
+            return self._num_reduce_tasks
+
+        @property
+        def subprocess(self):
+            return self._subprocess
     
     return CommandLineArguments(argv)
 
@@ -239,6 +310,8 @@ def execute_user_scirpt(type_name, file_name, f_in, f_out):
         file_name: The file name of the Python script to run
         f_in:    : File object for data input. Used as stdin during execution.
         f_out:   : File object for data output. Used as stdout.
+    The script runs as the main module in globals of its own, so it does
+    not touch those of the emulator, in the emulator process or in a worker.
     """
     # compile user script
     try:
@@ -254,7 +327,289 @@ def execute_user_scirpt(type_name, file_name, f_in, f_out):
 
     # execute user script
     with StdioResetter(f_in, f_out):
-        exec(user_exe, globals())
+        exec(user_exe, { '__name__' : '__main__', '__file__' : file_name })
+
+
+_script_errors = { 'Mapper' : excp.HSEMapperError,
+                   'Reducer' : excp.HSEReducerError,
+                   'Combiner' : excp.HSECombinerError }
+
+def start_user_script(type_name, file_name, f_in, f_out):
+    """
+    Starts a python script in its own process, as Hadoop Streaming does.
+    Parameters:
+        type_name: 'Mapper', 'Reducer' or 'Combiner'
+        file_name: The file name of the Python script to run
+        f_in:    : File object for stdin of the script, or subprocess.PIPE
+        f_out:   : File object for stdout of the script, or subprocess.PIPE
+    Return:
+        subprocess.Popen object; its pipes are in text mode
+    """
+    # the script writes and reads the files directly, not through the
+    # buffers of the file objects
+    for f in (f_in, f_out):
+        if f is not sp.PIPE:
+            f.flush()
+    try:
+        return sp.Popen([sys.executable, file_name], stdin=f_in, stdout=f_out,
+                universal_newlines=True)
+    except OSError:
+        raise _script_errors[type_name]('{} {} failed to start: quit'.format(type_name, file_name))
+
+
+def wait_user_script(type_name, file_name, proc):
+    """
+    Waits for a script started by start_user_script to finish
+    """
+    if proc.wait() != 0:
+        raise _script_errors[type_name]('{} {} exited with status {}: quit'.format(
+                type_name, file_name, proc.returncode))
+
+
+def run_user_script(type_name, file_name, f_in, f_out, as_subprocess = False):
+    """
+    Runs a python script with given stdio, in the emulator process with
+    execute_user_scirpt or in its own process.
+    Parameters:
+        as_subprocess: True to run the script in its own process
+        others:        see execute_user_scirpt
+    """
+    if as_subprocess:
+        proc = start_user_script(type_name, file_name, f_in, f_out)
+        wait_user_script(type_name, file_name, proc)
+    else:
+        execute_user_scirpt(type_name, file_name, f_in, f_out)
+
+
+def kv_line(kv):
+    """
+    Returns the line of a [key, value] or [key] list from the shuffle
+    """
+    if len(kv) == 1:
+        return '{}\t\n'.format(kv[0])
+    return '{}\t{}\n'.format(kv[0], kv[1])
+
+
+def copy_lines(lines, f_copy):
+    """
+    Passes lines through, writing a copy of each to f_copy if it is not None
+    """
+    for line in lines:
+        if f_copy is not None:
+            f_copy.write(line)
+        yield line
+
+
+#
+# map tasks
+#
+def get_splits(fn_list, num_splits):
+    """
+    Divides input files into splits of about the same size. Like Hadoop's
+    TextInputFormat, a split boundary is moved to the start of the next line
+    so each line belongs to exactly one split.
+    Parameters:
+        fn_list:    list of input file names
+        num_splits: number of splits to aim for
+    Return:
+        list of (file name, start offset, end offset) in input order
+    """
+    sizes = [ os.path.getsize(fn) for fn in fn_list ]
+    split_size = max(-(-sum(sizes) // num_splits), 1)
+    splits = []
+    for fn, size in zip(fn_list, sizes):
+        bounds = [0]
+        with open(fn, 'rb') as fh:
+            for offset in range(split_size, size, split_size):
+                # a boundary on the first byte of a line stays there
+                fh.seek(offset - 1)
+                fh.readline()
+                bound = fh.tell()
+                if bounds[-1] < bound < size:
+                    bounds.append(bound)
+        bounds.append(size)
+        splits.extend([ (fn, start, end) for start, end in zip(bounds[:-1], bounds[1:]) if start < end ])
+    return splits
+
+
+def run_combiner(combiner, f_in, f_out, kv_separator, sort_memory, as_subprocess = False):
+    """
+    Sorts the output of one map task by key and runs the combiner on it,
+    as Hadoop does before the shuffle.
+    Parameters:
+        combiner:     the path to a combiner script or 'aggregate'
+        f_in:         file object of the mapper output
+        f_out:        file object for the combiner output
+        kv_separator: separator of key and value
+        sort_memory:  bytes sorted in memory; see SpillSorter
+        as_subprocess: True to run a combiner script in its own process;
+                      the built-in aggregator always runs in this process
+    """
+    with SpillSorter(sort_memory, kv_separator) as sorter, tf.TemporaryFile(mode='w+') as f_sorted:
+        for kv in sorter.sort(f_in):
+            f_sorted.write(kv_line(kv))
+        f_sorted.seek(0)
+
+        if is_builtin_reducer(combiner):
+            import aggregate
+            with StdioResetter(f_sorted, f_out):
+                aggregate.main(combine=True)
+        else:
+            run_user_script('Combiner', combiner, f_sorted, f_out, as_subprocess)
+
+
+def run_map_task(task):
+    """
+    Runs the mapper on one input split, and the combiner on its output if
+    there is one. Called in a worker process.
+    Parameter:
+        task: (mapper, split from get_splits, file name for the mapper output,
+               combiner or None, key-value separator, sort memory,
+               True to run the scripts as subprocesses)
+    """
+    mapper, (fn, start, end), fn_out, combiner, kv_separator, sort_memory, as_subprocess = task
+    with tf.TemporaryFile(mode='w+') as f_in, open(fn_out, 'w') as f_out:
+        # format the split as input_formatter does
+        with open(fn, 'rb') as fh:
+            fh.seek(start)
+            pos = start
+            while pos < end:
+                line = fh.readline()
+                if not line:
+                    break
+                pos += len(line)
+                if not isinstance(line, str):
+                    line = line.decode('utf-8')
+                print(line.strip(), file=f_in)
+        f_in.seek(0)
+        if combiner is None:
+            run_user_script('Mapper', mapper, f_in, f_out, as_subprocess)
+        else:
+            with tf.TemporaryFile(mode='w+') as f_map:
+                run_user_script('Mapper', mapper, f_in, f_map, as_subprocess)
+                f_map.seek(0)
+                run_combiner(combiner, f_map, f_out, kv_separator, sort_memory, as_subprocess)
+
+
+#
+# reduce tasks
+#
+def hash_partition(key, num_partitions):
+    """
+    The reduce task of a key, as Hadoop's HashPartitioner assigns it:
+    (key.hashCode() & Integer.MAX_VALUE) % numReduceTasks. Streaming keys
+    are Text, whose hashCode is 31 * hash + byte over the UTF-8 bytes of
+    the key, bytes signed, starting from 1, in 32 bit arithmetic.
+    Parameters:
+        key:            the key string
+        num_partitions: the number of reduce tasks
+    """
+    if not isinstance(key, bytes):
+        key = key.encode('utf-8')
+    hash_code = 1
+    for b in bytearray(key):
+        if b > 127:
+            b -= 256
+        hash_code = (31 * hash_code + b) & 0xFFFFFFFF
+    return (hash_code & 0x7FFFFFFF) % num_partitions
+
+
+def run_reduce_task(task):
+    """
+    Runs the reducer on one partition and writes its result file.
+    Called in a worker process.
+    Parameter:
+        task: (reducer, reducer input file name, reducer output file name,
+               key-value separator, output directory, partition number,
+               True to run the reducer as a subprocess)
+    """
+    reducer, fn_in, fn_out, kv_separator, out_dir, part, as_subprocess = task
+    with open(fn_in, 'r') as f_in, open(fn_out, 'w+') as f_out:
+        run_user_script('Reducer', reducer, f_in, f_out, as_subprocess)
+        f_out.seek(0)
+        write_part(kv_separator, f_out, out_dir, part)
+
+
+#
+# shuffle sorter
+#
+class SpillSorter(object):
+    """
+    Context manager to sort key-value pairs by key with bounded memory.
+    Pairs are collected in runs of up to a given number of bytes of input;
+    each full run is sorted and spilled to a file, and the spills and the
+    last run are merged with heapq.merge. Pairs with the same key keep
+    their input order, as list.sort does. On exit, the spill files are
+    deleted.
+    """
+    def __init__(self, memory, kv_separator = '\t'):
+        """
+        Parameters:
+            memory:       bytes of input held in memory before spilling
+            kv_separator: separator of key and value in the input lines
+        """
+        self._memory = memory
+        self._kv_separator = kv_separator
+        self._spill_dir = None
+        self._spills = []
+        self.spill_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        if self._spill_dir is not None:
+            su.rmtree(self._spill_dir)
+            self._spill_dir = None
+        return False
+
+    @property
+    def spills(self):
+        return len(self._spills)
+
+    def sort(self, lines):
+        """
+        Sorts lines of key-value pairs.
+        Parameter:
+            lines: iterable of lines
+        Return:
+            iterable of [key, value] or [key] lists in key order
+        """
+        run = []
+        size = 0
+        for line in lines:
+            run.append(line.strip().split(self._kv_separator, 1))
+            size += len(line)
+            if size >= self._memory:
+                self._spill(run)
+                run = []
+                size = 0
+        run.sort(key = lambda l: l[0])
+        if len(self._spills) == 0:
+            return run
+
+        # decorate with the run number and the position in the run so
+        # equal keys come out in input order
+        runs = [ self._read_spill(i, fn) for i, fn in enumerate(self._spills) ]
+        runs.append( (kv[0], len(self._spills), n, kv) for n, kv in enumerate(run) )
+        return ( item[3] for item in heapq.merge(*runs) )
+
+    def _spill(self, run):
+        run.sort(key = lambda l: l[0])
+        if self._spill_dir is None:
+            self._spill_dir = tf.mkdtemp()
+        fn = os.path.join(self._spill_dir, 'spill-{:05d}'.format(len(self._spills)))
+        with open(fn, 'w') as fh:
+            for kv in run:
+                print(self._kv_separator.join(kv), file=fh)
+            self.spill_bytes += fh.tell()
+        self._spills.append(fn)
+
+    def _read_spill(self, i, fn):
+        with open(fn, 'r') as fh:
+            for n, line in enumerate(fh):
+                kv = line.rstrip('\n').split(self._kv_separator, 1)
+                yield (kv[0], i, n, kv)
 
 
 #
@@ -276,7 +631,12 @@ class HadoopStreamEmulator(object):
             input_path, output_path,
             interim_dir = None,
             cmdenv = None,
-            files = None):
+            files = None,
+            num_map_tasks = 1,
+            sort_mb = 100,
+            num_reduce_tasks = 1,
+            combiner = None,
+            as_subprocess = False):
         """
         Parameters:
             emu_path: the home directory of the emulator
@@ -288,6 +648,16 @@ class HadoopStreamEmulator(object):
                          mapper input/ouput, reducer input/output
             cmdenv:    : the list of environment variable to pass mapper/reducer
             files      : files to be copied to the mapper/reducer environment
+            num_map_tasks : the number of processes running the mapper on
+                         splits of the input
+            sort_mb    : megabytes of mapper output sorted in memory; more
+                         is spilled to disk and merged
+            num_reduce_tasks : the number of partitions of the keys, each
+                         reduced in its own process to a part-NNNNN file
+            combiner   : the path to a combiner script in Python run on the
+                         output of each map task, or 'aggregate'
+            as_subprocess : True to run mapper/reducer/combiner in their own
+                         processes connected by pipes, as Hadoop does
         """
         if os.path.exists(output_path):
             raise excp.HSECommandLineError("Output path '{}' already exists".format(output_path))
@@ -308,6 +678,11 @@ class HadoopStreamEmulator(object):
         self._output_path = output_path
         self._interim_dir = interim_dir
         self._kv_separator = '\t'
+        self._num_map_tasks = num_map_tasks
+        self._sort_memory = int(sort_mb * 1024 * 1024)
+        self._num_reduce_tasks = num_reduce_tasks
+        self._combiner = combiner
+        self._subprocess = as_subprocess
 
     def get_file_list(self):
         """
@@ -328,18 +703,47 @@ class HadoopStreamEmulator(object):
                     lists.append(a_path)
             return lists
 
-    def shuffle(self, fh):
+    def shuffle(self, fh, sorter):
         """
         Shuffles the result of mapper.
         Argument:
-            fh: file handle of the mapper result
+            fh:     file handle of the mapper result
+            sorter: SpillSorter to sort with; the result is read from its
+                    spill files until it exits
         """
         print('**** shuffling ****')
-        kv_list = []
-        for line in fh:
-            a_pair = line.strip().split(self._kv_separator, 1)
-            kv_list.append(a_pair)
-        kv_list.sort(key = lambda l: l[0])
+        kv_list = sorter.sort(fh)
+        print('{} spills, {} bytes spilled'.format(sorter.spills, sorter.spill_bytes))
+        return kv_list
+
+    def map_shuffle(self, f_format, f_out, sorter, keep_output):
+        """
+        Calls mapper and shuffles the result. With a single map task run as
+        a subprocess and no combiner, the mapper output is shuffled from
+        the pipe as it comes; otherwise it is stored in f_out first.
+        Parameter:
+            f_format:    file object for input formatter output
+            f_out:       file object for mapper output
+            sorter:      see shuffle
+            keep_output: True to store the mapper output in f_out even when
+                         it is shuffled from the pipe
+        """
+        if not self._subprocess or self._num_map_tasks > 1 or self._combiner is not None:
+            self.call_mapper(f_format, f_out)
+            f_out.seek(0)
+            return self.shuffle(f_out, sorter)
+
+        print('**** mapping ****')
+        input_formatter(self.get_file_list(), f_format)
+        f_format.seek(0)
+
+        proc = start_user_script('Mapper', self._mapper, f_format, sp.PIPE)
+        try:
+            kv_list = self.shuffle(copy_lines(proc.stdout, f_out if keep_output else None), sorter)
+        finally:
+            proc.stdout.close()
+            proc.wait()
+        wait_user_script('Mapper', self._mapper, proc)
         return kv_list
 
     def call_mapper(self, f_format, f_out):
@@ -350,10 +754,55 @@ class HadoopStreamEmulator(object):
             f_out:    file object for mapper output
         """
         print('**** mapping ****')
+        if self._num_map_tasks > 1:
+            self.call_map_tasks(f_format, f_out)
+            return
+
         input_formatter(self.get_file_list(), f_format)
         f_format.seek(0)
 
-        execute_user_scirpt('Mapper', self._mapper, f_format, f_out)
+        if self._combiner is None:
+            run_user_script('Mapper', self._mapper, f_format, f_out, self._subprocess)
+        else:
+            with tf.TemporaryFile(mode='w+') as f_map:
+                run_user_script('Mapper', self._mapper, f_format, f_map, self._subprocess)
+                f_map.seek(0)
+                print('**** combining ****')
+                run_combiner(self._combiner, f_map, f_out, self._kv_separator, self._sort_memory,
+                        self._subprocess)
+
+    def call_map_tasks(self, f_format, f_out):
+        """
+        Splits the input and runs the mapper, and the combiner if any, on
+        each split in a pool of num_map_tasks processes. The outputs are
+        stored in f_out in the order of the splits.
+        Parameter:
+            f_format: file object for input formatter output; only written
+                      when interim results are kept
+            f_out:    file object for mapper output
+        """
+        fn_list = self.get_file_list()
+        if self._interim_dir is not None:
+            input_formatter(fn_list, f_format)
+
+        splits = get_splits(fn_list, self._num_map_tasks)
+        print('{} splits on {} map tasks'.format(len(splits), self._num_map_tasks))
+        out_dir = tf.mkdtemp()
+        try:
+            tasks = [ (self._mapper, split, os.path.join(out_dir, 'map-{:05d}'.format(i)),
+                       self._combiner, self._kv_separator, self._sort_memory, self._subprocess)
+                      for i, split in enumerate(splits) ]
+            pool = mp.Pool(self._num_map_tasks)
+            try:
+                pool.map(run_map_task, tasks)
+            finally:
+                pool.close()
+                pool.join()
+            for fn_task in [ task[2] for task in tasks ]:
+                with open(fn_task, 'r') as fh:
+                    su.copyfileobj(fh, f_out)
+        finally:
+            su.rmtree(out_dir)
 
     def call_reducer(self, kv_list, f_shfl, f_red):
         """
@@ -364,35 +813,115 @@ class HadoopStreamEmulator(object):
             f_red:   file object to store the immediate result from reducer
         """
         print('**** reducing ****')
-        for kv in kv_list:
-            if len(kv) == 1:
-                print('{}\t'.format(kv[0]), file=f_shfl)
-            else:
-                print('{}\t{}'.format(kv[0], kv[1]), file=f_shfl)
-        f_shfl.seek(0)
-
-        # use built-in aggregator if user wants
-        reducer = os.path.join(self._my_path, 'aggregate.py') if self._reducer == 'aggregate' else self._reducer
+        if self._subprocess:
+            self.stream_reducer(kv_list, f_shfl, f_red)
+        else:
+            for kv in kv_list:
+                if len(kv) == 1:
+                    print('{}\t'.format(kv[0]), file=f_shfl)
+                else:
+                    print('{}\t{}'.format(kv[0], kv[1]), file=f_shfl)
+            f_shfl.seek(0)
 
-        execute_user_scirpt('Reducer', reducer, f_shfl, f_red)
+            execute_user_scirpt('Reducer', self.get_reducer(), f_shfl, f_red)
 
         f_red.seek(0)
         output_formatter(self._kv_separator, f_red, self._output_path)
 
+    def stream_reducer(self, kv_list, f_shfl, f_red):
+        """
+        Runs the reducer as a subprocess and writes the result of shuffling
+        to its stdin pipe as it is merged.
+        Parameters:
+            kv_list: the reuslt of shuffling
+            f_shfl:  file object to store a copy of the kv_list, or None
+            f_red:   file object to store the result from reducer
+        """
+        reducer = self.get_reducer()
+        proc = start_user_script('Reducer', reducer, sp.PIPE, f_red)
+        try:
+            try:
+                for line in copy_lines((kv_line(kv) for kv in kv_list), f_shfl):
+                    proc.stdin.write(line)
+            finally:
+                proc.stdin.close()
+        except (IOError, OSError):
+            # the reducer quit before reading all input; an error status
+            # tells why, otherwise its output is short of the rest
+            wait_user_script('Reducer', reducer, proc)
+            raise excp.HSEReducerError('Reducer {} quit before reading all its input: quit'.format(reducer))
+        wait_user_script('Reducer', reducer, proc)
+
+    def get_reducer(self):
+        """
+        Return:
+            the path to the reducer script; the built-in aggregator if the
+            user wants
+        """
+        return os.path.join(self._my_path, 'aggregate.py') if is_builtin_reducer(self._reducer) else self._reducer
+
+    def call_reduce_tasks(self, kv_list, work_dir):
+        """
+        Partitions the result of shuffling by hash_partition of the keys and
+        runs the reducer on each partition in a pool of num_reduce_tasks
+        processes. Partition k is stored in part-k of the 'output' dir.
+        Parameters:
+            kv_list:  the result of shuffling, in key order
+            work_dir: the directory to store reducer input/output of each
+                      partition
+        """
+        print('**** reducing ****')
+        num_tasks = self._num_reduce_tasks
+        fn_inputs = [ os.path.join(work_dir, 'reducer_input-{:05d}.txt'.format(k)) for k in range(num_tasks) ]
+        fn_outputs = [ os.path.join(work_dir, 'reducer_output-{:05d}.txt'.format(k)) for k in range(num_tasks) ]
+        f_inputs = [ open(fn, 'w') for fn in fn_inputs ]
+        try:
+            # equal keys are next to each other, so hash each key once
+            last_key = None
+            for kv in kv_list:
+                if kv[0] != last_key:
+                    last_key = kv[0]
+                    f_shfl = f_inputs[hash_partition(last_key, num_tasks)]
+                if len(kv) == 1:
+                    print('{}\t'.format(kv[0]), file=f_shfl)
+                else:
+                    print('{}\t{}'.format(kv[0], kv[1]), file=f_shfl)
+        finally:
+            for fh in f_inputs:
+                fh.close()
+
+        make_output_dir(self._output_path)
+        tasks = [ (self.get_reducer(), fn_inputs[k], fn_outputs[k], self._kv_separator, self._output_path, k,
+                   self._subprocess)
+                  for k in range(num_tasks) ]
+        pool = mp.Pool(num_tasks)
+        try:
+            pool.map(run_reduce_task, tasks)
+        finally:
+            pool.close()
+            pool.join()
+        mark_success(self._output_path)
+
     def _execute_temp(self):
         """
         execute MapReduce job with temporary files
         """
-        # mapper
-        with tf.TemporaryFile(mode='w+') as f_format, tf.TemporaryFile(mode='w+') as f_m:
-            self.call_mapper(f_format, f_m)
-            # shuffling
-            f_m.seek(0)
-            kv_list = self.shuffle(f_m)
+        with SpillSorter(self._sort_memory, self._kv_separator) as sorter:
+            # mapper
+            with tf.TemporaryFile(mode='w+') as f_format, tf.TemporaryFile(mode='w+') as f_m:
+                # shuffling
+                kv_list = self.map_shuffle(f_format, f_m, sorter, False)
 
-        # reducer
-        with tf.TemporaryFile(mode='w+') as f_s, tf.TemporaryFile(mode='w+') as f_r:
-            self.call_reducer(kv_list, f_s, f_r)
+            # reducer
+            if self._num_reduce_tasks > 1:
+                work_dir = tf.mkdtemp()
+                try:
+                    self.call_reduce_tasks(kv_list, work_dir)
+                finally:
+                    su.rmtree(work_dir)
+            else:
+                with tf.TemporaryFile(mode='w+') as f_s, tf.TemporaryFile(mode='w+') as f_r:
+                    self.call_reducer(kv_list, f_s, f_r)
 
     def _execute_interim(self):
         """
@@ -404,16 +933,18 @@ class HadoopStreamEmulator(object):
         fn_reduce_output = os.path.join(self._interim_dir, HadoopStreamEmulator._fn_reduce_output)
         os.mkdir(self._interim_dir)
 
-        # mapper
-        with open(fn_map_input, mode='w+') as f_mi, open(fn_map_output, mode='w+') as f_mo:
-            self.call_mapper(f_mi, f_mo)
-            # shuffling
-            f_mo.seek(0)
-            kv_list = self.shuffle(f_mo)
+        with SpillSorter(self._sort_memory, self._kv_separator) as sorter:
+            # mapper
+            with open(fn_map_input, mode='w+') as f_mi, open(fn_map_output, mode='w+') as f_mo:
+                # shuffling
+                kv_list = self.map_shuffle(f_mi, f_mo, sorter, True)
 
-        # reducer
-        with open(fn_reduce_input, mode='w+') as f_ri, open(fn_reduce_output, mode='w+') as f_ro:
-            self.call_reducer(kv_list, f_ri, f_ro)
+            # reducer
+            if self._num_reduce_tasks > 1:
+                self.call_reduce_tasks(kv_list, self._interim_dir)
+            else:
+                with open(fn_reduce_input, mode='w+') as f_ri, open(fn_reduce_output, mode='w+') as f_ro:
+                    self.call_reducer(kv_list, f_ri, f_ro)
 
     def execute(self):
         """
@@ -442,9 +973,9 @@ def is_script_ok(fn_script):
                 print('\t{}'.format(cmd))
 
 
-def check_mr(fn_mapper, fn_reducer):
+def check_mr(fn_mapper, fn_reducer, fn_combiner = None):
     """
-    make sure the given mapper and reducer exist
+    make sure the given mapper, reducer and combiner exist
     """
     try:
         is_script_ok(fn_mapper)
@@ -455,6 +986,11 @@ def check_mr(fn_mapper, fn_reducer):
             is_script_ok(fn_reducer)
     except IOError:
         raise excp.HSEReducerError("Reducer {} doesn't exist: quit".format(fn_reducer))
+    try:
+        if fn_combiner is not None and not is_builtin_reducer(fn_combiner):
+            is_script_ok(fn_combiner)
+    except IOError:
+        raise excp.HSECombinerError("Combiner {} doesn't exist: quit".format(fn_combiner))
 
 
 # Hadoop Streaming API emulator for python script
@@ -464,6 +1000,8 @@ if __name__ == '__main__':
     print('System     : {}'.format(sys.version))
     print('Mapper     : {}'.format(emuopt.mapper))
     print('Reducer    : {}'.format(emuopt.reducer))
+    print('Combiner   : {}'.format(emuopt.combiner))
+    print('Subprocess : {}'.format(emuopt.subprocess))
     print('Input path : {}'.format(emuopt.input_path))
     print('Output path: {}'.format(emuopt.output_path))
     print('interim dir: {}'.format(emuopt.interim_dir))
@@ -471,16 +1009,24 @@ if __name__ == '__main__':
         print('cmdenv     : {}={}'.format(var, val))
     for f in emuopt.files:
         print('files      : {}'.format(f))
+    print('map tasks  : {}'.format(emuopt.num_map_tasks))
+    print('sort MB    : {}'.format(emuopt.sort_mb))
+    print('reduce tasks: {}'.format(emuopt.num_reduce_tasks))
     
     try:
-        check_mr(emuopt.mapper, emuopt.reducer)
+        check_mr(emuopt.mapper, emuopt.reducer, emuopt.combiner)
         emulator = HadoopStreamEmulator(
             emuopt.emulator_path,
             emuopt.mapper, emuopt.reducer,
             emuopt.input_path, emuopt.output_path,
             emuopt.interim_dir,
             emuopt.cmdenv,
-            emuopt.files
+            emuopt.files,
+            emuopt.num_map_tasks,
+            emuopt.sort_mb,
+            emuopt.num_reduce_tasks,
+            emuopt.combiner,
+            emuopt.subprocess
             )
         emulator.execute()
     except excp.HSEException as e:
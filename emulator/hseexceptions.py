@@ -44,6 +44,14 @@ class HSEReducerError(HSEException):
         self.msg = msg
 
 
+class HSECombinerError(HSEException):
+    """
+    Raised when combiner reported an error
+    """
+    def __init__(self, msg):
+        self.msg = msg
+
+
 class HSECommandLineError(HSEException):
     """
     Raised when command line options are invalid
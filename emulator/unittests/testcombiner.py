@@ -0,0 +1,104 @@
+'''
+Created on Oct 18, 2026
+'''
+
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import unittest
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..'))
+import hdemu as emu
+
+
+_aggregate_mapper = '''#!/usr/bin/env python
+
+from __future__ import print_function
+
+import re
+import sys
+
+def main():
+    pattern = re.compile("[A-Za-z][0-9A-Za-z]*")
+    for line in sys.stdin:
+        for word in pattern.findall(line):
+            print('LongValueSum:{}\\t{}'.format(word.lower(), 1))
+            print('LongValueMax:len\\t{}'.format(len(word)))
+
+if __name__ == '__main__':
+    main()
+'''
+
+
+class TestCombiner(unittest.TestCase):
+    '''
+    Unit tests for running a combiner on the output of each map task
+    '''
+    _emu_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..')
+    _sample_dir = os.path.join(_emu_dir, 'sample')
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def run_emulator(self, mapper, reducer, *opts):
+        '''
+        Returns the result and the number of lines that went to the shuffle
+        '''
+        name = 'run{}'.format(len(os.listdir(self._tmp_dir)))
+        output = os.path.join(self._tmp_dir, name + '_output')
+        interim = os.path.join(self._tmp_dir, name + '_interim')
+        cmd = [ sys.executable, os.path.join(self._emu_dir, 'hdemu.py'),
+                '-input', 'input', '-output', output, '-interim', interim,
+                '-mapper', mapper, '-reducer', reducer ]
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(cmd + list(opts), cwd=self._sample_dir,
+                                  stdout=devnull)
+        with open(os.path.join(output, 'part-00000'), 'r') as fh:
+            result = fh.read()
+        with open(os.path.join(interim, 'reducer_input.txt'), 'r') as fh:
+            shuffled = len(fh.readlines())
+        return result, shuffled
+
+    def testOption(self):
+        '''
+        -combiner takes a script or the built-in aggregate
+        '''
+        args = emu.analyze_argv(['hdemu', '-combiner', 'aggregate'])
+        self.assertEqual(args.combiner, 'aggregate')
+        args = emu.analyze_argv(['hdemu', '-combiner', 'comb.py'])
+        self.assertEqual(args.combiner, os.path.abspath('comb.py'))
+        args = emu.analyze_argv(['hdemu'])
+        self.assertEqual(args.combiner, None)
+
+    def testScript(self):
+        '''
+        The word count reducer as the combiner shrinks the shuffle
+        '''
+        expected, shuffled = self.run_emulator('wc_mapper.py', 'wc_reducer.py')
+        for tasks in ('1', '2'):
+            result, combined = self.run_emulator('wc_mapper.py', 'wc_reducer.py',
+                    '-combiner', 'wc_reducer.py', '-numMapTasks', tasks)
+            self.assertEqual(result, expected)
+            self.assertTrue(combined < shuffled)
+
+    def testAggregate(self):
+        '''
+        The built-in aggregate combiner keeps the aggregator in the key
+        '''
+        mapper = os.path.join(self._tmp_dir, 'aggr_mapper.py')
+        with open(mapper, 'w') as fh:
+            fh.write(_aggregate_mapper)
+        expected, shuffled = self.run_emulator(mapper, 'aggregate')
+        self.assertTrue('len\t' in expected)
+        result, combined = self.run_emulator(mapper, 'aggregate',
+                '-combiner', 'aggregate', '-numMapTasks', '2')
+        self.assertEqual(result, expected)
+        self.assertTrue(combined < shuffled)
+
+
+if __name__ == '__main__':
+    unittest.main()
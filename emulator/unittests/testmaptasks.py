@@ -0,0 +1,111 @@
+'''
+Created on Oct 18, 2026
+'''
+
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import unittest
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..'))
+import hdemu as emu
+
+
+class TestMapTasks(unittest.TestCase):
+    '''
+    Unit tests for running the mapper on splits of the input
+    '''
+    _emu_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..')
+    _sample_dir = os.path.join(_emu_dir, 'sample')
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def make_file(self, name, lines):
+        fn = os.path.join(self._tmp_dir, name)
+        with open(fn, 'w') as fh:
+            for line in lines:
+                fh.write(line + '\n')
+        return fn
+
+    def testOption(self):
+        '''
+        -numMapTasks takes a number; anything else is ignored
+        '''
+        args = emu.analyze_argv(['hdemu', '-numMapTasks', '4'])
+        self.assertEqual(args.num_map_tasks, 4)
+        args = emu.analyze_argv(['hdemu', '-numMapTasks', 'many'])
+        self.assertEqual(args.num_map_tasks, 1)
+        args = emu.analyze_argv(['hdemu'])
+        self.assertEqual(args.num_map_tasks, 1)
+
+    def testSplitsLineAligned(self):
+        '''
+        Every split starts at a line and together they cover the input
+        '''
+        lines = [ 'line {} '.format(i) * (i % 7) for i in range(200) ]
+        fn1 = self.make_file('in1.txt', lines)
+        fn2 = self.make_file('in2.txt', lines[:3])
+        fn3 = self.make_file('in3.txt', [])
+        for num_splits in (1, 2, 5, 13, 1000):
+            splits = emu.get_splits([fn1, fn2, fn3], num_splits)
+            self.assertTrue(len(splits) >= min(num_splits, 2))
+            result = []
+            for fn, start, end in splits:
+                with open(fn, 'rb') as fh:
+                    if start > 0:
+                        fh.seek(start - 1)
+                        self.assertEqual(fh.read(1), b'\n')
+                    fh.seek(start)
+                    result.extend(fh.read(end - start).decode('utf-8').splitlines())
+            self.assertEqual(result, lines + lines[:3])
+
+    def run_emulator(self, *opts):
+        output = os.path.join(self._tmp_dir, 'output{}'.format(len(os.listdir(self._tmp_dir))))
+        cmd = [ sys.executable, os.path.join(self._emu_dir, 'hdemu.py'),
+                '-input', 'input', '-output', output,
+                '-mapper', 'wc_mapper.py', '-reducer', 'wc_reducer.py' ]
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(cmd + list(opts), cwd=self._sample_dir,
+                                  stdout=devnull)
+        with open(os.path.join(output, 'part-00000'), 'r') as fh:
+            return fh.read()
+
+    def testOwnGlobals(self):
+        '''
+        A script run in the emulator process runs as the main module and
+        leaves the globals of the emulator alone
+        '''
+        script = self.make_file('script.py', [
+            'import sys',
+            'if __name__ == "__main__":',
+            '    sys.stdout.write(sys.stdin.read().upper())',
+            'run_map_task = None',
+            ])
+        f_in = open(self.make_file('in.txt', ['abc']))
+        f_out = open(os.path.join(self._tmp_dir, 'out.txt'), 'w')
+        try:
+            emu.execute_user_scirpt('Mapper', script, f_in, f_out)
+        finally:
+            f_in.close()
+            f_out.close()
+        with open(os.path.join(self._tmp_dir, 'out.txt')) as fh:
+            self.assertEqual(fh.read(), 'ABC\n')
+        self.assertEqual(emu.__name__, 'hdemu')
+        self.assertTrue(emu.run_map_task is not None)
+
+    def testSameResult(self):
+        '''
+        The sample word count gives the same result on several map tasks
+        '''
+        expected = self.run_emulator()
+        self.assertTrue(len(expected) > 0)
+        self.assertEqual(self.run_emulator('-numMapTasks', '3'), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+'''
+Created on Oct 18, 2026
+'''
+
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import unittest
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..'))
+import hdemu as emu
+
+
+class TestReduceTasks(unittest.TestCase):
+    '''
+    Unit tests for partitioning keys over several reduce tasks
+    '''
+    _emu_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..')
+    _sample_dir = os.path.join(_emu_dir, 'sample')
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def testHashPartition(self):
+        '''
+        Same partitions as Hadoop's HashPartitioner on Text keys
+        '''
+        # Text('').hashCode() == 1, Text('a') == 31 + 97,
+        # Text('ab') == 31 * 128 + 98
+        self.assertEqual(emu.hash_partition('', 7), 1)
+        self.assertEqual(emu.hash_partition('a', 100), 28)
+        self.assertEqual(emu.hash_partition('ab', 1000), 66)
+        # negative hash codes are masked with Integer.MAX_VALUE; the UTF-8
+        # bytes of e-acute are signed -61 and -87
+        self.assertEqual(emu.hash_partition(u'\u00e9', 1 << 31), 2147482631)
+        # 32 bit overflow
+        key = 'stock_symbol_with_a_long_name'
+        hash_code = 1
+        for c in key:
+            hash_code = (31 * hash_code + ord(c)) % (1 << 32)
+        self.assertEqual(emu.hash_partition(key, 1 << 31), hash_code & 0x7FFFFFFF)
+
+    def testOption(self):
+        '''
+        -numReduceTasks takes a number; anything else is ignored
+        '''
+        args = emu.analyze_argv(['hdemu', '-numReduceTasks', '3'])
+        self.assertEqual(args.num_reduce_tasks, 3)
+        args = emu.analyze_argv(['hdemu', '-numReduceTasks', 'x'])
+        self.assertEqual(args.num_reduce_tasks, 1)
+
+    def testPartFiles(self):
+        '''
+        Each key is reduced to the part file of its partition
+        '''
+        output = os.path.join(self._tmp_dir, 'output')
+        interim = os.path.join(self._tmp_dir, 'interim')
+        cmd = [ sys.executable, os.path.join(self._emu_dir, 'hdemu.py'),
+                '-input', 'input', '-output', output, '-interim', interim,
+                '-mapper', 'wc_mapper.py', '-reducer', 'wc_reducer.py',
+                '-numReduceTasks', '3' ]
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(cmd, cwd=self._sample_dir, stdout=devnull)
+        self.assertEqual(sorted(os.listdir(output)),
+                         ['_SUCCESS', 'part-00000', 'part-00001', 'part-00002'])
+        words = []
+        for k in range(3):
+            with open(os.path.join(output, 'part-{:05d}'.format(k))) as fh:
+                for line in fh:
+                    word = line.split('\t')[0]
+                    self.assertEqual(emu.hash_partition(word, 3), k)
+                    words.append(word)
+        self.assertTrue(len(words) > 0)
+        self.assertEqual(len(words), len(set(words)))
+        self.assertTrue(os.path.exists(os.path.join(interim, 'reducer_input-00002.txt')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+'''
+Created on Oct 18, 2026
+'''
+
+import os
+import sys
+import random
+import unittest
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..'))
+import hdemu as emu
+
+
+class TestShuffle(unittest.TestCase):
+    '''
+    Unit tests for sorting the mapper output with spills to disk
+    '''
+
+    def setUp(self):
+        rand = random.Random(1)
+        self.lines = [ 'key{}\t{}\n'.format(rand.randint(0, 50), i) for i in range(1000) ]
+        self.lines.append('lonely\n')
+        self.expected = sorted([ line.strip().split('\t', 1) for line in self.lines ],
+                               key = lambda l: l[0])
+
+    def testInMemory(self):
+        '''
+        Everything fits in memory: no spills
+        '''
+        with emu.SpillSorter(1 << 20) as sorter:
+            result = list(sorter.sort(self.lines))
+            self.assertEqual(sorter.spills, 0)
+            self.assertEqual(sorter.spill_bytes, 0)
+        self.assertEqual(result, self.expected)
+
+    def testSpills(self):
+        '''
+        Spilled runs merge to the same order, equal keys in input order
+        '''
+        with emu.SpillSorter(1000) as sorter:
+            result = list(sorter.sort(self.lines))
+            self.assertTrue(sorter.spills > 5)
+            self.assertTrue(sorter.spill_bytes > 0)
+            spill_dir = sorter._spill_dir
+            self.assertTrue(os.path.isdir(spill_dir))
+        self.assertEqual(result, self.expected)
+        self.assertFalse(os.path.exists(spill_dir))
+
+    def testOption(self):
+        '''
+        -sortMB takes a number of megabytes
+        '''
+        args = emu.analyze_argv(['hdemu', '-sortMB', '0.5'])
+        self.assertEqual(args.sort_mb, 0.5)
+        args = emu.analyze_argv(['hdemu'])
+        self.assertEqual(args.sort_mb, 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+'''
+Created on Oct 18, 2026
+'''
+
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import unittest
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..'))
+import hdemu as emu
+import hseexceptions as excp
+
+
+_failing_reducer = '''#!/usr/bin/env python
+
+import sys
+
+sys.stdin.readline()
+sys.exit(3)
+'''
+
+_closing_reducer = '''#!/usr/bin/env python
+
+import os
+
+os.close(0)
+'''
+
+
+class TestSubprocess(unittest.TestCase):
+    '''
+    Unit tests for running the user scripts as subprocesses over pipes
+    '''
+    _emu_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..')
+    _sample_dir = os.path.join(_emu_dir, 'sample')
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def run_emulator(self, *opts):
+        '''
+        Returns the result, or None when the job did not succeed
+        '''
+        name = 'run{}'.format(len(os.listdir(self._tmp_dir)))
+        output = os.path.join(self._tmp_dir, name + '_output')
+        cmd = [ sys.executable, os.path.join(self._emu_dir, 'hdemu.py'),
+                '-output', output, '-mapper', 'wc_mapper.py' ] + list(opts)
+        if '-input' not in opts:
+            cmd += [ '-input', 'input' ]
+        if '-reducer' not in opts:
+            cmd += [ '-reducer', 'wc_reducer.py' ]
+        with open(os.devnull, 'w') as devnull:
+            subprocess.call(cmd, cwd=self._sample_dir, stdout=devnull,
+                            stderr=devnull)
+        if not os.path.isfile(os.path.join(output, '_SUCCESS')):
+            return None
+        result = ''
+        for part in sorted(os.listdir(output)):
+            if part.startswith('part-'):
+                with open(os.path.join(output, part), 'r') as fh:
+                    result += fh.read()
+        return result
+
+    def testOption(self):
+        '''
+        -subprocess is a flag without an argument
+        '''
+        args = emu.analyze_argv(['hdemu', '-subprocess', '-numMapTasks', '2'])
+        self.assertTrue(args.subprocess)
+        self.assertEqual(args.num_map_tasks, 2)
+        args = emu.analyze_argv(['hdemu'])
+        self.assertFalse(args.subprocess)
+
+    def testSameResult(self):
+        '''
+        The subprocesses give the same result as running the scripts in the
+        emulator
+        '''
+        interim = os.path.join(self._tmp_dir, 'interim')
+        for opts in ([], ['-interim', interim], ['-numMapTasks', '2'],
+                     ['-numReduceTasks', '2'], ['-combiner', 'wc_reducer.py']):
+            expected = self.run_emulator(*opts)
+            self.assertTrue(expected)
+            shutil.rmtree(interim, ignore_errors=True)
+            self.assertEqual(self.run_emulator('-subprocess', *opts), expected)
+
+    def testInterim(self):
+        '''
+        The mapper output streamed to the shuffle is still kept in the
+        interim directory
+        '''
+        interim = os.path.join(self._tmp_dir, 'interim')
+        self.run_emulator('-subprocess', '-interim', interim)
+        with open(os.path.join(interim, 'mapper_output.txt'), 'r') as fh:
+            mapped = fh.readlines()
+        with open(os.path.join(interim, 'reducer_input.txt'), 'r') as fh:
+            shuffled = fh.readlines()
+        self.assertTrue(len(mapped) > 0)
+        self.assertEqual(len(mapped), len(shuffled))
+
+    def testFailure(self):
+        '''
+        A script that exits with an error stops the emulator
+        '''
+        reducer = os.path.join(self._tmp_dir, 'fail_reducer.py')
+        with open(reducer, 'w') as fh:
+            fh.write(_failing_reducer)
+        self.assertEqual(self.run_emulator('-subprocess', '-reducer', reducer), None)
+
+        with open(os.devnull, 'r') as f_in, tempfile.TemporaryFile(mode='w+') as f_out:
+            self.assertRaises(excp.HSEReducerError, emu.run_user_script,
+                    'Reducer', reducer, f_in, f_out, True)
+
+    def testUnreadInput(self):
+        '''
+        A reducer that exits without reading its input stops the emulator
+        '''
+        # more input than a pipe holds, so the reducer closes it unread
+        input_dir = os.path.join(self._tmp_dir, 'input')
+        os.mkdir(input_dir)
+        with open(os.path.join(input_dir, 'words.txt'), 'w') as fh:
+            for i in range(20000):
+                fh.write('word{}\n'.format(i))
+        reducer = os.path.join(self._tmp_dir, 'closing_reducer.py')
+        with open(reducer, 'w') as fh:
+            fh.write(_closing_reducer)
+        self.assertEqual(self.run_emulator('-subprocess', '-input', input_dir,
+                                           '-reducer', reducer), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,6 +11,7 @@ Mar 1, 2015
 
 from __future__ import print_function
 
+import os
 import sys
 import argparse
 import numpy as np
@@ -19,6 +20,11 @@ from scipy.stats import anderson
 from scipy.stats import pearsonr
 from matplotlib import pyplot as plt
 
+# RidgePath is shared with Andy Webber's code in chelmbigstock/chelmbigstock
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        '..', 'chelmbigstock'))
+from RidgePath import RidgePath
+
 
 class LearningData(object):
     '''
@@ -30,77 +36,166 @@ class LearningData(object):
         n : number of data sets
     '''
 
-    def __init__(self):
-        self._X = []
-        self._y = []
+    # rows are added to buffers with room to spare, which grow by
+    # at least this many rows at a time
+    chunk = 1024
+
+    def __init__(self, dtype=np.float64):
+        self._X = np.empty((0, 0), dtype=dtype)
+        self._y = np.empty(0, dtype=dtype)
+        self._rows = 0
+
+    def _reserve(self, rows, width):
+        needed = self._rows + rows
+        if needed <= len(self._X):
+            return
+        capacity = max(needed, 2 * len(self._X), LearningData.chunk)
+        X = np.empty((capacity, width), dtype=self._X.dtype)
+        y = np.empty(capacity, dtype=self._y.dtype)
+        if self._rows != 0:
+            X[:self._rows] = self._X[:self._rows]
+            y[:self._rows] = self._y[:self._rows]
+        self._X = X
+        self._y = y
 
     def _add_row(self, row_data):
-        if len(self._X) != 0:
-            if len(self._X[0]) != len(row_data) - 1:
+        if self._rows != 0:
+            if self._X.shape[1] != len(row_data) - 1:
                 # raise ValueError('Number of features mismatch')
                 print('Number of features mismatch', file=sys.stderr)
                 return
-        self._X.append(row_data[:-1])
-        self._y.append(row_data[-1])
+        self._reserve(1, len(row_data) - 1)
+        self._X[self._rows] = row_data[:-1]
+        self._y[self._rows] = row_data[-1]
+        self._rows += 1
+
+    def _add_rows(self, X, y):
+        if self._rows != 0:
+            if self._X.shape[1] != X.shape[1]:
+                print('Number of features mismatch', file=sys.stderr)
+                return
+        self._reserve(len(X), X.shape[1])
+        self._X[self._rows:self._rows + len(X)] = X
+        self._y[self._rows:self._rows + len(X)] = y
+        self._rows += len(X)
 
     @property
     def X(self):
         # for safety, I must return a copy of _X
         # but I take performance here
-        return self._X
+        return self._X[:self._rows]
 
     @property
     def y(self):
         # for safety, I must return a copy of _y
         # but I take performance here
-        return self._y
+        return self._y[:self._rows]
 
     @property
     def m(self):
-        return len(self._X[0])
+        return self._X.shape[1]
 
     @property
     def n(self):
-        return len(self._y)
+        return self._rows
+
+
+def _parse_rows(rows, width):
+    '''
+    Parse the comma separated rows of width values in one go.
+    A value that is not a number raises ValueError as float() does.
+    Returns a 2D array of those rows and the list of the other rows.
+    '''
+    split = [ row.split(',') for row in rows ]
+    table = [ values for values in split if len(values) == width ]
+    others = [ row for row, values in zip(rows, split) if len(values) != width ]
+    return np.array(table, dtype=float).reshape(len(table), width), others
+
+
+def _read_part(job):
+    '''
+    Read one reducer output file chunk_size bytes of lines at a time
+    Argument:
+        job : (file name, chunk_size)
+    Return:
+        dict of data type to LearningData
+    '''
+    fn, chunk_size = job
+    data = {'TR': LearningData(), 'CV': LearningData(), 'TE': LearningData()}
+    with open(fn, 'r') as fh:
+        while True:
+            lines = fh.readlines(chunk_size)
+            if not lines:
+                break
+            rows = dict((data_type, []) for data_type in data)
+            for line in lines:
+                data_type, values = line.strip().split('\t')
+                if data_type not in rows:
+                    raise ValueError('Data error in {}: Unknonw data type "{}"'
+                            .format(fn, data_type))
+                rows[data_type].append(values)
+
+            for data_type, values in rows.items():
+                if len(values) == 0:
+                    continue
+                stock = data[data_type]
+                if stock.n != 0:
+                    width = stock.m + 1
+                else:
+                    width = values[0].count(',') + 1
+                table, others = _parse_rows(values, width)
+                if len(table) != 0:
+                    stock._add_rows(table[:, :-1], table[:, -1])
+                # rows of another width go one at a time to report the mismatch
+                for row in others:
+                    stock._add_row([ float(v) for v in row.split(',') ])
+    return data
 
 
-def stockDataFactory(fn_data):
+def stockDataFactory(fn_data, workers=None, chunk_size=1 << 22):
     '''
     Read the ouput from Reducer and returns the stock data
     Artument:
         fn_data : file names of the reducer output;
                   Can be a string or a list of strings
+        workers : number of processes reading the files at the same time;
+                  each file is read by one process, so a single file gains
+                  nothing from more than one
+        chunk_size : approximate number of bytes parsed at a time
     Return:
         Tuple of stock data: (train, CV, test)
     '''
     if isinstance(fn_data, basestring):
         fn_data = [fn_data]
 
+    jobs = [ (fn, chunk_size) for fn in fn_data ]
+    if workers is not None and workers > 1 and len(jobs) > 1:
+        from multiprocessing import Pool
+        pool = Pool(workers)
+        try:
+            parts = pool.map(_read_part, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        parts = [ _read_part(job) for job in jobs ]
+
+    if len(parts) == 1:
+        part = parts[0]
+        return (part['TR'], part['CV'], part['TE'])
+
     tr = LearningData()
     cv = LearningData()
     te = LearningData()
-
-    for fn in fn_data:
-        with open(fn, 'r') as fh:
-            for line in fh:
-                data_type, values = line.strip().split('\t')
-                if data_type == 'TR':
-                    stock = tr
-                elif data_type == 'CV':
-                    stock = cv
-                elif data_type == 'TE':
-                    stock = te
-                else:
-                    raise ValueError('Data error in {}: Unknonw data type "{}"'
-                            .format(fn, data_type))
-
-                values = [ float(v) for v in values.split(',') ]
-                stock._add_row(values)
+    for part in parts:
+        for data_type, stock in (('TR', tr), ('CV', cv), ('TE', te)):
+            if part[data_type].n != 0:
+                stock._add_rows(part[data_type].X, part[data_type].y)
 
     return (tr, cv, te)
 
 
-def learn(training_data, cv_data):
+def learn(training_data, cv_data, workers=None):
     """
     I copied this function from Andy Webber's code in
     chelmbigstock/chelmbigstock/chelmbigstock.py almost as is,
@@ -108,7 +203,8 @@ def learn(training_data, cv_data):
 
     This function does the actual training. It takes in training data
     and cross validation data and returns the model and optimal
-    regularization parameter
+    regularization parameter. The regularization parameters are evaluated
+    in workers threads.
     """
     
     # Setting guesses for minimum and maximum values of regularization parameter
@@ -120,9 +216,14 @@ def learn(training_data, cv_data):
     regularization_flag = 1 # To set 1 until local minimum is found
     regularization_param = 0
     
+    # the errors of the alphas already tried are kept across the loops; the
+    # alphas are on the grid of RidgePath, so the ranges share them. The
+    # errors of each range go to alpha.txt for plotting.
+    path = RidgePath(training_data, cv_data, workers)
     while regularization_flag != 0:
         regularization_param, regularization_flag = set_reg_param(
-                training_data, cv_data, alpha_min, alpha_max)
+                training_data, cv_data, alpha_min, alpha_max, path,
+                alpha_file='alpha.txt')
         if regularization_flag == -1:
             # The local minimum is at point less than alpha_min
             alpha_min = alpha_min * 0.3
@@ -135,8 +236,9 @@ def learn(training_data, cv_data):
     return clf, regularization_param
 
 
-def set_reg_param(training_data, cv_data, alpha_min, alpha_max):
-    """
+def set_reg_param(training_data, cv_data, alpha_min, alpha_max, path=None,
+        alpha_file=None, workers=None):
+    '''
     I copied this function from Andy Webber's code in
     chelmbigstock/chelmbigstock/chelmbigstock.py almost as is,
     though I made some cosmetic changes.
@@ -146,49 +248,40 @@ def set_reg_param(training_data, cv_data, alpha_min, alpha_max):
     regularization parameters. If a local minimum is found it returns the parameter
     and a 0 to indicate it is complete. If minimum it below alpha_min it returns -1
     for flag. If it is above alpha_max, it returns 1 for flag.
-    """
+
+    The alphas are those of the grid of RidgePath between alpha_min and
+    alpha_max. path is a RidgePath of the data; pass the same one when the
+    range is widened so alphas already tried are not fitted again. Without
+    one a path is made that evaluates in workers threads. The errors are
+    written to alpha_file for plotting when it is given.
+    '''
         
-    f = open('alpha.txt', 'w')
-    
-    alph = alpha_min
+    if path is None:
+        path = RidgePath(training_data, cv_data, workers)
+
+    steps = path.steps(alpha_min, alpha_max)
+    alphas = [path.alpha(k) for k in steps]
+    errors = path.evaluate(steps)
     
-    # the value of alpha in our range that gives minimum for cv data
-    min_alpha = alpha_min
-
-    # Learning is not generally done at alpha_min, this tracks larget alpha
-    alpha_largest = alpha_min
-    while alph < alpha_max:
-        # Learn for this parameter
-        clf = linear_model.Ridge (alpha=alph, fit_intercept=False)
-        clf.fit(training_data.X, training_data.y)
-        
-        # Get prediction for this parameter
-        predict_data = clf.predict(training_data.X)
-        predict_cv = clf.predict(cv_data.X)
-        
-        # Caculate the differences from actual data for training and cv data
-        diff_training = (1.0/training_data.m) * np.linalg.norm(predict_data - training_data.y)
-        diff_cv = (1.0/cv_data.m) * np.linalg.norm(predict_cv - cv_data.y)
-        
+    # the index of the alpha in our range that gives minimum for cv data
+    best = 0
+    for i, (diff_training, diff_cv) in enumerate(errors):
+        if diff_cv < errors[best][1]:
+            # We have a new minimum so its index must be recorded
+            best = i
+    min_alpha = alphas[best]
+
+    if alpha_file is not None:
         # Write out the values for plotting.
-        # Do appropriate work to determine min_val_alpha
-        f.write(str(alph) +  " " + str(diff_training) + " " + str(diff_cv) +  "\n")
-        if alph == alpha_min:
-            min_diff = diff_cv # Just setting default value for first value of alph 
-            min_alpha = alpha_min
-        if diff_cv < min_diff:
-            """ We have a new minimum so value and alph must be recored """
-            min_diff = diff_cv
-            min_alpha = alph
-        alpha_largest = alph # Keep track of largest alpha used
-        alph = alph * 1.5 # increment alph
-    f.close()
+        with open(alpha_file, 'w') as f:
+            for alph, (diff_training, diff_cv) in zip(alphas, errors):
+                f.write(str(alph) +  " " + str(diff_training) + " " + str(diff_cv) +  "\n")
             
     """ Loop is now complete. If min_value_alpha is not alpha_min or alpha_max, return flag of 0
             else return -1 or 1 so min or max can be adjusted and loop completed again """
-    if abs(min_alpha - alpha_min) < alpha_min/10.0:
+    if best == 0:
         flag = -1 # Local minimum is less than alpha_min so return -1 
-    elif abs(min_alpha - alpha_largest) < alpha_min/10.0:
+    elif best == len(alphas) - 1:
         flag = 1 # Local minimum is greater than alpha_max so return 1 
     else:
         flag = 0 # Local minimum is in range so return 0 
@@ -205,7 +298,7 @@ def save_as_csv(training_data, cv_data,
     
     with open(fn_TRX,'w') as f:
         for line in training_data.X:
-            x_str = ','.join(line)
+            x_str = ','.join(str(x) for x in line)
             print(x_str)
             print(x_str, file=f)
     
@@ -215,7 +308,7 @@ def save_as_csv(training_data, cv_data,
     
     with open(fn_CVX,'w') as f:
         for line in cv_data.X:
-            x_str = ','.join(line)
+            x_str = ','.join(str(x) for x in line)
             print(x_str)
             print(x_str, file=f)
     
@@ -224,13 +317,13 @@ def save_as_csv(training_data, cv_data,
         print(y_str, file=f)
     
 
-def execute(training_data, cv_data, test_data): 
+def execute(training_data, cv_data, test_data, workers=None):
     """
     execute is the function where each run is done. main sets parameters
     then calls execute
     """
     
-    clf, regularization_parameter = learn(training_data, cv_data)
+    clf, regularization_parameter = learn(training_data, cv_data, workers)
     
     # do an Anderson Darling test on the data to determine if it is a normal fit
     A2, sig, crit = anderson(test_data.y, dist = 'norm')
@@ -280,13 +373,20 @@ def execute(training_data, cv_data, test_data):
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Stock analysis')
-    parser.add_argument('data_file', help='Stock price data from the reducer')
+    parser.add_argument('data_file', nargs='+',
+            help='Stock price data from the reducer; '
+                 'all part files when the job had several reduce tasks')
     parser.add_argument('-c', '--save_csv', action='store_true', dest='save_csv',
             help='Save the training and CV data in the csv format')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+            help='Number of processes reading the data files, one file per '
+                 'process so a single file is read by one process, and of '
+                 'threads evaluating the regularization parameters')
     opt = parser.parse_args()
 
-    training_data, cv_data, test_data = stockDataFactory(opt.data_file)
+    training_data, cv_data, test_data = stockDataFactory(opt.data_file,
+            opt.workers)
     if opt.save_csv:
         save_as_csv(training_data, cv_data)
 
-    execute(training_data, cv_data, test_data)
+    execute(training_data, cv_data, test_data, opt.workers)
@@ -76,6 +76,173 @@ class TestChelmbigstock(unittest.TestCase):
         self.assertEqualStockData(expected_cv, result_cv, 'CV')
         self.assertEqualStockData(expected_te, result_te, 'TE')
 
+    def test_chunks_and_workers(self):
+        '''
+        Small chunks and several files read in parallel give the same data
+        '''
+        fn_data = os.path.join(self.data_dir, 'red_expected1.txt')
+        expected = target.stockDataFactory(fn_data)
+        for workers in (None, 2):
+            result = target.stockDataFactory([fn_data, fn_data],
+                    workers=workers, chunk_size=100)
+            for e, r in zip(expected, result):
+                self.assertEqual(2 * e.n, r.n)
+                self.assertEqual(e.m, r.m)
+                self.assertEqual(e.X.tolist() * 2, r.X.tolist())
+                self.assertEqual(e.y.tolist() * 2, r.y.tolist())
+
+    def test_ragged_rows(self):
+        '''
+        Rows with another number of features are left out
+        '''
+        import tempfile
+        fd, fn = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as f:
+            f.write('TR\t1.0,2.0,3.0\nTR\t1.0,2.0\nCV\t4.0,5.0\n'
+                    'TR\t4.0,5.0,6.0\n')
+        try:
+            tr, cv, te = target.stockDataFactory(fn)
+        finally:
+            os.remove(fn)
+        self.assertEqual([[1.0, 2.0], [4.0, 5.0]], tr.X.tolist())
+        self.assertEqual([3.0, 6.0], tr.y.tolist())
+        self.assertEqual([[4.0]], cv.X.tolist())
+        self.assertEqual(0, te.n)
+
+    def test_ragged_chunk(self):
+        '''
+        Only the rows of another width are left out of a chunk, each with
+        its own message, also when a chunk starts with one
+        '''
+        import tempfile
+        from StringIO import StringIO
+        fd, fn = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as f:
+            f.write('TR\t1.0,2.0,3.0\nTR\t1.0,2.0\nTR\t4.0,5.0,6.0\n'
+                    'TR\t7.0\nTR\t7.0,8.0,9.0\n')
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            tr, cv, te = target.stockDataFactory(fn)
+            tr_chunks, cv, te = target.stockDataFactory(fn, chunk_size=30)
+            messages = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+            os.remove(fn)
+        self.assertEqual([[1.0, 2.0], [4.0, 5.0], [7.0, 8.0]], tr.X.tolist())
+        self.assertEqual([3.0, 6.0, 9.0], tr.y.tolist())
+        self.assertEqual(tr.X.tolist(), tr_chunks.X.tolist())
+        self.assertEqual(4, messages.count('Number of features mismatch'))
+
+    def test_not_numbers(self):
+        '''
+        A value that is not a number is an error
+        '''
+        table, others = target._parse_rows(['1.0,2.0', '3.0', '4.0,5.0'], 2)
+        self.assertEqual([[1.0, 2.0], [4.0, 5.0]], table.tolist())
+        self.assertEqual(['3.0'], others)
+        self.assertEqual((0, 2), target._parse_rows(['3.0'], 2)[0].shape)
+        self.assertRaises(ValueError, target._parse_rows,
+                ['1.0,2.0', '1.0,x'], 2)
+        import tempfile
+        fd, fn = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as f:
+            f.write('TR\t1.0,2.0\nTR\t1.0,x\n')
+        try:
+            self.assertRaises(ValueError, target.stockDataFactory, fn)
+        finally:
+            os.remove(fn)
+
+    def test_unknown_type(self):
+        '''
+        An unknown data type is an error
+        '''
+        import tempfile
+        fd, fn = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as f:
+            f.write('TR\t1.0,2.0\nXX\t1.0,2.0\n')
+        try:
+            self.assertRaises(ValueError, target.stockDataFactory, fn)
+        finally:
+            os.remove(fn)
+
+    def test_buffer_growth(self):
+        '''
+        Rows past the first chunk are kept in order
+        '''
+        data = target.LearningData()
+        rows = [[float(i), i * 0.5, float(i % 2)] for i in range(2500)]
+        for row in rows:
+            data._add_row(row)
+        self.assertEqual(2, data.m)
+        self.assertEqual(2500, data.n)
+        self.assertEqual((2500, 2), data.X.shape)
+        self.assertEqual(1249.5, data.X[2499][1])
+        self.assertEqual(1.0, data.y[2499])
+
+    def test_ridge_path(self):
+        '''
+        The errors from the SVD match fitting Ridge for each alpha
+        '''
+        import numpy as np
+        from sklearn import linear_model
+        rng = np.random.RandomState(0)
+        tr = target.LearningData()
+        cv = target.LearningData()
+        for data, rows in ((tr, 60), (cv, 30)):
+            for row in rng.normal(size=(rows, 5)):
+                data._add_row(list(row))
+        steps = list(range(-2, 10))
+        for workers in (None, 3):
+            path = target.RidgePath(tr, cv, workers)
+            errors = path.evaluate(steps)
+            for k, (diff_training, diff_cv) in zip(steps, errors):
+                clf = linear_model.Ridge(alpha=0.01 * 1.5 ** k,
+                        fit_intercept=False)
+                clf.fit(tr.X, tr.y)
+                self.assertAlmostEqual(diff_training, (1.0/tr.m) *
+                        np.linalg.norm(clf.predict(tr.X) - tr.y), 10)
+                self.assertAlmostEqual(diff_cv, (1.0/cv.m) *
+                        np.linalg.norm(clf.predict(cv.X) - cv.y), 10)
+        # widening the range at either end only fits the new alphas
+        path = target.RidgePath(tr, cv)
+        target.set_reg_param(tr, cv, 0.01, 0.2, path)
+        self.assertEqual(set(range(8)), set(path.errors))
+        target.set_reg_param(tr, cv, 0.01, 0.6, path)
+        self.assertEqual(set(range(11)), set(path.errors))
+        target.set_reg_param(tr, cv, 0.01 * 0.3, 0.6, path)
+        self.assertEqual(set(range(-2, 11)), set(path.errors))
+        # a range inside one step of the grid still tries an alpha
+        self.assertEqual([0], path.steps(0.01, 0.012))
+        self.assertEqual((0.01, -1), target.set_reg_param(tr, cv, 0.01, 0.012))
+
+    def test_learn_workers(self):
+        '''
+        learn gives the same alpha with the regularization in threads and
+        writes the errors to alpha.txt
+        '''
+        import numpy as np
+        import shutil
+        import tempfile
+        rng = np.random.RandomState(1)
+        tr = target.LearningData()
+        cv = target.LearningData()
+        for data, rows in ((tr, 40), (cv, 40)):
+            X = rng.normal(size=(rows, 5))
+            y = X.dot([1.0, 0.5, 0.0, 0.0, -0.5]) + rng.normal(size=rows)
+            for row, target_value in zip(X, y):
+                data._add_row(list(row) + [target_value])
+        cwd = os.getcwd()
+        tmp_dir = tempfile.mkdtemp()
+        os.chdir(tmp_dir)
+        try:
+            self.assertEqual(target.learn(tr, cv)[1],
+                    target.learn(tr, cv, 3)[1])
+            self.assertTrue(os.path.getsize('alpha.txt') > 0)
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(tmp_dir)
+
 
 if __name__ == '__main__':
     unittest.main()
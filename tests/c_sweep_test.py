@@ -0,0 +1,68 @@
+'''
+Oct 18, 2026
+Unit tests for c_sweep in chelmbigstock.py
+'''
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import unittest
+
+import numpy as np
+
+import stock_fixtures
+
+class test_c_sweep(unittest.TestCase):
+    """Tests for the sweep over C"""
+
+    def setUp(self):
+        self._script = stock_fixtures.load_script()
+        rng = np.random.RandomState(1)
+        X = rng.normal(size=(80, 3))
+        self._training = stock_fixtures.learning_data(
+            X, X[:, 0] + rng.normal(size=80) > 0)
+        X = rng.normal(size=(40, 3))
+        self._test = stock_fixtures.learning_data(X, X[:, 0] > 0)
+
+    def tearDown(self):
+        stock_fixtures.unload_script()
+
+    def test_matches_rbf(self):
+        '''The precomputed kernel gives the accuracy of the rbf SVC'''
+        from sklearn.svm import SVC
+        C_values = [0.05, 0.5, 5.0]
+        for workers in (None, 2):
+            sweep = self._script.c_sweep(self._training, self._test, 0.2,
+                                         C_values, workers)
+            np.testing.assert_array_equal(sweep['C'], C_values)
+            for row in sweep:
+                svm = SVC(kernel='rbf', random_state=0, gamma=0.2, C=row['C'])
+                svm.fit(self._training.X, self._training.y)
+                self.assertEqual(row['train_errors'], np.count_nonzero(
+                    svm.predict(self._training.X) - self._training.y))
+                self.assertEqual(row['test_errors'], np.count_nonzero(
+                    svm.predict(self._test.X) - self._test.y))
+                self.assertAlmostEqual(row['test_accuracy'],
+                                       1.0 - row['test_errors']/40)
+            self.assertEqual(self._script.shared, {})
+
+    def test_detach(self):
+        '''detach_arrays closes the blocks attach_arrays opened'''
+        arrays = [np.arange(6.0).reshape(2, 3), np.array([True, False])]
+        blocks, specs = self._script.share_arrays(arrays)
+        try:
+            self._script.attach_arrays(specs)
+            attached = self._script.shared['blocks']
+            np.testing.assert_array_equal(self._script.shared['arrays'][0],
+                                          arrays[0])
+            self._script.detach_arrays()
+            self.assertEqual(self._script.shared, {})
+            self.assertTrue(all(block.buf is None for block in attached))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+'''
+Oct 18, 2026
+Unit tests for choose_features in chelmbigstock.py
+'''
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import contextlib
+import io
+import unittest
+import warnings
+from unittest import mock
+
+import numpy as np
+
+import stock_fixtures
+
+class test_choose_features(unittest.TestCase):
+    """Tests for the greedy feature selection"""
+
+    def setUp(self):
+        self._script = stock_fixtures.load_script()
+        self._stocks = stock_fixtures.random_stocks([200, 180, 150, 190, 170])
+        self._features = ['rsi', 'tsi', 'ppo', 'cmo', 'mfi', 'roc', 'uo']
+
+    def tearDown(self):
+        stock_fixtures.unload_script()
+
+    def choose(self, workers, verbose=False):
+        param = mock.Mock(reference_dates=[30050, 30090, 30120],
+                          test_dates=[30150, 30180], future_day=20,
+                          features=self._features[:], workers=workers)
+        with contextlib.redirect_stdout(io.StringIO()) as report, \
+                warnings.catch_warnings():
+            """SVC(probability=True) is deprecated in newer scikit-learn"""
+            warnings.simplefilter('ignore', FutureWarning)
+            result = self._script.choose_features(self._stocks, param, 1, 0.2,
+                                                  verbose)
+        self.assertEqual(param.features, self._features)
+        self.assertEqual(report.getvalue().count('round'), 2 if verbose else 0)
+        self.assertEqual(self._script.shared, {})
+        return result
+
+    def test_workers(self):
+        '''The pool chooses the same features as the serial loop'''
+        serial = self.choose(None)
+        parallel = self.choose(2, True)
+        self.assertEqual(len(serial[0]), 2)
+        self.assertEqual(serial[:2], parallel[:2])
+        np.testing.assert_allclose(serial[2], parallel[2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+'''
+Oct 18, 2026
+Unit tests for FeatureCache in LearningData.py
+'''
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import unittest
+from unittest import mock
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+import stock_fixtures
+from LearningData import LearningData, FeatureCache
+
+class test_feature_cache(unittest.TestCase):
+    """Tests for the cache of standardized data"""
+
+    def setUp(self):
+        self._stocks = stock_fixtures.random_stocks([200, 80, 150, 120])
+        self._param = mock.Mock(reference_dates=[30070, 30100],
+                                test_dates=[30150, 30195], future_day=25)
+
+    def test_subset(self):
+        '''A subset sliced from the cache is the subset standardized'''
+        cache = FeatureCache(self._stocks, ['tsi', 'uo', 'rsi', 'roc', 'cci',
+                                            'mfi'])
+        for features in (['tsi'], ['uo', 'rsi', 'roc'], ['cci', 'mfi']):
+            self._param.features = features
+            training_data = LearningData()
+            training_data.construct_all(self._stocks, [30070, 30100], 25,
+                                        features)
+            test_data = LearningData()
+            test_data.construct_all(self._stocks, [30150, 30195], 25,
+                                    features)
+            scale = StandardScaler().fit(training_data.X)
+            cached_training, cached_test = cache.data(self._param)
+            np.testing.assert_allclose(cached_training.X,
+                                       scale.transform(training_data.X))
+            np.testing.assert_allclose(cached_test.X,
+                                       scale.transform(test_data.X))
+            np.testing.assert_array_equal(cached_test.y, test_data.y)
+        self.assertEqual(len(cache._matrices), 1)
+
+    def test_reuse(self):
+        '''The same dates and features give the same objects'''
+        cache = FeatureCache(self._stocks, ['rsi', 'tsi', 'ppo'])
+        self._param.features = ['rsi', 'tsi']
+        first = cache.data(self._param)
+        self._param.features = ['tsi', 'rsi']
+        self.assertIs(cache.data(self._param)[0], first[0])
+        self._param.test_dates = [30195]
+        self.assertIsNot(cache.data(self._param)[1], first[1])
+        self._param.features = ['cci']
+        self.assertRaises(ValueError, cache.data, self._param)
+
+    def test_short_history(self):
+        '''Only the candidates are read, so a reference date too old for
+        roc and stoch does not matter when they are not candidates'''
+        stocks = stock_fixtures.random_stocks([200, 220], calc=False)
+        self._param.reference_dates = [30005, 30100]
+        self._param.features = ['rsi', 'tsi']
+        cache = FeatureCache(stocks, ['rsi', 'tsi'])
+        cached_training, cached_test = cache.data(self._param)
+        training_data = LearningData()
+        training_data.construct_all(stocks, [30005, 30100], 25, ['rsi', 'tsi'])
+        scale = StandardScaler().fit(training_data.X)
+        np.testing.assert_allclose(cached_training.X,
+                                   scale.transform(training_data.X))
+        for stock in stocks:
+            self.assertFalse(stock.calculated('roc'))
+            self.assertFalse(stock.calculated('stoch'))
+
+if __name__ == '__main__':
+    unittest.main()
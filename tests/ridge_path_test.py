@@ -0,0 +1,93 @@
+'''
+Oct 18, 2026
+Unit tests for RidgePath and set_reg_param in chelmbigstock.py
+'''
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import stock_fixtures
+
+class test_ridge_path(unittest.TestCase):
+    """Tests for the regularization sweep"""
+
+    def setUp(self):
+        self._script = stock_fixtures.load_script()
+        rng = np.random.RandomState(0)
+        self._training = stock_fixtures.learning_data(
+            rng.normal(size=(60, 5)), rng.normal(size=60) > 0)
+        self._cv = stock_fixtures.learning_data(
+            rng.normal(size=(30, 5)), rng.normal(size=30) > 0)
+
+    def tearDown(self):
+        stock_fixtures.unload_script()
+
+    def test_matches_ridge(self):
+        '''The errors from the SVD match fitting Ridge for each alpha'''
+        from sklearn import linear_model
+        steps = list(range(-3, 9))
+        for workers in (None, 3):
+            path = self._script.RidgePath(self._training, self._cv, workers)
+            for k, (diff_training, diff_cv) in zip(steps,
+                                                   path.evaluate(steps)):
+                clf = linear_model.Ridge(alpha=0.01 * 1.5 ** k,
+                                         fit_intercept=False)
+                clf.fit(self._training.X, self._training.y)
+                self.assertAlmostEqual(diff_training, (1.0/60) * np.linalg.norm(
+                    clf.predict(self._training.X) - self._training.y), 10)
+                self.assertAlmostEqual(diff_cv, (1.0/30) * np.linalg.norm(
+                    clf.predict(self._cv.X) - self._cv.y), 10)
+
+    def test_widen(self):
+        '''Widening the range only fits the new alphas'''
+        path = self._script.RidgePath(self._training, self._cv)
+        self._script.set_reg_param(self._training, self._cv, 0.01, 0.2, path)
+        self.assertEqual(len(path.errors), 8)
+        with mock.patch.object(path, '_diffs', wraps=path._diffs) as diffs:
+            alpha, flag = self._script.set_reg_param(
+                self._training, self._cv, 0.01, 0.6, path)
+        self.assertEqual(len(diffs.call_args[0][0]), 3)
+        self.assertEqual(len(path.errors), 11)
+        self.assertIn(flag, (-1, 0, 1))
+        """ alpha_min widened off the grid still lands on it """
+        with mock.patch.object(path, '_diffs', wraps=path._diffs) as diffs:
+            self._script.set_reg_param(self._training, self._cv, 0.003, 0.6,
+                                       path)
+        self.assertEqual(len(diffs.call_args[0][0]), 2)
+        self.assertEqual(sorted(path.errors), list(range(-2, 11)))
+
+    def test_grid(self):
+        '''The ends of a range snap to the grid of alphas'''
+        path = self._script.RidgePath(self._training, self._cv)
+        self.assertEqual(path.steps(0.01, 0.2), list(range(8)))
+        self.assertEqual(path.steps(0.01 * 1.5 ** 2, 0.01 * 1.5 ** 5),
+                         [2, 3, 4])
+        self.assertEqual(path.steps(0.003, 0.0101), [-2, -1, 0])
+
+    def test_narrow(self):
+        '''A range inside one step of the grid tries the alpha at its start'''
+        path = self._script.RidgePath(self._training, self._cv)
+        self.assertEqual(path.steps(0.01, 0.012), [0])
+        self.assertEqual(path.steps(0.011, 0.012), [1])
+        self.assertEqual(self._script.set_reg_param(
+            self._training, self._cv, 0.01, 0.012, path), (0.01, -1))
+
+    def test_workers(self):
+        '''set_reg_param makes its path with the workers'''
+        serial = self._script.set_reg_param(self._training, self._cv, 0.01,
+                                            0.6)
+        with mock.patch.object(self._script, 'RidgePath',
+                               wraps=self._script.RidgePath) as path:
+            threaded = self._script.set_reg_param(self._training, self._cv,
+                                                  0.01, 0.6, workers=3)
+        self.assertEqual(path.call_args[0][2], 3)
+        self.assertEqual(serial, threaded)
+
+if __name__ == '__main__':
+    unittest.main()
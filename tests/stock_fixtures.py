@@ -0,0 +1,53 @@
+'''
+Oct 18, 2026
+Fixtures shared by the unit tests of the chelmbigstock modules
+'''
+
+import os
+import sys
+# the top of the repository goes first so chelmbigstock stays the package
+# the other tests import, not chelmbigstock.py
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..'))
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'chelmbigstock'))
+
+import importlib.util
+
+import numpy as np
+
+from LearningData import LearningData
+from StockPanel import StockPanel
+import benchmark
+
+script_name = 'chelmbigstock_script'
+
+def load_script():
+    """chelmbigstock.py is loaded from its path as the chelmbigstock package
+    of the other tests hides it. It is registered under its own name so the
+    workers of a process pool find it; unload_script removes it again."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                        'chelmbigstock', 'chelmbigstock.py')
+    spec = importlib.util.spec_from_file_location(script_name, path)
+    script = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(script)
+    sys.modules[script_name] = script
+    return script
+
+def unload_script():
+    del sys.modules[script_name]
+
+def random_stocks(lengths, calc=True):
+    """Random stocks with the given numbers of days, their indicators
+    calculated when calc is true"""
+    stocks = [benchmark.random_stock(n, seed)
+              for seed, n in enumerate(lengths)]
+    if calc:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            StockPanel(stocks).calc()
+    return stocks
+
+def learning_data(X, y):
+    """LearningData holding the rows X and the targets y"""
+    data = LearningData()
+    data.X = X
+    data.y = y
+    return data
@@ -0,0 +1,47 @@
+'''
+Oct 18, 2026
+Unit tests for StockPanel
+'''
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import unittest
+
+import numpy as np
+
+import stock_fixtures
+import benchmark
+from StockPanel import StockPanel
+
+class test_stock_panel(unittest.TestCase):
+    """Tests for the panel of stocks"""
+
+    _lengths = [300, 16, 15, 27, 28, 1000, 50]
+
+    def test_panel_matches_stock(self):
+        '''Every indicator of the panel matches the one of a single Stock'''
+        stocks = stock_fixtures.random_stocks(self._lengths, calc=False)
+        StockPanel(stocks).calc()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for seed, stock in enumerate(stocks):
+                expected = benchmark.random_stock(len(stock.close), seed)
+                expected.indicators_calc()
+                for indicator in StockPanel.indicators:
+                    np.testing.assert_allclose(getattr(stock, indicator),
+                        getattr(expected, indicator), rtol=1e-9, atol=1e-9,
+                        err_msg='{} {}'.format(indicator, len(stock.close)))
+
+    def test_views(self):
+        '''Stock attributes are rows of the panel'''
+        stocks = stock_fixtures.random_stocks(self._lengths, calc=False)
+        panel = StockPanel(stocks)
+        panel.calc()
+        self.assertTrue(np.shares_memory(stocks[1].rsi, panel.rsi))
+        self.assertTrue(np.shares_memory(stocks[1].close, panel.close))
+        self.assertEqual(len(stocks[1].roc), 16 - 12)
+        self.assertTrue(np.isnan(panel.close[1, 16:]).all())
+
+if __name__ == '__main__':
+    unittest.main()
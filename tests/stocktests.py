@@ -1,10 +1,23 @@
 import os
 import sys
-sys.path.append(os.path.abspath('..'))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'chelmbigstock'))
 
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
-from chelmbigstock.Stock import Stock
+import numpy as np
+
+from Stock import Stock
+from StockPanel import StockPanel
+from UniverseStore import UniverseStore
+import benchmark
+import stock_fixtures
+import dateutl
+import kernels
+from LearningData import LearningData, feature_tensor
 
 class test_stock(unittest.TestCase):
     """Tests for the stock object"""
@@ -19,5 +32,573 @@ class test_stock(unittest.TestCase):
     #     self.assertIsNotNone(this_stock.dates[1])
     #     self.assertIsNotNone(this_stock.values[1])
 
+    def test_ema(self):
+        '''Vectorized ema matches the original loop'''
+        a = benchmark.random_walk(500)
+        for N in (1, 2, 13, 25, 27, 500):
+            np.testing.assert_allclose(Stock.ema(a, N),
+                                       benchmark.ema_loop(a, N), rtol=1e-12)
+        # the ema of an ema has a tail of zeros
+        inner = Stock.ema(a, 25)
+        np.testing.assert_allclose(Stock.ema(inner, 13),
+                                   benchmark.ema_loop(inner, 13), rtol=1e-12)
+
+    def test_ema_short(self):
+        '''A series shorter than the period has no seed'''
+        self.assertEqual(list(Stock.ema([1.0, 2.0, 3.0], 5)), [0.0, 0.0, 0.0])
+        self.assertEqual(len(Stock.ema([], 5)), 0)
+
+    def test_sma(self):
+        '''Vectorized sma matches the original loop'''
+        a = benchmark.random_walk(500)
+        for N in (1, 3, 9, 14, 28, 500):
+            np.testing.assert_allclose(Stock.sma(a, N),
+                                       benchmark.sma_loop(a, N), rtol=1e-9)
+        self.assertEqual(list(Stock.sma([4.0, 2.0, 6.0], 2)), [3.0, 4.0, 6.0])
+
+    def test_sma_short(self):
+        '''A series shorter than the period averages the days it has. The
+        original loop read past the oldest day into the newest ones, so sma,
+        and uo, stoch and cci built on it, only match it from N days on'''
+        a = [1.0, 2.0, 3.0]
+        self.assertEqual(list(Stock.sma(a, 5)), [2.0, 2.5, 3.0])
+        np.testing.assert_allclose(benchmark.sma_loop(np.array(a), 5),
+                                   [2.0, 2.2, 2.25])
+        a = benchmark.random_walk(40)
+        for n in (28, 29, 30):
+            np.testing.assert_allclose(Stock.sma(a[:n], 28),
+                                       benchmark.sma_loop(a[:n], 28), rtol=1e-9)
+        self.assertFalse(np.allclose(Stock.sma(a[:27], 28),
+                                     benchmark.sma_loop(a[:27], 28)))
+
+class test_rolling(unittest.TestCase):
+    """Tests for the rolling window kernels of cci and stoch"""
+
+    def test_rolling_max_min(self):
+        '''Rolling max and min match a window per day'''
+        a = benchmark.random_walk(103)
+        for N in (1, 2, 14, 50, 103):
+            np.testing.assert_array_equal(Stock.rolling_max(a, N),
+                [np.max(a[i:i+N]) for i in range(len(a)-N+1)])
+            np.testing.assert_array_equal(Stock.rolling_min(a, N),
+                [np.min(a[i:i+N]) for i in range(len(a)-N+1)])
+        self.assertEqual(len(Stock.rolling_max(a[:5], 14)), 0)
+        panel = np.vstack([a, a[::-1]])
+        np.testing.assert_array_equal(Stock.rolling_max(panel, 7)[1],
+                                      Stock.rolling_max(a[::-1], 7))
+
+    def test_cci_stoch(self):
+        '''cci and stoch match the per day loops for any window'''
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for seed, n in enumerate([15, 21, 300]):
+                stock = benchmark.random_stock(n, seed)
+                np.testing.assert_allclose(stock.cci,
+                    benchmark.cci_loop(stock), rtol=1e-9, atol=1e-12)
+                np.testing.assert_array_equal(stock.stoch,
+                                              benchmark.stoch_loop(stock))
+                stock.cci_calc(40)
+                np.testing.assert_allclose(stock.cci,
+                    benchmark.cci_loop(stock, 40), rtol=1e-9, atol=1e-12)
+                stock.stoch_calc(5)
+                np.testing.assert_array_equal(stock.stoch,
+                                              benchmark.stoch_loop(stock, 5))
+
+class test_true_range(unittest.TestCase):
+    """Tests for the true range kernel shared by adx, natr and uo"""
+
+    """ Values of random_stock(80, 3) at days 0, 10 and 20 """
+    _pinned = {
+        'dip14': [0.3373899081485279, 0.2819672728626512, 0.3039135910754515],
+        'dim14': [0.024780568004157177, 0.0017761020162135183,
+                  0.004092911075625072],
+        'adx': [0.9440569234426446, 0.9282820541173137, 0.8653664391050898],
+        'natr': [2.5856616725592114, 2.9636703691046136, 2.7133040798304893],
+        'uo': [57.21912880166819, 54.44622115909315, 52.26288284668954],
+        }
+
+    def test_pinned(self):
+        '''adx, natr and uo keep their values'''
+        stock = benchmark.random_stock(80, 3)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for indicator, values in self._pinned.items():
+                np.testing.assert_allclose(getattr(stock, indicator)[[0, 10, 20]],
+                                           values, rtol=1e-12, err_msg=indicator)
+
+    def test_matches_loops(self):
+        '''The kernel gives the same numbers as the per indicator loops'''
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for seed, n in enumerate([2, 16, 28, 300]):
+                stock = benchmark.random_stock(n, seed)
+                dip14, dim14, adx = benchmark.adx_loop(stock)
+                np.testing.assert_array_equal(stock.dip14, dip14)
+                np.testing.assert_array_equal(stock.dim14, dim14)
+                np.testing.assert_array_equal(stock.adx, adx)
+                np.testing.assert_array_equal(stock.natr,
+                                              benchmark.natr_loop(stock))
+                np.testing.assert_array_equal(stock.uo,
+                                              benchmark.uo_loop(stock))
+
+    def test_shared(self):
+        '''The true range is worked out once for all three indicators'''
+        stock = benchmark.random_stock(100)
+        with mock.patch.object(Stock, 'true_range_calc', autospec=True,
+                               side_effect=Stock.true_range_calc) as calc:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                stock.indicators_calc(['adx', 'natr', 'uo'])
+        self.assertEqual(calc.call_count, 1)
+
+class test_lazy_indicators(unittest.TestCase):
+    """Tests for calculating indicators when they are first read"""
+
+    def test_on_demand(self):
+        '''Reading an indicator runs only its calc method, once'''
+        stock = benchmark.random_stock(100)
+        with mock.patch.object(Stock, 'tsi_calc') as tsi_calc, \
+                mock.patch.object(Stock, 'rsi_calc', autospec=True,
+                                  side_effect=Stock.rsi_calc) as rsi_calc:
+            rsi = stock.rsi
+            self.assertIs(stock.rsi, rsi)
+        self.assertEqual(rsi_calc.call_count, 1)
+        tsi_calc.assert_not_called()
+        self.assertTrue(stock.calculated('rsi'))
+        self.assertFalse(stock.calculated('tsi'))
+        # one calc fills all three adx indicators
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stock.dim14
+        self.assertTrue(stock.calculated('adx'))
+
+    def test_features(self):
+        '''Only the declared features are calculated up front'''
+        stock = benchmark.random_stock(100)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stock.indicators_calc(['rsi', 'tsi'])
+        self.assertEqual([i for i in Stock.indicators if stock.calculated(i)],
+                         ['rsi', 'tsi'])
+        expected = benchmark.random_stock(100)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected.indicators_calc()
+        np.testing.assert_array_equal(stock.uo, expected.uo)
+
+    def test_panel_features(self):
+        '''A panel calculates only the declared features'''
+        stocks = [benchmark.random_stock(n, seed)
+                  for seed, n in enumerate([60, 30])]
+        StockPanel(stocks).calc(['natr', 'roc'])
+        self.assertEqual([i for i in Stock.indicators
+                          if stocks[0].calculated(i)], ['natr', 'roc'])
+        expected = benchmark.random_stock(60, 0)
+        np.testing.assert_allclose(stocks[0].natr, expected.natr, rtol=1e-12)
+
+class test_kernels(unittest.TestCase):
+    """Tests for the compiled recurrences and their fallback"""
+
+    def rsi_loop(self, close):
+        return kernels.rsi_rows(np.asarray(close)[np.newaxis, ::-1],
+                                np.array([len(close)]))[0][0, ::-1]
+
+    def test_fallback(self):
+        '''Without the compiled loops rsi agrees with the loop to rounding'''
+        with mock.patch.object(kernels, 'compiled', False):
+            for seed, n in enumerate([2, 15, 16, 17, 400]):
+                close = benchmark.random_walk(n, seed)
+                np.testing.assert_allclose(Stock.wilder_rsi(close),
+                    self.rsi_loop(close), rtol=1e-9, atol=1e-9)
+
+    def test_compiled(self):
+        '''With the compiled loops rsi and ema are the loops exactly'''
+        a = benchmark.random_walk(300)
+        with mock.patch.object(kernels, 'compiled', True):
+            np.testing.assert_array_equal(Stock.wilder_rsi(a),
+                                          self.rsi_loop(a))
+            for N in (1, 13, 27, 300):
+                np.testing.assert_array_equal(Stock.ema(a, N),
+                                              benchmark.ema_loop(a, N))
+            # a panel holds its rows oldest first
+            panel = np.vstack([a[::-1],
+                               np.r_[a[:100][::-1], np.full(200, np.nan)]])
+            lengths = np.array([300, 100])
+            np.testing.assert_array_equal(
+                Stock.ema(panel, 27, lengths)[1, 99::-1],
+                Stock.ema(a[:100], 27))
+            np.testing.assert_array_equal(
+                Stock.wilder_rsi(panel, lengths)[1, 99::-1],
+                Stock.wilder_rsi(a[:100]))
+
+class test_append(unittest.TestCase):
+    """Tests for adding new days to a stock"""
+
+    def split(self, days, new_days, seed=0):
+        '''The stock without its newest days and those days as bars'''
+        full = benchmark.random_stock(days, seed)
+        stock = benchmark.random_stock(days, seed)
+        for column in Stock.columns:
+            setattr(stock, column, getattr(full, column)[new_days:])
+        bars = np.column_stack([getattr(full, column)[:new_days]
+                                for column in Stock.columns])[::-1]
+        return full, stock, bars
+
+    def assertSameIndicators(self, expected, result):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for indicator in Stock.indicators:
+                np.testing.assert_allclose(getattr(result, indicator),
+                    getattr(expected, indicator), rtol=1e-9, atol=1e-9,
+                    err_msg=indicator)
+
+    def test_append(self):
+        '''Appended days give the indicators of the whole history'''
+        full, stock, bars = self.split(300, 10)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stock.indicators_calc()
+        with mock.patch.object(Stock, 'stoch_calc', side_effect=AssertionError):
+            stock.append(bars[:4])
+            for bar in bars[4:]:
+                stock.append(bar)
+            self.assertTrue(all(stock.calculated(indicator)
+                                for indicator in Stock.indicators))
+        np.testing.assert_array_equal(stock.dates, full.dates)
+        np.testing.assert_array_equal(stock.close, full.close)
+        self.assertSameIndicators(full, stock)
+
+    def test_in_place(self):
+        '''After the first append the new days are written in place and
+        the series handed out before stay as they were'''
+        full, stock, bars = self.split(300, 3)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stock.indicators_calc()
+            stock.append(bars[0])
+            close, rsi = stock.close, stock.rsi
+            stock.append(bars[1:])
+        self.assertTrue(np.shares_memory(stock.close, close))
+        self.assertTrue(np.shares_memory(stock.rsi, rsi))
+        np.testing.assert_array_equal(close, full.close[2:])
+        np.testing.assert_array_equal(stock.close, full.close)
+        self.assertSameIndicators(full, stock)
+
+        stock.close = stock.close.copy()
+        stock.append([full.dates[0] + 1] + [1.0] * 5)
+        self.assertEqual(stock.close[0], 1.0)
+        np.testing.assert_array_equal(stock.close[1:], full.close)
+
+    def test_not_advanced(self):
+        '''Indicators without their recurrences are calculated again'''
+        full, stock, bars = self.split(300, 3)
+        StockPanel([stock]).calc(['tsi', 'roc'])
+        stock.append(bars)
+        self.assertFalse(stock.calculated('tsi'))
+        self.assertTrue(stock.calculated('roc'))
+        self.assertSameIndicators(full, stock)
+
+        full, stock, bars = self.split(40, 3)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stock.indicators_calc()
+        stock.append(bars)
+        self.assertFalse(stock.calculated('rsi'))
+        self.assertSameIndicators(full, stock)
+
+    def test_old_bars(self):
+        '''Bars must be newer than the stock'''
+        full, stock, bars = self.split(100, 2)
+        self.assertRaises(ValueError, stock.append, bars[::-1])
+        self.assertRaises(ValueError, stock.append, full.dates[5:6].tolist()
+                          + [1.0] * 5)
+
+class test_date_index(unittest.TestCase):
+    """Tests for finding the row of a reference date"""
+
+    def test_find_ref_date_idx(self):
+        '''Exact dates, days between trading days and days outside'''
+        stock = Stock('X', None)
+        stock.dates = np.array([10, 8, 5, 3])
+        expected = {11: 0, 10: 0, 9: 0, 8: 1, 6: 1, 5: 2, 4: 2, 3: 3, 2: -1}
+        for ref_date, idx in expected.items():
+            self.assertEqual(dateutl.find_ref_date_idx(stock, ref_date), idx)
+        np.testing.assert_array_equal(
+            dateutl.find_ref_date_idxs(stock, list(expected)),
+            list(expected.values()))
+        self.assertEqual(dateutl.find_ref_date_idx(Stock('Y', None), 5), -1)
+
+    def test_table(self):
+        '''One lookup of many dates in many stocks'''
+        stocks = [benchmark.random_stock(n, seed)
+                  for seed, n in enumerate([50, 10, 0])]
+        ref_dates = [30005, 30030, 30100]
+        table = dateutl.find_ref_date_table(stocks, ref_dates)
+        self.assertEqual(table.shape, (3, 3))
+        for i, stock in enumerate(stocks):
+            for j, ref_date in enumerate(ref_dates):
+                self.assertEqual(table[i, j],
+                                 dateutl.find_ref_date_idx(stock, ref_date))
+        self.assertEqual(list(table[0]), [45, 20, 0])
+
+    def test_days_since_1900_array(self):
+        '''The bulk conversion matches days_since_1900 for every date'''
+        dates = ['1899-12-31', '1900-01-01', '1900-02-28', '1900-03-01',
+                 '1950-01-01', '2000-02-29', '2014-03-01', '2100-02-28',
+                 '2100-03-01', '2101-01-01']
+        np.testing.assert_array_equal(dateutl.days_since_1900_array(dates),
+            [dateutl.days_since_1900(date) for date in dates])
+        self.assertEqual(dateutl.days_since_1900_array(dates).dtype, np.int64)
+        self.assertRaises(ValueError, dateutl.days_since_1900_array, ['x'])
+
+    def test_index_follows_dates(self):
+        '''The index is made again when the dates change'''
+        stock = benchmark.random_stock(50)
+        self.assertIs(stock.date_index(), stock.date_index())
+        stock.dates = stock.dates + 100
+        self.assertEqual(dateutl.find_ref_date_idx(stock, 30105), 45)
+
+class test_learning_data(unittest.TestCase):
+    """Tests for building the learning data"""
+
+    def setUp(self):
+        self._stocks = stock_fixtures.random_stocks([200, 80, 150, 0, 120])
+        self._dates = [30020, 30070, 30100, 30150, 30195]
+
+    def test_construct_all(self):
+        '''The tensor gives the rows of construct and append'''
+        for features in (['rsi', 'tsi'], ['uo', 'dim14', 'rsi', 'roc'],
+                         Stock.indicators):
+            expected = LearningData()
+            expected.construct(self._stocks, self._dates[0], 25, features)
+            for date in self._dates[1:]:
+                expected.append(self._stocks, date, 25, features)
+            result = LearningData()
+            result.construct_all(self._stocks, self._dates, 25, features)
+            self.assertEqual((result.m, result.n), (expected.m, expected.n))
+            np.testing.assert_array_equal(result.X, expected.X)
+            np.testing.assert_array_equal(result.y, expected.y)
+
+    def test_buffers(self):
+        '''append grows the buffers past a chunk and X stays a float array'''
+        chunk = LearningData.chunk
+        LearningData.chunk = 2
+        try:
+            data = LearningData(np.float32)
+            data.construct(self._stocks, self._dates[1], 25, ['rsi', 'tsi'])
+            for date in self._dates[2:]:
+                data.append(self._stocks, date, 25, ['rsi', 'tsi'])
+        finally:
+            LearningData.chunk = chunk
+        self.assertEqual(data.X.shape, (data.m, 2))
+        self.assertEqual(data.X.dtype, np.float32)
+        self.assertTrue(data.X.flags['C_CONTIGUOUS'])
+        self.assertEqual(len(data.y), data.m)
+        i_day = dateutl.find_ref_date_idx(self._stocks[0], self._dates[1])
+        self.assertAlmostEqual(data.X[0, 1], self._stocks[0].tsi[i_day], 5)
+        data.X = data.X * 2
+        self.assertEqual(data.X.dtype, np.float32)
+        self.assertEqual(len(data.X), data.m)
+
+    def test_feature_tensor(self):
+        '''The tensor has a row per stock and a column per feature'''
+        tensor, y, valid = feature_tensor(self._stocks, self._dates, 25,
+                                          ['tsi', 'rsi'])
+        self.assertEqual(tensor.shape, (5, 5, 2))
+        self.assertFalse(valid[3].any())
+        i_day = dateutl.find_ref_date_idx(self._stocks[0], self._dates[2])
+        self.assertEqual(tensor[0, 2, 0], self._stocks[0].rsi[i_day])
+        self.assertEqual(tensor[0, 2, 1], self._stocks[0].tsi[i_day])
+
+class test_read_stocks(unittest.TestCase):
+    """Tests for reading a list of stocks"""
+
+    _lengths = [200, 60, 120, 90]
+
+    @classmethod
+    def setUpClass(cls):
+        cls._data_path = tempfile.mkdtemp()
+        cls._stock_file = os.path.join(cls._data_path, 'stocks_read.txt')
+        with open(cls._stock_file, 'w') as f:
+            for seed, n in enumerate(cls._lengths):
+                stock = benchmark.random_stock(n, seed)
+                benchmark.write_csv(stock, cls._data_path)
+                f.write(stock.name + '\n')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls._data_path)
+
+    def read(self, **kwargs):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return Stock.read_stocks(self._stock_file, 3,
+                                     directory=self._data_path, **kwargs)
+
+    def assertSameStocks(self, expected, result):
+        self.assertEqual([s.name for s in expected], [s.name for s in result])
+        for e, r in zip(expected, result):
+            for attr in Stock.columns + Stock.indicators:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    np.testing.assert_allclose(getattr(r, attr),
+                        getattr(e, attr), rtol=1e-9, atol=1e-9,
+                        err_msg='{} {}'.format(e.name, attr))
+
+    def test_read(self):
+        '''Stocks are read in order up to max_stocks'''
+        stocks = self.read()
+        self.assertEqual([s.name for s in stocks], ['RND0', 'RND1', 'RND2'])
+        np.testing.assert_array_equal(stocks[1].dates,
+                                      benchmark.random_stock(60, 1).dates)
+
+    def test_columns(self):
+        '''Columns are typed arrays and a Stock has no __dict__'''
+        stock = self.read()[0]
+        self.assertEqual(stock.dates.dtype, np.int64)
+        for column in Stock.columns[1:]:
+            self.assertEqual(getattr(stock, column).dtype, np.float64)
+            self.assertEqual(len(getattr(stock, column)), 200)
+        self.assertFalse(hasattr(stock, '__dict__'))
+
+    def test_workers(self):
+        '''Loading in worker processes gives the same stocks'''
+        expected = self.read()
+        self.assertSameStocks(expected, self.read(workers=2))
+        self.assertSameStocks(expected, self.read(workers=2, panel=True))
+
+    def test_features(self):
+        '''Indicators left out of features are calculated when read'''
+        expected = self.read()
+        for panel in (False, True):
+            result = self.read(features=['cci'], panel=panel)
+            self.assertTrue(result[0].calculated('cci'))
+            self.assertFalse(result[0].calculated('mfi'))
+            self.assertSameStocks(expected, result)
+
+class test_stock_cache(unittest.TestCase):
+    """Tests for the binary cache of the csv files"""
+
+    def setUp(self):
+        self._data_path = tempfile.mkdtemp()
+        benchmark.write_csv(benchmark.random_stock(80, 0), self._data_path)
+
+    def tearDown(self):
+        shutil.rmtree(self._data_path)
+
+    def populate(self):
+        stock = Stock('RND0', self._data_path)
+        stock.populate()
+        return stock
+
+    def test_warm_start(self):
+        '''The second populate reads the cache instead of the csv file'''
+        expected = self.populate()
+        self.assertTrue(os.path.exists(expected.cache_file()))
+        with mock.patch.object(Stock, 'read_csv', side_effect=AssertionError):
+            result = self.populate()
+        for column in Stock.columns:
+            np.testing.assert_array_equal(getattr(result, column),
+                                          getattr(expected, column))
+
+    def test_csv_changed(self):
+        '''A changed csv file is parsed again'''
+        self.populate()
+        stock = benchmark.random_stock(90, 5)
+        stock.name = 'RND0'
+        benchmark.write_csv(stock, self._data_path)
+        result = self.populate()
+        np.testing.assert_array_equal(result.close, stock.close)
+
+    def test_parse_table(self):
+        '''Parsing all rows at once gives the values of the row loop'''
+        with mock.patch.object(Stock, 'cache_dir', None):
+            result = self.populate()
+            with mock.patch.object(Stock, 'parse_table', return_value=False):
+                expected = self.populate()
+        for column in Stock.columns:
+            np.testing.assert_array_equal(getattr(result, column),
+                                          getattr(expected, column))
+
+    def test_matches_loop(self):
+        '''The cache and the csv parse give the columns of the original
+        per line parse, bad rows included'''
+        fn = os.path.join(self._data_path, 'RND0.csv')
+        with open(fn, 'a') as f:
+            f.write('null,1,1,1,1,1,1\n')
+        expected = benchmark.populate_loop(fn)
+        for stock in (self.populate(), self.populate()):
+            for column, values in zip(Stock.columns, expected):
+                np.testing.assert_allclose(getattr(stock, column), values,
+                                           rtol=1e-15)
+
+    def test_bad_rows(self):
+        '''Rows that do not parse are skipped'''
+        with open(os.path.join(self._data_path, 'RND0.csv'), 'a') as f:
+            f.write('null,1,1,1,1,1,1\n')
+            f.write('\n')
+            f.write('2001-01-01,1,1,1,0,1,1\n')
+        stock = self.populate()
+        self.assertEqual(len(stock.close), 80)
+
+    def test_no_cache(self):
+        '''The cache can be turned off'''
+        with mock.patch.object(Stock, 'cache_dir', None):
+            stock = self.populate()
+        self.assertFalse(os.path.exists(os.path.join(self._data_path,
+                                                     Stock.cache_dir)))
+        self.assertEqual(len(stock.close), 80)
+
+class test_universe_store(unittest.TestCase):
+    """Tests for the memory mapped store of many stocks"""
+
+    def setUp(self):
+        self._data_path = tempfile.mkdtemp()
+        self._store = os.path.join(self._data_path, 'universe.bin')
+        self._stock_file = os.path.join(self._data_path, 'stocks_read.txt')
+        with open(self._stock_file, 'w') as f:
+            for seed, n in enumerate([120, 60, 90]):
+                stock = benchmark.random_stock(n, seed)
+                benchmark.write_csv(stock, self._data_path)
+                f.write(stock.name + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self._data_path)
+
+    def read(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return Stock.read_stocks(self._stock_file, 10,
+                                     directory=self._data_path,
+                                     store=self._store)
+
+    def test_write(self):
+        '''Stocks read back from a store are views with the same values'''
+        stocks = [benchmark.random_stock(n, seed)
+                  for seed, n in enumerate([40, 300, 16])]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for stock in stocks:
+                stock.indicators_calc()
+        store = UniverseStore(UniverseStore.write(self._store, stocks).path)
+        self.assertEqual(store.symbols, ['RND0', 'RND1', 'RND2'])
+        for expected in stocks:
+            result = store.stock(expected.name)
+            for attr in Stock.columns + Stock.indicators:
+                np.testing.assert_array_equal(getattr(result, attr),
+                                              getattr(expected, attr))
+                self.assertTrue(np.shares_memory(getattr(result, attr),
+                                                 store._buffer))
+
+    def test_float32(self):
+        '''Values can be stored as float32'''
+        stocks = [benchmark.random_stock(50, 0)]
+        store = UniverseStore.write(self._store, stocks, dtype=np.float32)
+        result = store.stock('RND0')
+        self.assertEqual(result.close.dtype, np.float32)
+        self.assertEqual(result.dates.dtype, np.int64)
+        np.testing.assert_allclose(result.close, stocks[0].close, rtol=1e-6)
+
+    def test_read_stocks(self):
+        '''read_stocks writes the store once and then maps it'''
+        expected = self.read()
+        self.assertTrue(os.path.exists(self._store))
+        with mock.patch('Stock.load_stock', side_effect=AssertionError):
+            result = self.read()
+        self.assertEqual([s.name for s in result], ['RND0', 'RND1', 'RND2'])
+        np.testing.assert_array_equal(result[2].tsi, expected[2].tsi)
+
+        # a changed csv file makes the store stale
+        stock = benchmark.random_stock(70, 9)
+        stock.name = 'RND1'
+        benchmark.write_csv(stock, self._data_path)
+        result = self.read()
+        np.testing.assert_array_equal(result[1].close, stock.close)
+
 if __name__ == '__main__':
     unittest.main()